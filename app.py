@@ -1,25 +1,28 @@
 # -*- coding: utf-8 -*-
+import functools
+import os
+
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
 
-from figures.general_timeline import get_general_figures
-from figures.timelines import get_house_timeline, get_people_timeline
-from simulator.main import run
-from simulator.setup import MONTHS_A_PERSON_LIVES, DEFAULT_SETUP
+from figures.results import compute_results, get_results, figure_dicts, result_key, partial_figure_updates, \
+    load_figures, load_people_years, people_years, people_year_figure, PROGRESSIVE_FIGURES, FIGURES, DEFAULT_SEED
+from simulator.cache import TieredCache
+from simulator.jobs import JobQueue, DONE, FAILED, CANCELLED
+from simulator.setup import MONTHS_A_PERSON_LIVES, MONTHS_PER_YEAR, DEFAULT_SETUP
 from simulator.simulation import Ruleset
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
-app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
-
-allow_inheritance = False
-ruleset = Ruleset.by_shares
 
-stats = run(verbose=False)
-human, money = get_general_figures(stats)
-house_timeline = get_house_timeline(stats)
-people_timeline = get_people_timeline(stats, allow_inheritance, ruleset)
+# Where the results of the setups already run are kept, shared by all the workers of the server
+RESULTS_CACHE = os.environ.get('HOUSING_RESULTS_CACHE', '.results_cache')
+# The figures of DEFAULT_SETUP and DEFAULT_SEED, precomputed with python -m figures.results default_figures.json
+DEFAULT_FIGURES = os.environ.get('HOUSING_DEFAULT_FIGURES', 'default_figures.json')
+# Simulations running at the same time in each worker
+MAX_JOBS = int(os.environ.get('HOUSING_MAX_JOBS', 2))
 
 
 def markdown(text):
@@ -28,75 +31,191 @@ def markdown(text):
     ])
 
 
-@app.callback(
-    [
-        Output('human', 'figure'),
-        Output('money', 'figure'),
-        Output('house_timeline', 'figure'),
+def people_info(setup, seed):
+    '''
+    What the year slider needs to show the people of a setup: where their stats are, how to draw them
+    and the last year recorded
+    '''
+    return {
+        'key': result_key(setup, seed),
+        'allow_inheritance': setup['allow_inheritance'],
+        'ruleset': setup['ruleset'].name,
+        'last_year': (setup['number_of_months_to_run'] - 1) // MONTHS_PER_YEAR,
+    }
+
+
+def register_callbacks(app, jobs, results_cache, years_directory, default_figures_path=DEFAULT_FIGURES):
+    @app.callback(
+        Output('job', 'data'),
+        [
+            Input('submit-button-state', 'n_clicks'),
+            Input('cancel-button', 'n_clicks')
+        ],
+        [
+            State('job', 'data'),
+            State(component_id='inheritance', component_property='value'),
+            State(component_id='ruleset', component_property='value'),
+            State(component_id='max_people', component_property='value'),
+            State(component_id='min_people', component_property='value'),
+
+            State(component_id='initial_number_of_people', component_property='value'),
+            State(component_id='initial_number_of_houses', component_property='value'),
+            State(component_id='minimum_free_houses_policy', component_property='value'),
+            State(component_id='number_of_months_to_run', component_property='value'),
+            State(component_id='average_house_cost', component_property='value'),
+            State(component_id='sigma_house_cost', component_property='value'),
+            State(component_id='number_of_shares_per_house', component_property='value'),
+            State(component_id='house_to_rent_ratio', component_property='value'),
+            State(component_id='shares_per_month_earnings', component_property='value'),
+            State(component_id='average_salary', component_property='value'),
+            State(component_id='sigma_salary', component_property='value'),
+            State(component_id='retirement_factor', component_property='value'),
+            State(component_id='seed', component_property='value')
+        ]
+    )
+    def submit_or_cancel(n_clicks, cancel_clicks, job, inheritance, ruleset, max_people, min_people,
+                         initial_number_of_people, initial_number_of_houses, minimum_free_houses_policy,
+                         number_of_months_to_run, average_house_cost, sigma_house_cost, number_of_shares_per_house,
+                         house_to_rent_ratio, shares_per_month_earnings, average_salary, sigma_salary,
+                         retirement_factor, seed):
+        '''
+        Submits the setup as a background job, or cancels the current job
+        '''
+        triggered = [trigger['prop_id'] for trigger in dash.callback_context.triggered if trigger['value']]
+        if not triggered:
+            raise PreventUpdate
+        if triggered[0] == 'cancel-button.n_clicks':
+            if job is not None:
+                jobs.cancel(job['id'])
+            raise PreventUpdate
+
+        ruleset = Ruleset.by_shares if ruleset == '1' else Ruleset.normal_rent
+        allow_inheritance = False if inheritance == '1' else True
+
+        setup = DEFAULT_SETUP.copy()
+
+        setup['number_of_months_to_run'] = int(number_of_months_to_run)
+        setup['max_people'] = int(max_people)
+        setup['min_people'] = int(min_people)
+        setup['initial_number_of_people'] = int(initial_number_of_people)
+        setup['initial_number_of_houses'] = int(initial_number_of_houses)
+        setup['allow_inheritance'] = allow_inheritance
+        setup['ruleset'] = ruleset
+
+        setup['minimum_free_houses_policy'] = int(minimum_free_houses_policy)
+
+        setup['average_house_cost'] = float(average_house_cost)
+        setup['sigma_house_cost'] = float(sigma_house_cost)
+        setup['number_of_shares_per_house'] = float(number_of_shares_per_house)
+        setup['house_to_rent_ratio'] = float(house_to_rent_ratio)
+        setup['shares_per_month_earnings'] = float(shares_per_month_earnings)
+
+        # People earnings
+        setup['average_salary'] = float(average_salary)
+        setup['sigma_salary'] = float(sigma_salary)
+        setup['retirement_factor'] = float(retirement_factor)
+
+        # Identical setups and seeds are only run once, then served from the cache
+        seed = int(seed)
+        return {'id': jobs.submit(setup, seed), 'key': result_key(setup, seed), 'people': people_info(setup, seed)}
+
+
+    @app.callback(
+        [
+            Output('human', 'figure'),
+            Output('money', 'figure'),
+            Output('house_timeline', 'figure'),
+            Output('human', 'extendData'),
+            Output('money', 'extendData'),
+            Output('house_timeline', 'extendData'),
+            Output('job-status', 'children'),
+            Output('poll', 'disabled'),
+            Output('shown', 'data'),
+            Output('people', 'data'),
+            Output('year', 'max'),
+            Output('year', 'value'),
+        ],
+        [
+            Input('poll', 'n_intervals'),
+            Input('job', 'data')
+        ],
+        [
+            State('shown', 'data')
+        ]
+    )
+    def poll(n_intervals, job, shown):
+        '''
+        Shows the status of the current job,
+        the figures follow the years it already ran and are complete once it is done
+        '''
+        if job is None:
+            raise PreventUpdate
+        no_figures = [dash.no_update] * 6
+        no_people = [dash.no_update] * 3
+        # Once done, the people timeline shows the first year of the job
+        people = [job['people'], job['people']['last_year'], 0]
+        status = jobs.status(job['id'])
+        if status is None:
+            # The job was submitted to another server worker, its results are found in the shared cache once done
+            results = results_cache.get(job['key'])
+            if results is None:
+                return no_figures + ['Running...', False, dash.no_update] + no_people
+            return figure_dicts(results) + [dash.no_update] * 3 + ['', True, None] + people
+
+        if status['status'] == DONE:
+            return figure_dicts(jobs.result(job['id'])) + [dash.no_update] * 3 + ['', True, None] + people
+        if status['status'] == FAILED:
+            return no_figures + [f"Simulation failed: {status['error']}", True, None] + no_people
+        if status['status'] == CANCELLED:
+            return no_figures + ['Simulation cancelled', True, None] + no_people
+
+        message = f"{status['status']}: {status['months']} of {status['total_months']} months"
+        # shown: the stats deltas of the job already in the figures and the names of their traces
+        if shown is None or shown['id'] != job['id']:
+            shown = {'id': job['id'], 'deltas': 0, 'traces': None}
+        new_deltas = jobs.partial_stats(job['id'], shown['deltas'])
+        if not new_deltas:
+            return no_figures + [message, False, dash.no_update] + no_people
+
+        figures, extensions, traces = partial_figure_updates(new_deltas, lambda: jobs.partial_stats(job['id']),
+                                                             shown['traces'])
+        shown = {'id': job['id'], 'deltas': shown['deltas'] + len(new_deltas), 'traces': traces}
+        response = [dash.no_update if figures[name] is None else figures[name] for name in PROGRESSIVE_FIGURES]
+        response += [dash.no_update if extensions[name] is None else extensions[name] for name in PROGRESSIVE_FIGURES]
+        return response + [message, False, shown] + no_people
+
+    @app.callback(
         Output('people_timeline', 'figure'),
-        Output("loading-output-1", "children")
-    ],
-    [Input('submit-button-state', 'n_clicks')],
-    [
-        State(component_id='inheritance', component_property='value'),
-        State(component_id='ruleset', component_property='value'),
-        State(component_id='max_people', component_property='value'),
-        State(component_id='min_people', component_property='value'),
-
-        State(component_id='initial_number_of_people', component_property='value'),
-        State(component_id='initial_number_of_houses', component_property='value'),
-        State(component_id='minimum_free_houses_policy', component_property='value'),
-        State(component_id='number_of_months_to_run', component_property='value'),
-        State(component_id='average_house_cost', component_property='value'),
-        State(component_id='sigma_house_cost', component_property='value'),
-        State(component_id='number_of_shares_per_house', component_property='value'),
-        State(component_id='house_to_rent_ratio', component_property='value'),
-        State(component_id='shares_per_month_earnings', component_property='value'),
-        State(component_id='average_salary', component_property='value'),
-        State(component_id='sigma_salary', component_property='value'),
-        State(component_id='retirement_factor', component_property='value')
-    ]
-)
-def update(n_clicks, inheritance, ruleset, max_people, min_people, initial_number_of_people, initial_number_of_houses,
-           minimum_free_houses_policy, number_of_months_to_run, average_house_cost, sigma_house_cost,
-           number_of_shares_per_house, house_to_rent_ratio, shares_per_month_earnings, average_salary, sigma_salary,
-           retirement_factor):
-    ruleset = Ruleset.by_shares if ruleset == '1' else Ruleset.normal_rent
-    allow_inheritance = False if inheritance == '1' else True
-
-    setup = DEFAULT_SETUP.copy()
-
-    setup['number_of_months_to_run'] = int(number_of_months_to_run)
-    setup['max_people'] = int(max_people)
-    setup['min_people'] = int(min_people)
-    setup['initial_number_of_people'] = int(initial_number_of_people)
-    setup['initial_number_of_houses'] = int(initial_number_of_houses)
-    setup['allow_inheritance'] = allow_inheritance
-    setup['ruleset'] = ruleset
-
-    setup['minimum_free_houses_policy'] = int(minimum_free_houses_policy)
-
-    setup['average_house_cost'] = float(average_house_cost)
-    setup['sigma_house_cost'] = float(sigma_house_cost)
-    setup['number_of_shares_per_house'] = float(number_of_shares_per_house)
-    setup['house_to_rent_ratio'] = float(house_to_rent_ratio)
-    setup['shares_per_month_earnings'] = float(shares_per_month_earnings)
-
-    # People earnings
-    setup['average_salary'] = float(average_salary)
-    setup['sigma_salary'] = float(sigma_salary)
-    setup['retirement_factor'] = float(retirement_factor)
-
-    stats = run(setup=setup, verbose=False)
-    human, money = get_general_figures(stats)
-    house_timeline = get_house_timeline(stats)
-    people_timeline = get_people_timeline(stats, allow_inheritance, ruleset)
-    return human, money, house_timeline, people_timeline, ''
-
-
-app.layout = html.Div(children=[
-
-    markdown('''
+        [
+            Input('year', 'value'),
+            Input('people', 'data')
+        ]
+    )
+    def people_frame(year, people):
+        '''
+        Only the people of the selected year are sent, read from the stats of the run partitioned by year
+        '''
+        if people is None or year is None:
+            raise PreventUpdate
+        store = people_years(people['key'], results_cache, years_directory)
+        if store is None and people == people_info(DEFAULT_SETUP, DEFAULT_SEED):
+            # The default figures came from the precomputed file, their people were saved with them
+            store = load_people_years(default_figures_path)
+            if store is None:
+                # A file without its people, the default setup runs in the background and is shown once done
+                jobs.submit(DEFAULT_SETUP, DEFAULT_SEED)
+        if store is None:
+            raise PreventUpdate
+        return people_year_figure(store, year, people['allow_inheritance'], Ruleset[people['ruleset']])
+
+
+def build_layout():
+    '''
+    A new layout of the page, without figures
+    '''
+    return html.Div(children=[
+
+        markdown('''
 # Housing by shares simulation
 
 Explanation at: https://github.com/cristianvasquez/housing
@@ -129,153 +248,202 @@ Explore the parameters below.
 ***
 '''),
 
-    html.Div([
-
-        html.Div([
-            html.Label('number of months to run (simulation)'),
-            dcc.Input(id='number_of_months_to_run', value='{}'.format(DEFAULT_SETUP['number_of_months_to_run']),
-                      type='text'),
-        ]),
-
-        html.Div([
-            html.Label('initial number of people'),
-            dcc.Input(id='initial_number_of_people', value='{}'.format(DEFAULT_SETUP['initial_number_of_people']),
-                      type='text'),
-        ]),
-
-        html.Div([
-            html.Label('initial number of houses'),
-            dcc.Input(id='initial_number_of_houses', value='{}'.format(DEFAULT_SETUP['initial_number_of_houses']),
-                      type='text'),
-        ]),
-
-        html.Div([
-            html.Label('min people'),
-            dcc.Input(id='min_people', value='{}'.format(DEFAULT_SETUP['min_people']), type='text'),
-        ]),
-
         html.Div([
-            html.Label('max people'),
-            dcc.Input(id='max_people', value='{}'.format(DEFAULT_SETUP['max_people']), type='text'),
-        ]),
 
-        html.Div([
-            html.Label('minimum available houses (policy)'),
-            dcc.Input(id='minimum_free_houses_policy', value='{}'.format(DEFAULT_SETUP['minimum_free_houses_policy']),
-                      type='text'),
-        ]),
-
-        html.Div([
-            html.Label('average house cost'),
-            dcc.Input(id='average_house_cost', value='{}'.format(DEFAULT_SETUP['average_house_cost']), type='text'),
-        ]),
-
-        html.Div([
-            html.Label('sigma house cost'),
-            dcc.Input(id='sigma_house_cost', value='{}'.format(DEFAULT_SETUP['sigma_house_cost']), type='text'),
-        ]),
-
-        html.Div([
-            html.Label('HTRR (rent_price = house_cost * HTRR)'),
-            dcc.Input(id='house_to_rent_ratio', value='{}'.format(DEFAULT_SETUP['house_to_rent_ratio']),
-                      type='text'),
-        ]),
-
-
-        html.Div([
-            html.Label('average salary'),
-            dcc.Input(id='average_salary', value='{}'.format(DEFAULT_SETUP['average_salary']), type='text'),
-        ]),
-
-        html.Div([
-            html.Label('sigma salary'),
-            dcc.Input(id='sigma_salary', value='{}'.format(DEFAULT_SETUP['sigma_salary']), type='text'),
-        ]),
-
-        html.Div([
-            html.Label('Percentage earned when retired'),
-            dcc.Input(id='retirement_factor', value='{}'.format(DEFAULT_SETUP['retirement_factor']), type='text'),
-        ]),
-
-        html.Div([
-            html.Label('number of shares per house'),
-            dcc.Input(id='number_of_shares_per_house',
-                      value='{}'.format(DEFAULT_SETUP['number_of_shares_per_house']),
-                      type='text'),
-        ]),
-
-        html.Div([
-            html.Label('shares per month earnings'),
-            dcc.Input(id='shares_per_month_earnings', value='{}'.format(DEFAULT_SETUP['shares_per_month_earnings']),
-                      type='text'),
-        ]),
-
-        dcc.RadioItems(
-            options=[
-                {'label': 'Without inheritance', 'value': '1'},
-                {'label': 'With inheritance', 'value': '2'},
-            ],
-            value='1',
-            id='inheritance'
-        ),
-
-        dcc.RadioItems(
-            options=[
-                {'label': 'Housing by shares', 'value': '1'},
-                {'label': 'Classical rent', 'value': '2'},
-            ],
-            value='1',
-            id='ruleset'
-        ),
-        html.Button(id='submit-button-state', n_clicks=0, children='Run simulation'),
-        dcc.Loading(
-            id="loading-1",
-            type="default",
-            fullscreen=True,
-            children=html.Div(id="loading-output-1")
-        ),
-    ], style={'columnCount': 4}),
-
-    markdown('''
+            html.Div([
+                html.Label('number of months to run (simulation)'),
+                dcc.Input(id='number_of_months_to_run', value='{}'.format(DEFAULT_SETUP['number_of_months_to_run']),
+                          type='text'),
+            ]),
+
+            html.Div([
+                html.Label('initial number of people'),
+                dcc.Input(id='initial_number_of_people', value='{}'.format(DEFAULT_SETUP['initial_number_of_people']),
+                          type='text'),
+            ]),
+
+            html.Div([
+                html.Label('initial number of houses'),
+                dcc.Input(id='initial_number_of_houses', value='{}'.format(DEFAULT_SETUP['initial_number_of_houses']),
+                          type='text'),
+            ]),
+
+            html.Div([
+                html.Label('min people'),
+                dcc.Input(id='min_people', value='{}'.format(DEFAULT_SETUP['min_people']), type='text'),
+            ]),
+
+            html.Div([
+                html.Label('max people'),
+                dcc.Input(id='max_people', value='{}'.format(DEFAULT_SETUP['max_people']), type='text'),
+            ]),
+
+            html.Div([
+                html.Label('minimum available houses (policy)'),
+                dcc.Input(id='minimum_free_houses_policy',
+                          value='{}'.format(DEFAULT_SETUP['minimum_free_houses_policy']), type='text'),
+            ]),
+
+            html.Div([
+                html.Label('average house cost'),
+                dcc.Input(id='average_house_cost', value='{}'.format(DEFAULT_SETUP['average_house_cost']), type='text'),
+            ]),
+
+            html.Div([
+                html.Label('sigma house cost'),
+                dcc.Input(id='sigma_house_cost', value='{}'.format(DEFAULT_SETUP['sigma_house_cost']), type='text'),
+            ]),
+
+            html.Div([
+                html.Label('HTRR (rent_price = house_cost * HTRR)'),
+                dcc.Input(id='house_to_rent_ratio', value='{}'.format(DEFAULT_SETUP['house_to_rent_ratio']),
+                          type='text'),
+            ]),
+
+
+            html.Div([
+                html.Label('average salary'),
+                dcc.Input(id='average_salary', value='{}'.format(DEFAULT_SETUP['average_salary']), type='text'),
+            ]),
+
+            html.Div([
+                html.Label('sigma salary'),
+                dcc.Input(id='sigma_salary', value='{}'.format(DEFAULT_SETUP['sigma_salary']), type='text'),
+            ]),
+
+            html.Div([
+                html.Label('Percentage earned when retired'),
+                dcc.Input(id='retirement_factor', value='{}'.format(DEFAULT_SETUP['retirement_factor']), type='text'),
+            ]),
+
+            html.Div([
+                html.Label('number of shares per house'),
+                dcc.Input(id='number_of_shares_per_house',
+                          value='{}'.format(DEFAULT_SETUP['number_of_shares_per_house']),
+                          type='text'),
+            ]),
+
+            html.Div([
+                html.Label('shares per month earnings'),
+                dcc.Input(id='shares_per_month_earnings', value='{}'.format(DEFAULT_SETUP['shares_per_month_earnings']),
+                          type='text'),
+            ]),
+
+            html.Div([
+                html.Label('random seed'),
+                dcc.Input(id='seed', value='{}'.format(DEFAULT_SEED), type='text'),
+            ]),
+
+            dcc.RadioItems(
+                options=[
+                    {'label': 'Without inheritance', 'value': '1'},
+                    {'label': 'With inheritance', 'value': '2'},
+                ],
+                value='1',
+                id='inheritance'
+            ),
+
+            dcc.RadioItems(
+                options=[
+                    {'label': 'Housing by shares', 'value': '1'},
+                    {'label': 'Classical rent', 'value': '2'},
+                ],
+                value='1',
+                id='ruleset'
+            ),
+            html.Button(id='submit-button-state', n_clicks=0, children='Run simulation'),
+            html.Button(id='cancel-button', n_clicks=0, children='Cancel'),
+            html.Div(id='job-status'),
+            dcc.Store(id='job'),
+            dcc.Store(id='shown'),
+            dcc.Interval(id='poll', interval=1000, disabled=True),
+        ], style={'columnCount': 4}),
+
+        markdown('''
 ***
 ##  People and houses
 '''),
 
-    html.Div([
-        dcc.Graph(id='human', figure=human)
-    ]),
+        html.Div([
+            dcc.Graph(id='human')
+        ]),
 
-    markdown('''
+        markdown('''
 ***
 ##  Evolution of shares (House 0)
 '''),
 
-    dcc.Graph(
-        id='house_timeline',
-        figure=house_timeline
-    ),
+        dcc.Graph(id='house_timeline'),
 
-    markdown('''
+        markdown('''
 ***
 # Founder's policy
 '''),
 
-    html.Div([
-        dcc.Graph(id='money', figure=money)
-    ]),
+        html.Div([
+            dcc.Graph(id='money')
+        ]),
 
-    markdown('''
+        markdown('''
 ***
 # Wealth of the population
-### Press the play button below
+### Move the year slider below
     the size of the bubble denotes number of shares.
 '''),
-    dcc.Graph(
-        id='people_timeline',
-        figure=people_timeline
-    ),
+        dcc.Graph(id='people_timeline'),
+        dcc.Slider(id='year', min=0, max=0, value=0, step=1, updatemode='drag'),
+        dcc.Store(id='people'),
+
+    ])
+
 
-])
+def default_figures(results_cache, path=DEFAULT_FIGURES):
+    '''
+    The figures of the default setup, from the precomputed file if there is one, otherwise from the results cache,
+    where they are computed once for all the workers sharing it
+    '''
+    if os.path.exists(path):
+        return figure_dicts(load_figures(path))
+    return figure_dicts(get_results(DEFAULT_SETUP, DEFAULT_SEED, results_cache))
+
+
+def create_app(results_directory=RESULTS_CACHE, max_jobs=MAX_JOBS, default_figures_path=DEFAULT_FIGURES):
+    '''
+    Builds the Dash app without running anything: the default figures are only loaded when the page is first served
+    '''
+    app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+
+    # Results of the setups already run, the last ones in memory and all of them on disk
+    results_cache = TieredCache(results_directory)
+    # The people stats of the results, partitioned by year and memory mapped when shown
+    years_directory = os.path.join(results_directory, 'years')
+
+    # Simulations run in background processes, the page polls their status
+    jobs = JobQueue(compute_results, results_cache, max_workers=max_jobs, key=result_key)
+
+    @functools.lru_cache(maxsize=1)
+    def figures():
+        return default_figures(results_cache, default_figures_path)
+
+    def serve_layout():
+        # Each page load gets its own layout, the figures are shared and never changed
+        layout = build_layout()
+        for name, figure in zip(FIGURES, figures()):
+            layout[name].figure = figure
+        layout['people'].data = people_info(DEFAULT_SETUP, DEFAULT_SEED)
+        layout['year'].max = layout['people'].data['last_year']
+        return layout
+
+    # Dash calls a layout function when it's set, to validate the callbacks against it,
+    # unless there is a validation layout already: a static one keeps the default figures out of the import
+    app.validation_layout = build_layout()
+    app.layout = serve_layout
+    register_callbacks(app, jobs, results_cache, years_directory, default_figures_path)
+    return app
+
+
+app = create_app()
+server = app.server  # For WSGI servers, e.g. gunicorn app:server
 
 if __name__ == '__main__':
     app.run_server(debug=False)
@@ -1,8 +1,9 @@
 import plotly.express as px
-from pandas import DataFrame
+import plotly.graph_objects as go
 
-def get_general_figures(stats):
-    df = DataFrame.from_dict(stats.general_stats, "index")
+
+def get_general_figures(stats, years=None):
+    df = stats.to_dataframe('general', years)
     human_df = df.query("scale=='human'")
 
     human = px.line(human_df, x="year", y="amount", color='type')
@@ -12,3 +13,57 @@ def get_general_figures(stats):
     money = px.line(money_df, x="year", y="amount", color='type')
 
     return human, money
+
+
+def get_line_extension(df, x, y, color, trace_names):
+    '''
+    The extendData of a px.line figure, that has one trace per color value named after it, for new rows
+    :param trace_names: the names of the traces of the figure
+    :return: the extendData, or None if the rows have a color value without a trace
+    '''
+    index = {name: i for i, name in enumerate(trace_names)}
+    xs, ys, traces = [], [], []
+    for value, rows in df.groupby(color, observed=True, sort=False):
+        if str(value) not in index:
+            return None
+        traces.append(index[str(value)])
+        xs.append(rows[x].tolist())
+        ys.append(rows[y].tolist())
+    return [{'x': xs, 'y': ys}, traces]
+
+
+def get_general_figure_extensions(stats, human_traces, money_traces):
+    '''
+    The extendData of the figures of get_general_figures for the rows of stats, see get_line_extension
+    '''
+    df = stats.to_dataframe('general')
+    human = get_line_extension(df.query("scale=='human'"), 'year', 'amount', 'type', human_traces)
+    money = get_line_extension(df.query("scale=='money'"), 'year', 'amount', 'type', money_traces)
+    return human, money
+
+
+def _fan_chart(bands):
+    fig = go.Figure()
+    for i, (metric, df) in enumerate(bands.groupby('metric', sort=False)):
+        color = px.colors.qualitative.Plotly[i % len(px.colors.qualitative.Plotly)]
+        for low, high in (('p5', 'p95'), ('p25', 'p75')):
+            fig.add_trace(go.Scatter(x=df['year'], y=df[high], mode='lines', line=dict(width=0, color=color),
+                                     legendgroup=metric, showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scatter(x=df['year'], y=df[low], mode='lines', line=dict(width=0, color=color),
+                                     fill='tonexty', opacity=0.2, legendgroup=metric, showlegend=False,
+                                     name=f'{metric} {low}-{high}'))
+        fig.add_trace(go.Scatter(x=df['year'], y=df['p50'], mode='lines', line=dict(color=color),
+                                 legendgroup=metric, name=metric))
+    fig.update_layout(xaxis_title='year', yaxis_title='amount')
+    return fig
+
+
+def get_general_fan_figures(ensemble):
+    '''
+    Fan chart variant of get_general_figures for a simulator.ensemble.Ensemble:
+    the median of the replicas with their 25-75 and 5-95 percentile bands
+    '''
+    bands = ensemble.bands()
+    human = _fan_chart(bands.query("scale=='human'"))
+    money = _fan_chart(bands.query("scale=='money'"))
+    return human, money
@@ -0,0 +1,184 @@
+import functools
+import json
+import os
+import shutil
+
+from simulator.cache import code_version, setup_digest
+from simulator.main import run
+from simulator.stats import Stats
+from simulator.yearstore import YearStore
+
+DEFAULT_SEED = 0
+
+FIGURES = ('human', 'money', 'house_timeline')  # The people timeline is served year by year, see people_years
+PROGRESSIVE_FIGURES = ('human', 'money', 'house_timeline')  # The ones that follow a run while it goes
+
+
+def result_key(setup, seed):
+    # The figures are part of the results, their code too
+    return setup_digest(setup, seed=seed, code=code_version(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_figures(stats, setup):
+    '''
+    Returns the figures of the dashboard, figure name -> plotly JSON string
+    '''
+    from figures.general_timeline import get_general_figures
+    from figures.timelines import get_house_timeline
+
+    human, money = get_general_figures(stats)
+    house_timeline = get_house_timeline(stats)
+    figures = dict(zip(FIGURES, (human, money, house_timeline)))
+    return {name: figure.to_json() for name, figure in figures.items()}
+
+
+def compute_results(setup, seed, progress=None, stats_deltas=None):
+    '''
+    Runs a setup and builds its figures
+    :param progress: see simulator.main.run
+    :param stats_deltas: see simulator.main.run
+    :return: {'stats': Stats, 'figures': figure name -> plotly JSON string}
+    '''
+    stats = run(setup=setup, verbose=False, seed=seed, progress=progress, stats_deltas=stats_deltas)
+    return {'stats': stats, 'figures': build_figures(stats, setup)}
+
+
+def get_results(setup, seed, cache):
+    '''
+    The results of a setup and seed, computed only if the cache doesn't have them yet
+    :param cache: a simulator.cache.TieredCache
+    '''
+    key = result_key(setup, seed)
+    results = cache.get(key)
+    if results is None:
+        results = compute_results(setup, seed)
+        cache.put(key, results)
+    return results
+
+
+def figures_people_path(path):
+    '''
+    Where write_figures saves the people of the figures at path, e.g. default_figures.json -> default_figures_people
+    '''
+    return f'{os.path.splitext(path)[0]}_people'
+
+
+def write_figures(results, path):
+    '''
+    Saves the figures of some results, with their people partitioned by year (see figures_people_path),
+    e.g. the ones of the default setup so the dashboard starts and shows the people timeline without running it
+    '''
+    with open(path, 'w') as f:
+        json.dump({'figures': results['figures']}, f)
+    YearStore.from_stats(results['stats']).save(figures_people_path(path))
+
+
+def load_figures(path):
+    '''
+    :return: results with only the figures, as saved by write_figures
+    '''
+    with open(path) as f:
+        return json.load(f)
+
+
+def figure_dicts(results):
+    '''
+    The figures of some results as dicts, ready for the figure property of a dcc.Graph
+    '''
+    return [json.loads(results['figures'][name]) for name in FIGURES]
+
+
+@functools.lru_cache(maxsize=16)
+def _open_year_store(path):
+    return YearStore.load(path, mmap=True)
+
+
+def people_years(key, cache, directory):
+    '''
+    The people stats of some results partitioned by year, memory mapped from directory/key.
+    The store is written from the cached stats the first time, None if the results are not in the cache
+    :return: a simulator.yearstore.YearStore
+    '''
+    path = os.path.join(directory, key)
+    if not YearStore.exists(path):
+        results = cache.get(key)
+        if results is None:
+            return None
+        temporary = f'{path}.{os.getpid()}.tmp'
+        YearStore.from_stats(results['stats']).save(temporary)
+        try:
+            os.rename(temporary, path)
+        except OSError:
+            # Written by another worker in the meantime
+            shutil.rmtree(temporary, ignore_errors=True)
+    return _open_year_store(path)
+
+
+def load_people_years(path):
+    '''
+    The people saved by write_figures with the figures at path, memory mapped, None if there are none
+    :return: a simulator.yearstore.YearStore
+    '''
+    directory = figures_people_path(path)
+    if not YearStore.exists(directory):
+        return None
+    return _open_year_store(directory)
+
+
+def people_year_figure(store, year, allow_inheritance, ruleset):
+    '''
+    The frame of the people timeline for one year
+    '''
+    from figures.timelines import get_people_year_figure
+
+    ranges = store.ranges(('age', 'money', 'net_income'))
+    return get_people_year_figure(store.year(year), ranges, allow_inheritance, ruleset)
+
+
+def merge_stats(deltas):
+    stats = Stats()
+    for delta in deltas:
+        stats.extend(delta)
+    return stats
+
+
+def partial_figure_updates(new_deltas, all_deltas, traces):
+    '''
+    Updates of the progressive figures of a running job, for the stats deltas it published since the last update.
+    A figure is extended with the new rows, or rebuilt when nothing is shown yet or the new rows need a new trace.
+    :param new_deltas: the simulator.stats.Stats deltas not shown yet
+    :param all_deltas: returns all the deltas of the job so far, to rebuild a figure
+    :param traces: figure name -> names of the traces shown, None when nothing of the job is shown yet
+    :return: figure name -> figure or None, figure name -> extendData or None, and the new traces
+    '''
+    from figures.general_timeline import get_general_figures, get_general_figure_extensions
+    from figures.timelines import get_house_timeline, get_house_timeline_extension
+
+    figures = dict.fromkeys(PROGRESSIVE_FIGURES)
+    extensions = dict.fromkeys(PROGRESSIVE_FIGURES)
+    if traces is not None:
+        delta = merge_stats(new_deltas)
+        extensions['human'], extensions['money'] = get_general_figure_extensions(delta, traces['human'],
+                                                                                 traces['money'])
+        extensions['house_timeline'] = get_house_timeline_extension(delta, traces['house_timeline'])
+
+    rebuild = [name for name in PROGRESSIVE_FIGURES if extensions[name] is None]
+    if rebuild:
+        stats = merge_stats(all_deltas())
+        human, money = get_general_figures(stats)
+        built = {'human': human, 'money': money, 'house_timeline': get_house_timeline(stats)}
+        traces = dict(traces or {})
+        for name in rebuild:
+            figures[name] = built[name]
+            traces[name] = [trace.name for trace in built[name].data]
+    return figures, extensions, traces
+
+
+if __name__ == '__main__':
+    # python -m figures.results default_figures.json, precomputes the figures shown when the dashboard starts
+    import sys
+
+    from simulator.setup import DEFAULT_SETUP
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'default_figures.json'
+    write_figures(compute_results(DEFAULT_SETUP, DEFAULT_SEED), path)
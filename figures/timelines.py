@@ -1,35 +1,68 @@
 import plotly.express as px
-from pandas import DataFrame
 
+from figures.general_timeline import get_line_extension
 from simulator.simulation import Ruleset
 
 
-def get_house_timeline(stats):
-    df = DataFrame.from_dict(stats.example_house_stats, "index")
+def get_house_timeline(stats, years=None):
+    df = stats.to_dataframe('example_house', years)
     fig = px.line(df, x="year", y="shares", color="name")
     fig.update_traces(mode="markers+lines", hovertemplate=None)
     fig.update_layout(hovermode="x unified")
     return fig
 
 
-def get_people_timeline(stats, allow_inheritance, ruleset):
-    df = DataFrame.from_dict(stats.people_stats, "index")
-
-    hover_data = {
-        'year': False,
-        'id': True,
-        'money': ':.2f',
-        'shares': ':.2f',
-        'age': ':.2f',
-        'parent': True,
-        'inherited': True,
-        'current_house': True,
-        'rent': ':.2f',
-        'share_income': ':.2f',
-        'work_income': ':.2f',
-        'net_income': ':.2f',
-    }
+def get_house_timeline_extension(stats, trace_names):
+    '''
+    The extendData of the figure of get_house_timeline for the rows of stats, see get_line_extension
+    '''
+    return get_line_extension(stats.to_dataframe('example_house'), 'year', 'shares', 'name', trace_names)
 
+
+PEOPLE_HOVER_DATA = {
+    'year': False,
+    'id': True,
+    'money': ':.2f',
+    'shares': ':.2f',
+    'age': ':.2f',
+    'parent': True,
+    'inherited': True,
+    'current_house': True,
+    'rent': ':.2f',
+    'share_income': ':.2f',
+    'work_income': ':.2f',
+    'net_income': ':.2f',
+}
+
+WEBGL_THRESHOLD = 1000  # People in a year above which the timeline is drawn with WebGL
+DENSITY_THRESHOLD = 50000  # Rows above which people are binned into age x money density grids
+DENSITY_BINS = 40
+
+
+def _column_ranges(df, columns):
+    '''
+    (min, max) of each column, on the NumPy arrays
+    '''
+    ranges = {}
+    for column in columns:
+        values = df[column].to_numpy()
+        ranges[column] = (values.min(), values.max()) if len(values) else (0, 0)
+    return ranges
+
+
+def get_people_timeline(stats, allow_inheritance, ruleset, years=None,
+                        webgl_threshold=WEBGL_THRESHOLD, density_threshold=DENSITY_THRESHOLD):
+    '''
+    Animation of the age and money of the people, year by year.
+    Larger populations are drawn with WebGL, and above density_threshold rows people are binned
+    into an age x money grid per year, see get_people_density_timeline
+    '''
+    df = stats.to_dataframe('people', years)
+    if len(df) > density_threshold:
+        return get_people_density_timeline(df, allow_inheritance)
+
+    ranges = _column_ranges(df, ('age', 'money', 'net_income'))
+    largest_year = df['year'].value_counts().max() if len(df) else 0
     fig = px.scatter(df,
                      x="age",
                      y="money",
@@ -41,10 +74,130 @@ def get_people_timeline(stats, allow_inheritance, ruleset):
                      facet_col="inherited" if allow_inheritance else None,
                      log_x=False,
                      size_max=45,
-                     range_color=[df['net_income'].min(), df['net_income'].max()],
+                     range_color=list(ranges['net_income']),
                      # color_continuous_scale='Bluered_r',
-                     range_x=[df['age'].min(), df['age'].max()],
-                     range_y=[0, df['money'].max()],
-                     hover_data=hover_data
+                     range_x=list(ranges['age']),
+                     range_y=[0, ranges['money'][1]],
+                     hover_data=PEOPLE_HOVER_DATA,
+                     render_mode='webgl' if largest_year > webgl_threshold else 'auto'
+                     )
+    return fig
+
+
+def get_people_year_figure(df, ranges, allow_inheritance, ruleset, webgl_threshold=WEBGL_THRESHOLD,
+                           density_threshold=DENSITY_THRESHOLD):
+    '''
+    The people of a single year, the frame of get_people_timeline for that year.
+    Above density_threshold rows the people are binned into an age x money grid, see get_people_density_year_figure
+    :param df: the people rows of the year
+    :param ranges: (min, max) of age, money and net_income over all the years, so the axes stay put between years
+    '''
+    if len(df) > density_threshold:
+        return get_people_density_year_figure(df, ranges, allow_inheritance)
+
+    fig = px.scatter(df,
+                     x="age",
+                     y="money",
+                     size="shares" if ruleset == Ruleset.by_shares else None,
+                     color="net_income",
+                     hover_name="id",
+                     facet_col="inherited" if allow_inheritance else None,
+                     size_max=45,
+                     range_color=list(ranges['net_income']),
+                     range_x=list(ranges['age']),
+                     range_y=[0, ranges['money'][1]],
+                     hover_data=PEOPLE_HOVER_DATA,
+                     render_mode='webgl' if len(df) > webgl_threshold else 'auto'
                      )
     return fig
+
+
+def _density_grid(df, ranges, allow_inheritance, bins):
+    '''
+    Number of people in each age x money cell, per year and inherited value, with a single bincount
+    :return: the years, the inherited values, the centers of the cells and the (years x facets x money x age) counts
+    '''
+    import numpy as np
+
+    df = df[df['id'] != 'dummy']
+    years, year_index = np.unique(df['year'].to_numpy(), return_inverse=True)
+    facets = [False, True] if allow_inheritance else [None]
+    facet_index = df['inherited'].to_numpy().astype(np.int64) if allow_inheritance else np.zeros(len(df), np.int64)
+
+    edges = {}
+    cells = {}
+    for column in ('age', 'money'):
+        low, high = ranges[column]
+        edges[column] = np.linspace(low, high if high > low else low + 1, bins + 1)
+        cells[column] = np.clip(np.searchsorted(edges[column], df[column].to_numpy(), side='right') - 1, 0, bins - 1)
+
+    shape = (len(years), len(facets), bins, bins)
+    counts = np.bincount(np.ravel_multi_index((year_index, facet_index, cells['money'], cells['age']), shape),
+                         minlength=np.prod(shape)).reshape(shape)
+
+    centers = {column: (edges[column][1:] + edges[column][:-1]) / 2 for column in edges}
+    return years, facets, centers, counts
+
+
+def _density_figure(facets, centers, counts, allow_inheritance):
+    '''
+    The heatmaps of the first year of counts, one per inherited value
+    '''
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(rows=1, cols=len(facets), shared_yaxes=True,
+                        subplot_titles=[f'inherited={facet}' for facet in facets] if allow_inheritance else None)
+    for i in range(len(facets)):
+        fig.add_trace(go.Heatmap(x=centers['age'], y=centers['money'], z=counts[0, i] if len(counts) else None,
+                                 coloraxis='coloraxis'), row=1, col=i + 1)
+    fig.update_xaxes(title_text='age')
+    fig.update_yaxes(title_text='money', col=1)
+    fig.update_layout(
+        coloraxis=dict(cmin=0, cmax=int(counts.max()) if counts.size else 1, colorbar=dict(title='people')))
+    return fig
+
+
+def get_people_density_year_figure(df, ranges, allow_inheritance, bins=DENSITY_BINS):
+    '''
+    The number of people of a single year in each age x money cell, the frame of get_people_density_timeline
+    for that year
+    :param ranges: (min, max) of age and money over all the years, so the cells stay put between years
+    '''
+    _, facets, centers, counts = _density_grid(df, ranges, allow_inheritance, bins)
+    return _density_figure(facets, centers, counts, allow_inheritance)
+
+
+def get_people_density_timeline(df, allow_inheritance, bins=DENSITY_BINS):
+    '''
+    Animation of the number of people in each age x money cell, year by year,
+    one heatmap per inherited value if inheritance is allowed.
+    The counts of all the years are computed at once with a single bincount.
+    '''
+    import plotly.graph_objects as go
+
+    ranges = _column_ranges(df[df['id'] != 'dummy'], ('age', 'money'))
+    years, facets, centers, counts = _density_grid(df, ranges, allow_inheritance, bins)
+
+    def heatmaps(k):
+        return [go.Heatmap(x=centers['age'], y=centers['money'], z=counts[k, i], coloraxis='coloraxis')
+                for i in range(len(facets))]
+
+    fig = _density_figure(facets, centers, counts, allow_inheritance)
+    fig.frames = [go.Frame(name=str(year), data=heatmaps(k), traces=list(range(len(facets))))
+                  for k, year in enumerate(years.tolist())]
+    fig.update_layout(
+        updatemenus=[dict(type='buttons', direction='left', x=0.1, y=0, xanchor='right', yanchor='top',
+                          pad=dict(r=10, t=70), buttons=[
+                dict(label='&#9654;', method='animate',
+                     args=[None, dict(frame=dict(duration=500, redraw=True), fromcurrent=True)]),
+                dict(label='&#9724;', method='animate',
+                     args=[[None], dict(frame=dict(duration=0, redraw=False), mode='immediate')]),
+            ])],
+        sliders=[dict(x=0.1, y=0, xanchor='left', yanchor='top', len=0.9, pad=dict(b=10, t=60),
+                      currentvalue=dict(prefix='year='), steps=[
+                dict(label=str(year), method='animate',
+                     args=[[str(year)], dict(mode='immediate', frame=dict(duration=0, redraw=True))])
+                for year in years.tolist()])],
+    )
+    return fig
@@ -0,0 +1,207 @@
+'''
+Benchmarks of the simulator: the time of whole runs and of each step of the months, and their peak memory,
+over a matrix of setups.
+
+    python -m simulator.benchmark run --output baseline.json
+    python -m simulator.benchmark run --output current.json
+    python -m simulator.benchmark compare baseline.json current.json
+
+compare exits with status 1 if a case got slower or bigger than the threshold allows.
+'''
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from simulator.main import STEPS, advance, start
+from simulator.profiling import Profiler
+from simulator.setup import DEFAULT_SETUP, Engine, Ruleset
+
+BENCHMARK_VERSION = 1
+
+DEFAULT_MATRIX = {
+    'max_people': [30, 300],
+    'initial_number_of_houses': [20, 200],
+    'number_of_months_to_run': [1200, 3600],
+    'ruleset': [ruleset.name for ruleset in Ruleset],
+    'allow_inheritance': [False, True],
+}
+
+
+def cases(matrix, engines):
+    '''
+    All the combinations of the matrix values, for each engine
+    :return: a list of (case name, engine name, setup overrides)
+    '''
+    keys = list(matrix)
+    result = []
+    for engine in engines:
+        for values in itertools.product(*(matrix[key] for key in keys)):
+            overrides = dict(zip(keys, values))
+            name = ' '.join([engine] + [f'{key}={value}' for key, value in overrides.items()])
+            result.append((name, engine, overrides))
+    return result
+
+
+def _setup(overrides):
+    setup = {**DEFAULT_SETUP, **overrides}
+    if isinstance(setup['ruleset'], str):
+        setup['ruleset'] = Ruleset[setup['ruleset']]
+    return setup
+
+
+def _run_once(setup, engine, seed, profiler=None):
+    # The simulator prints evictions, they are not part of what is measured
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = start(setup=setup, verbose=False, engine=Engine[engine], seed=seed)
+        state = advance(state, verbose=False, profiler=profiler)
+        state.stats.close()
+    return state
+
+
+def measure(setup, engine, seed=0, repeat=3):
+    '''
+    Times a run repeat times (the fastest one is kept, with the time of its steps),
+    then runs it once more tracing the allocations for its peak memory
+    '''
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        profiler = Profiler()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        _run_once(setup, engine, seed, profiler)
+        wall = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        if best is None or wall < best['wall']:
+            best = {'wall': wall, 'cpu': cpu, 'steps': {step: profiler.wall.get(step, 0) for step in STEPS},
+                    'counters': profiler.counters}
+
+    gc.collect()
+    tracemalloc.start()
+    _run_once(setup, engine, seed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best['peak_memory'] = peak
+    return best
+
+
+def run_benchmarks(matrix=DEFAULT_MATRIX, engines=('objects',), seed=0, repeat=3, verbose=True):
+    results = {
+        'version': BENCHMARK_VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+        'cases': {},
+    }
+    for name, engine, overrides in cases(matrix, engines):
+        result = measure(_setup(overrides), engine, seed=seed, repeat=repeat)
+        result.update({'engine': engine, 'setup': overrides})
+        results['cases'][name] = result
+        if verbose:
+            print(f"{name}: {result['wall']:.3f}s, peak {result['peak_memory'] / 2 ** 20:.1f} MiB")
+    return results
+
+
+def _regressed(before, after, threshold):
+    # A zero baseline has no relative change, e.g. the peak memory of a trivial case, it is not compared
+    return before > 0 and after > before * (1 + threshold)
+
+
+def compare(baseline, current, threshold=0.2, memory_threshold=0.2, min_seconds=0.005):
+    '''
+    Compares two benchmark results case by case, the values that are 0 in the baseline are not compared
+    :param threshold: relative slowdown flagged as a regression, for the run and for each step
+    :param min_seconds: steps faster than this in both results are not compared, they are mostly noise
+    :return: a list of (case name, what, baseline value, current value) of the regressions
+    '''
+    regressions = []
+    for name, before in baseline['cases'].items():
+        after = current['cases'].get(name)
+        if after is None:
+            continue
+        if _regressed(before['wall'], after['wall'], threshold):
+            regressions.append((name, 'run', before['wall'], after['wall']))
+        for step in STEPS:
+            old, new = before['steps'].get(step, 0), after['steps'].get(step, 0)
+            if max(old, new) >= min_seconds and _regressed(old, new, threshold):
+                regressions.append((name, step, old, new))
+        if _regressed(before['peak_memory'], after['peak_memory'], memory_threshold):
+            regressions.append((name, 'peak_memory', before['peak_memory'], after['peak_memory']))
+    return regressions
+
+
+def _parse_value(value):
+    if value in ('True', 'False'):
+        return value == 'True'
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m simulator.benchmark', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks and save their results')
+    run_parser.add_argument('--output', required=True, help='JSON file for the results')
+    run_parser.add_argument('--engines', nargs='+', default=['objects'], choices=[engine.name for engine in Engine])
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--set', nargs='+', default=[], metavar='KEY=VALUE,VALUE',
+                            help='replace the values of a setup key in the matrix, e.g. max_people=30,3000')
+
+    compare_parser = commands.add_parser('compare', help='flag the regressions of a result against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown flagged')
+    compare_parser.add_argument('--memory-threshold', type=float, default=0.2, help='relative memory growth flagged')
+
+    arguments = parser.parse_args(arguments)
+
+    if arguments.command == 'run':
+        matrix = dict(DEFAULT_MATRIX)
+        for assignment in arguments.set:
+            key, values = assignment.split('=', 1)
+            if key not in DEFAULT_SETUP:
+                parser.error(f'Unknown setup key {key}')
+            matrix[key] = [_parse_value(value) for value in values.split(',')]
+        results = run_benchmarks(matrix, arguments.engines, seed=arguments.seed, repeat=arguments.repeat)
+        with open(arguments.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        return 0
+
+    with open(arguments.baseline) as f:
+        baseline = json.load(f)
+    with open(arguments.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, arguments.threshold, arguments.memory_threshold)
+    for name, what, before, after in regressions:
+        change = f'{after / before - 1:+.0%}' if before else 'n/a'
+        print(f'REGRESSION {name} {what}: {before:.4g} -> {after:.4g} ({change})')
+    missing = set(baseline['cases']) - set(current['cases'])
+    for name in sorted(missing):
+        print(f'MISSING {name}')
+    print(f"{len(regressions)} regressions in {len(set(baseline['cases']) & set(current['cases']))} cases")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
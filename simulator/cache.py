@@ -0,0 +1,150 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from enum import Enum
+
+
+def canonical_setup(setup):
+    '''
+    Returns the setup as plain JSON values, enums as 'Class.name'
+    '''
+    canonical = {}
+    for key, value in setup.items():
+        if isinstance(value, Enum):
+            value = f'{type(value).__name__}.{value.name}'
+        elif hasattr(value, 'item'):
+            value = value.item()  # NumPy scalars
+        canonical[key] = value
+    return canonical
+
+
+def setup_digest(setup, **extra):
+    '''
+    Content address of a setup: a hash of its canonical form, plus any extra values (seed, engine...)
+    '''
+    content = {'setup': canonical_setup(setup), 'extra': canonical_setup(extra)}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def source_digest(*directories):
+    '''
+    Hash of the Python sources of the given directories, a code version to add to the keys
+    so results computed by another version of the simulator are not reused
+    '''
+    digest = hashlib.sha256()
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py'):
+                digest.update(name.encode())
+                with open(os.path.join(directory, name), 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def code_version(*directories):
+    '''
+    Version of the simulator sources, and of the ones of the given directories if their code also shapes the results
+    (e.g. the figures), see source_digest
+    '''
+    return source_digest(os.path.dirname(os.path.abspath(__file__)), *directories)
+
+
+class ResultCache:
+    '''
+    Stores JSON results on disk, one file per content address
+    '''
+    extension = 'json'
+    mode = ''  # Text files
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.{self.extension}')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r' + self.mode) as f:
+                return self.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w' + self.mode) as f:
+            self.dump(value, f)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(f):
+        return json.load(f)
+
+    @staticmethod
+    def dump(value, f):
+        json.dump(value, f)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+
+class PickleCache(ResultCache):
+    '''
+    Stores any picklable result on disk, one file per content address
+    '''
+    extension = 'pkl'
+    mode = 'b'
+
+    @staticmethod
+    def load(f):
+        return pickle.load(f)
+
+    @staticmethod
+    def dump(value, f):
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class TieredCache:
+    '''
+    Results by content address in two tiers: the max_entries most recently used ones in memory
+    and all of them pickled on disk, where they survive restarts and are shared by all the processes using the directory
+    '''
+
+    def __init__(self, directory, max_entries=16):
+        self.disk = PickleCache(directory)
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        value = self.disk.get(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self.disk.put(key, value)
+        self._remember(key, value)
+
+    def _remember(self, key, value):
+        with self.lock:
+            self.memory[key] = value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.lock:
+            if key in self.memory:
+                return True
+        return key in self.disk
@@ -0,0 +1,81 @@
+import pickle
+
+from simulator.rng import RandomStream
+from simulator.stats import Stats, TABLES
+
+CHECKPOINT_VERSION = 1  # Bumped when a released version changes what a snapshot holds
+
+
+def _stats_in_memory(stats):
+    '''
+    The stats with all their rows in memory: the ones already written to the sink are read back
+    '''
+    if stats.sink is None:
+        return stats
+    in_memory = Stats()
+    reader = stats.sink.reader()
+    for name in TABLES:
+        table = in_memory.table(name)
+        for columns, categories in reader.chunks(name):
+            table.extend_chunk(columns, categories)
+        flushed = len(table)
+        if len(stats.table(name)):
+            table.extend_chunk(*stats.table(name).chunk())
+        if stats.delivered is not None:
+            in_memory.delivered = in_memory.delivered or {}
+            in_memory.delivered[name] = flushed + stats.delivered[name]
+    return in_memory
+
+
+def checkpoint(state):
+    '''
+    Snapshot of a community partway through a run: people, houses, share ownership, tenancy, founder,
+    stats (with the position of their deltas) and the state of the random stream, as pickled bytes.
+    The rows a stats sink already wrote are part of the snapshot, the sink is not, neither is a profiler.
+    :param state: a simulator.simulation.Community or a simulator.vectorized.VectorizedCommunity
+    '''
+    stats, profiler = state.stats, state.profiler
+    state.stats = _stats_in_memory(stats)
+    state.profiler = None
+    try:
+        return pickle.dumps({'version': CHECKPOINT_VERSION, 'state': state}, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        state.stats, state.profiler = stats, profiler
+
+
+def restore(snapshot, stats_sink=None):
+    '''
+    The community of a snapshot, it goes on exactly as the checkpointed one would, see simulator.main.advance
+    :param stats_sink: optional sink for the stats from now on, it also gets the rows recorded before the checkpoint
+    '''
+    checkpointed = pickle.loads(snapshot)
+    if checkpointed['version'] != CHECKPOINT_VERSION:
+        raise RuntimeError(f"Checkpoint version {checkpointed['version']} not supported")
+    state = checkpointed['state']
+    state.stats.sink = stats_sink
+    return state
+
+
+def fork(snapshot, stats_sink=None, seed=None, **setup_changes):
+    '''
+    A branch of a snapshot that goes on with some setup values changed, e.g. fork(snapshot, ruleset=Ruleset.normal_rent)
+    :param seed: a new seed for the random stream of the branch, by default it continues the stream of the checkpoint.
+    The new stream has named streams if the checkpointed one had them, so branches forked with the same seed
+    draw the same numbers for the same purposes (common random numbers, see simulator.paired)
+    '''
+    state = restore(snapshot, stats_sink=stats_sink)
+    if setup_changes:
+        state.apply_setup({**state.setup, **setup_changes})
+    if seed is not None:
+        state.rng = RandomStream(seed, named_streams=state.rng.named_streams)
+    return state
+
+
+def save_checkpoint(state, path):
+    with open(path, 'wb') as f:
+        f.write(checkpoint(state))
+
+
+def load_checkpoint(path, stats_sink=None):
+    with open(path, 'rb') as f:
+        return restore(f.read(), stats_sink=stats_sink)
@@ -0,0 +1,130 @@
+import multiprocessing
+
+import numpy as np
+
+from simulator.main import run
+from simulator.setup import DEFAULT_SETUP, Engine
+from simulator.sketches import distribution_quantiles, merge_distributions
+
+WEALTH_QUANTILES = (0.1, 0.5, 0.9)
+BAND_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def replica_seeds(seed, replicas):
+    '''
+    Independent, reproducible seeds for each replica, derived from a single seed
+    '''
+    return [child.generate_state(2) for child in np.random.SeedSequence(seed).spawn(replicas)]
+
+
+def summarize(stats):
+    '''
+    Reduces the stats of one run to a few per-year series
+    :return: metric name -> (scale, pandas Series of the values indexed by the years recorded)
+    '''
+    import pandas as pd
+
+    general = stats.to_dataframe('general')
+    summary = {}
+    for (metric, scale), rows in general.groupby(['type', 'scale'], observed=True, sort=False):
+        summary[metric] = (scale, pd.Series(rows['amount'].to_numpy(), index=rows['year'].to_numpy()))
+
+    people = stats.to_dataframe('people')
+    people = people[people['id'] != 'dummy']
+    years = general['year'].unique()
+    if len(people):
+        wealth = people.groupby('year')['money'].quantile(list(WEALTH_QUANTILES)).unstack()
+    else:
+        # Runs that don't record the people have the sketches of their distribution
+        quantiles = distribution_quantiles(stats.to_dataframe('distribution'), 'money', WEALTH_QUANTILES)
+        wealth = quantiles.pivot(index='year', columns='quantile', values='value')
+    wealth = wealth.reindex(years)
+    for quantile in WEALTH_QUANTILES:
+        summary[f'Wealth p{quantile * 100:.0f}'] = ('money', pd.Series(wealth[quantile].to_numpy(), index=years))
+    return summary
+
+
+def aligned_years(series):
+    '''
+    Puts per-year series of several runs side by side, on the years recorded by any of them
+    :param series: pandas Series indexed by year, see summarize
+    :return: a (runs x years) pandas DataFrame, NaN where a run didn't record a year
+    '''
+    import pandas as pd
+
+    return pd.concat(series, axis=1, ignore_index=True, sort=True).T
+
+
+def _run_replica(arguments):
+    setup, engine, seed = arguments
+    stats = run(setup=setup, verbose=False, engine=engine, seed=seed)
+    return summarize(stats), stats.to_dataframe('distribution')
+
+
+class Ensemble:
+    '''
+    Per-year series of many replicas of the same setup, as (replicas x years) matrices
+    '''
+
+    def __init__(self):
+        self.series = {}  # metric -> list of per-year series, one per replica
+        self.scales = {}
+        self.replicas = 0
+        self.sketch = None  # The distribution tables of the replicas added so far merged, see simulator.sketches
+
+    def add(self, summary, distribution=None):
+        for metric, (scale, values) in summary.items():
+            self.scales[metric] = scale
+            self.series.setdefault(metric, []).append(values)
+        if distribution is not None:
+            self.sketch = merge_distributions([distribution] if self.sketch is None else [self.sketch, distribution])
+        self.replicas += 1
+
+    def distribution(self):
+        '''
+        The distribution sketches of all the replicas merged, as if they were one population
+        '''
+        return self.sketch
+
+    def values(self, metric):
+        '''
+        The values of a metric as a (replicas x years) pandas DataFrame with a column per year recorded by any replica,
+        NaN where a replica didn't record it, e.g. because of stats_max_rows
+        '''
+        return aligned_years(self.series[metric])
+
+    def bands(self, percentiles=BAND_PERCENTILES):
+        '''
+        Returns a tidy pandas DataFrame with the mean and the percentiles of every metric per year
+        '''
+        import pandas as pd
+
+        frames = []
+        for metric in self.series:
+            values = self.values(metric)
+            years = values.columns.to_numpy()
+            values = values.to_numpy(dtype=float)
+            frame = pd.DataFrame({
+                'year': years,
+                'metric': metric,
+                'scale': self.scales[metric],
+                'mean': np.nanmean(values, axis=0),
+            })
+            for percentile, band in zip(percentiles, np.nanpercentile(values, percentiles, axis=0)):
+                frame[f'p{percentile}'] = band
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+
+def run_ensemble(setup=DEFAULT_SETUP, replicas=16, seed=0, processes=None, engine=Engine.objects):
+    '''
+    Runs replicas of a setup across a process pool, each one with its own random streams.
+    Every replica is reduced to its per-year summary as soon as it finishes.
+    :param processes: size of the pool, all cores by default
+    '''
+    ensemble = Ensemble()
+    tasks = [(setup, engine, replica_seed) for replica_seed in replica_seeds(seed, replicas)]
+    with multiprocessing.Pool(processes) as pool:
+        for summary, distribution in pool.imap(_run_replica, tasks):
+            ensemble.add(summary, distribution)
+    return ensemble
@@ -0,0 +1,48 @@
+import functools
+import math
+
+import numpy as np
+
+from simulator.setup import MONTHS_PER_YEAR, probability_of_death_per_month, probability_of_birth_per_month
+
+# Kinds of events, births of a month go before deaths as in Community.do_life_and_death_step
+BIRTH = 0
+DEATH = 1
+
+
+@functools.lru_cache(maxsize=None)
+def cumulative_death_hazard():
+    '''
+    H[m] is the cumulative hazard of dying in the months before age m / MONTHS_PER_YEAR,
+    from the monthly probability of death: a person of age m / MONTHS_PER_YEAR survives t months with probability
+    exp(-(H[m + t] - H[m])). It ends with the first month where death is certain.
+    '''
+    hazards = []
+    month = 0
+    while True:
+        probability = probability_of_death_per_month(month / MONTHS_PER_YEAR)
+        if probability >= 1:
+            hazards.append(math.inf)
+            break
+        hazards.append(-math.log1p(-probability))
+        month += 1
+    return np.concatenate([[0], np.cumsum(hazards)])
+
+
+def months_until_death(age, rng):
+    '''
+    Samples the month a person of the given age dies in, counted from the next one (0),
+    the same distribution as checking dies_this_month every month while the person ages
+    '''
+    hazard = cumulative_death_hazard()
+    month = min(round(age * MONTHS_PER_YEAR), len(hazard) - 2)
+    exposure = -math.log1p(-rng.random())
+    return int(np.searchsorted(hazard, hazard[month] + exposure, side='left')) - 1 - month
+
+
+def months_until_birth(rng):
+    '''
+    Samples the month of the next child, counted from the next one (0):
+    the first success of a Bernoulli trial with probability_of_birth_per_month every month
+    '''
+    return int(math.log1p(-rng.random()) / math.log1p(-probability_of_birth_per_month()))
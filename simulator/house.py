@@ -1,9 +1,6 @@
-import numpy as np
-
-
-def new_random_house(setup, name=''):
+def new_random_house(setup, rng, name=''):
     # The price of the house is taken from a normal distribution, sigma as standard deviation
-    house_cost = np.random.normal(setup['average_house_cost'], setup['sigma_house_cost'])
+    house_cost = rng.normal(setup['average_house_cost'], setup['sigma_house_cost'])
     number_of_shares = setup['number_of_shares_per_house']
 
     house_to_rent_ratio = setup['house_to_rent_ratio']
@@ -23,18 +20,66 @@ class House:
         '''
         self.share_owners = {}
         self.founder_shares = number_of_shares
+        self.owners_shares = 0  # Sum of share_owners, kept up to date by the methods that change it
         self.rent_price = rent_price
         self.name = name
         self.inflation = 0
         self.shares_per_month = shares_per_month
 
+        '''
+        Dividends are not paid to each owner on every rent payment.
+        The house accumulates the payout per share and owners collect it with settle_dividends,
+        owner_payout holds for each owner the accumulated payout per share at the last collection
+        and owner_unpaid what the owner earned with the shares held before they changed.
+        '''
+        self.payout_per_share = 0
+        self.owner_payout = {}
+        self.owner_unpaid = {}
+
     @property
     def total_shares(self):
-        total = 0
-        for k, v in self.share_owners.items():
-            total += v
+        return self.owners_shares + self.founder_shares
+
+    def pay_dividends(self, monthly_payment):
+        '''
+        Distributes a rent payment to all shareholders, proportionally to their shares.
+        :return: the part that corresponds to the founder
+        '''
+        total_shares = self.total_shares
+        self.payout_per_share += monthly_payment / total_shares
+        return (self.founder_shares / total_shares) * monthly_payment
+
+    def settle_dividends(self, person_id):
+        '''
+        Returns the dividends person_id earned since the last collection
+        '''
+        amount = self.owner_unpaid[person_id] + \
+                 self.share_owners[person_id] * (self.payout_per_share - self.owner_payout[person_id])
+        self.owner_payout[person_id] = self.payout_per_share
+        self.owner_unpaid[person_id] = 0
+        return amount
+
+    def _accrue_dividends(self, person_id):
+        '''
+        Keeps what person_id earned until now, before the shares of person_id change
+        '''
+        if person_id in self.share_owners:
+            self.owner_unpaid[person_id] += \
+                self.share_owners[person_id] * (self.payout_per_share - self.owner_payout[person_id])
+        else:
+            self.owner_unpaid[person_id] = 0
+        self.owner_payout[person_id] = self.payout_per_share
 
-        return total + self.founder_shares
+    def _remove_owner(self, person_id):
+        '''
+        The dividends of person_id must be settled before
+        '''
+        amount = self.share_owners[person_id]
+        del self.share_owners[person_id]
+        del self.owner_payout[person_id]
+        del self.owner_unpaid[person_id]
+        self.owners_shares -= amount
+        return amount
 
     def assign_share(self, person_id):
 
@@ -50,6 +95,8 @@ class House:
             self.inflation += self.shares_per_month  # Just for stats purposes
 
         # Increment the shares of a person_id by one
+        self._accrue_dividends(person_id)
+        self.owners_shares += self.shares_per_month
         if person_id in self.share_owners:
             self.share_owners[person_id] += self.shares_per_month
         else:
@@ -61,9 +108,10 @@ class House:
         titles, debts, rights, and obligations upon the death of an individual.
         '''
         assert (deceased_id in self.share_owners)
-        amount = self.share_owners[deceased_id]
-        del self.share_owners[deceased_id]
+        amount = self._remove_owner(deceased_id)
 
+        self._accrue_dividends(heir_id)
+        self.owners_shares += amount
         if heir_id in self.share_owners:
             self.share_owners[heir_id] += amount
         else:
@@ -73,8 +121,7 @@ class House:
 
     def inherit_to_founder(self, deceased_id):
         assert (deceased_id in self.share_owners)
-        amount = self.share_owners[deceased_id]
-        del self.share_owners[deceased_id]
+        amount = self._remove_owner(deceased_id)
 
         self.founder_shares += amount
         return amount
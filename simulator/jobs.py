@@ -0,0 +1,208 @@
+import itertools
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+from simulator.cache import setup_digest
+from simulator.setup import MONTHS_PER_YEAR
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _run_job(task, job_id, setup, seed, months, cancel_requests, partials):
+    '''
+    Runs a job in a worker process, the months completed are published every year through the shared dict months,
+    where the run also looks for a cancellation request.
+    The stats deltas of the run are published in the shared dict partials, by (job_id, index).
+    '''
+
+    def progress(months_completed):
+        if months_completed % MONTHS_PER_YEAR == 0:
+            if cancel_requests.get(job_id):
+                raise JobCancelled(job_id)
+            months[job_id] = months_completed
+
+    deltas = itertools.count()
+
+    def stats_deltas(months_completed, delta):
+        partials[(job_id, next(deltas))] = delta
+
+    months[job_id] = 0
+    return task(setup, seed, progress=progress, stats_deltas=stats_deltas)
+
+
+class JobQueue:
+    '''
+    Runs the simulations submitted by the dashboard in the background, at most max_workers at the same time.
+
+    Each job is a setup and a seed, given to task(setup, seed, progress=...) in a worker process,
+    task must be picklable (a module level function) and accept progress and stats_deltas callables
+    as simulator.main.run does, the stats deltas of running jobs can be read with partial_stats.
+    A job that is already queued or running is not submitted twice, and the results of finished jobs go to the cache.
+    The job table keeps the last max_finished finished jobs, so their status can still be polled.
+    '''
+
+    def __init__(self, task, cache, max_workers=2, key=None, max_finished=100):
+        '''
+        :param cache: where the results are stored by key, e.g. a simulator.cache.TieredCache
+        :param key: returns the cache key of a (setup, seed), a hash of both by default
+        '''
+        self.task = task
+        self.cache = cache
+        self.max_workers = max_workers
+        self.key = key if key is not None else (lambda setup, seed: setup_digest(setup, seed=seed))
+        self.max_finished = max_finished
+
+        self.jobs = OrderedDict()  # job_id -> job record
+        self.lock = threading.RLock()  # Cancelling a queued job runs its done callback in the same thread
+        self._ids = itertools.count()
+        self._executor = None
+        self._manager = None
+
+    def _start(self):
+        # The pool and the shared dicts are only started with the first job
+        if self._executor is None:
+            self._manager = multiprocessing.Manager()
+            self._months = self._manager.dict()
+            self._cancel_requests = self._manager.dict()
+            self._partials = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def submit(self, setup, seed):
+        '''
+        :return: the id of the job, an in-flight job with the same setup and seed if there is one
+        '''
+        key = self.key(setup, seed)
+        with self.lock:
+            for job_id, job in self.jobs.items():
+                if job['key'] == key and job['status'] not in FINISHED:
+                    return job_id
+
+            job_id = f'job-{next(self._ids)}'
+            job = {
+                'key': key,
+                'status': QUEUED,
+                'total_months': setup['number_of_months_to_run'],
+                'submitted': time.time(),
+                'error': None,
+                'future': None,
+            }
+            self.jobs[job_id] = job
+
+            if key in self.cache:
+                job['status'] = DONE
+            else:
+                self._start()
+                job['future'] = self._executor.submit(_run_job, self.task, job_id, setup, seed, self._months,
+                                                      self._cancel_requests, self._partials)
+            self._forget_finished()
+
+        if job['future'] is not None:
+            job['future'].add_done_callback(lambda future: self._finish(job_id, future))
+        return job_id
+
+    def _finish(self, job_id, future):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        try:
+            self.cache.put(job['key'], future.result())
+            status = DONE
+        except (CancelledError, JobCancelled):
+            status = CANCELLED
+        except Exception as e:
+            status = FAILED
+            job['error'] = repr(e)
+        with self.lock:
+            job['status'] = status
+            job['future'] = None
+            self._months.pop(job_id, None)
+            self._cancel_requests.pop(job_id, None)
+            for index in itertools.count():
+                if self._partials.pop((job_id, index), None) is None:
+                    break
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job['status'] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    def status(self, job_id):
+        '''
+        :return: a dict with the status ('queued', 'running', 'done', 'failed' or 'cancelled'), the months completed,
+        the total months and the error of a failed job, or None for an unknown job
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            status = job['status']
+            months = job['total_months'] if status == DONE else 0
+            if status == QUEUED:
+                months = self._months.get(job_id)
+                if months is None:
+                    months = 0
+                else:
+                    status = RUNNING
+            return {
+                'status': status,
+                'months': months,
+                'total_months': job['total_months'],
+                'error': job['error'],
+            }
+
+    def partial_stats(self, job_id, start=0):
+        '''
+        The stats deltas published so far by a running job, from the start-th one
+        :return: a list of simulator.stats.Stats
+        '''
+        if self._executor is None:
+            return []
+        deltas = []
+        for index in itertools.count(start):
+            delta = self._partials.get((job_id, index))
+            if delta is None:
+                return deltas
+            deltas.append(delta)
+
+    def result(self, job_id):
+        '''
+        The results of a finished job, None while it is not done
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None or job['status'] != DONE:
+            return None
+        return self.cache.get(job['key'])
+
+    def cancel(self, job_id):
+        '''
+        A queued job is dropped, a running one stops at its next yearly progress report
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] in FINISHED:
+                return
+            if not job['future'].cancel():
+                self._cancel_requests[job_id] = True
+
+    def shutdown(self):
+        with self.lock:
+            for job_id, job in self.jobs.items():
+                if job['future'] is not None and not job['future'].cancel():
+                    self._cancel_requests[job_id] = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._manager.shutdown()
+            self._executor = None
@@ -1,24 +1,57 @@
 from simulator.house import new_random_house
-from simulator.policy import apply_custom_policy
+from simulator.policy import apply_custom_policy, apply_vectorized_policy
 from simulator.simulation import Community
-from simulator.setup import DEFAULT_SETUP
+from simulator.rng import RandomStream
+from simulator.setup import DEFAULT_SETUP, Engine
 from simulator.shareholder import Shareholder
+from simulator.stats import Stats
+from simulator.vectorized import VectorizedCommunity
+
+
+STEPS = ('life_and_death', 'policy', 'income_and_taxes', 'shares', 'stats')
+
+
+def _step(profiler, name, function, *args, **kwargs):
+    if profiler is None:
+        return function(*args, **kwargs)
+    return profiler.step(name, function, *args, **kwargs)
+
 
 def run_for_one_month(state, setup, verbose):
-    state.do_life_and_death_step()
-    state = apply_custom_policy(state,setup,verbose=verbose)
-    state.do_income_and_taxes_step()
-    state.so_shares_step()
-    state.next_timestep()
+    '''
+    The steps are timed by the profiler of the community, if it has one, see advance
+    '''
+    profiler = state.profiler
+    if profiler is not None:
+        profiler.start_month()
+    _step(profiler, 'life_and_death', state.do_life_and_death_step)
+    if isinstance(state, VectorizedCommunity):
+        state = _step(profiler, 'policy', apply_vectorized_policy, state, setup, verbose=verbose)
+        _step(profiler, 'income_and_taxes', state.do_income_and_taxes_step)
+        _step(profiler, 'shares', state.so_shares_step, verbose=verbose)
+    else:
+        state = _step(profiler, 'policy', apply_custom_policy, state, setup, verbose=verbose)
+        _step(profiler, 'income_and_taxes', state.do_income_and_taxes_step)
+        _step(profiler, 'shares', state.so_shares_step)
+    _step(profiler, 'stats', state.next_timestep)
+    if profiler is not None:
+        profiler.end_month(state.current_tick)
     return state
 
 
-def run(
-        setup=DEFAULT_SETUP,
-        verbose=True,
-        ):
+def start(setup=DEFAULT_SETUP, verbose=True, engine=Engine.objects, stats_sink=None, seed=None):
+    '''
+    Creates the community of a run, with its initial people and houses, see run
+    '''
     founder = Shareholder(age=0, money=0, name='Founder')
-    state = Community(founder=founder, setup=setup)
+    stats = Stats(sink=stats_sink)
+    rng = RandomStream(seed, named_streams=setup['named_streams'])
+    if engine == Engine.objects:
+        state = Community(founder=founder, setup=setup, stats=stats, rng=rng)
+    elif engine == Engine.arrays:
+        state = VectorizedCommunity(founder=founder, setup=setup, stats=stats, rng=rng)
+    else:
+        raise RuntimeError(f'Engine {engine} not implemented')
 
     initial_number_of_people = setup['initial_number_of_people']
     initial_number_of_houses = setup['initial_number_of_houses']
@@ -29,7 +62,7 @@ def run(
         state.add_new_born()
 
     for i in range(initial_number_of_houses):
-        house, price = new_random_house(setup,f'initial house {state.house_max_id}')
+        house, price = new_random_house(setup, rng.stream('houses'), f'initial house {state.house_max_id}')
         # houses are initially owned by the founder
         state.add_new_house(house)
 
@@ -39,14 +72,65 @@ def run(
 
     if verbose:
         print(
-            f'Simulation starts with {initial_number_of_houses} initial houses and {initial_number_of_people} people, ruleset:{ruleset}')
+            f'Simulation starts with {initial_number_of_houses} initial houses and {initial_number_of_people} people, ruleset:{ruleset}, engine:{engine}')
+    return state
+
+
+def advance(state, months=None, verbose=True, progress=None, stats_deltas=None, profiler=None):
+    '''
+    Runs a community for some months, by default until the end of the run (number_of_months_to_run of its setup).
+    The setup of the community is used, so a forked checkpoint goes on with its own, see simulator.checkpoint
+    :param progress: see run, called with the number of months completed since the start of the run
+    :param stats_deltas: see run
+    :param profiler: see run
+    '''
+    if months is None:
+        months = state.setup['number_of_months_to_run'] - state.current_tick
+    state.profiler = profiler
+    try:
+        for i in range(months):
+            state = run_for_one_month(state, state.setup, verbose)
+            if progress is not None:
+                progress(state.current_tick)
+            if stats_deltas is not None:
+                delta = state.stats.delta()
+                if delta is not None:
+                    stats_deltas(state.current_tick, delta)
+    finally:
+        state.profiler = None
+    return state
+
 
-    for i in range(setup['number_of_months_to_run']):
-        state = run_for_one_month(state,setup,verbose)
+def run(
+        setup=DEFAULT_SETUP,
+        verbose=True,
+        engine=Engine.objects,
+        stats_sink=None,
+        seed=None,
+        progress=None,
+        stats_deltas=None,
+        profiler=None,
+        ):
+    '''
+    :param stats_sink: optional simulator.sinks sink, the stats are then written to it as the run goes
+    and only the last chunk of each table is kept in memory
+    :param seed: seed of the random stream of the run, the same seed gives the same run
+    :param progress: optional callable, called with the number of months completed after every month,
+    an exception raised by it stops the run
+    :param stats_deltas: optional callable, called with the number of months completed and a Stats with the new rows
+    every time a year is recorded, to follow the run as it goes
+    :param profiler: optional simulator.profiling.Profiler, to time the steps and count their work,
+    its summary is printed at the end of a verbose run
+    '''
+    state = start(setup=setup, verbose=verbose, engine=engine, stats_sink=stats_sink, seed=seed)
+    state = advance(state, verbose=verbose, progress=progress, stats_deltas=stats_deltas, profiler=profiler)
 
     if verbose:
         print(state)
+        if profiler is not None:
+            print(profiler.summary())
 
+    state.stats.close()
     return state.stats
 
 
@@ -0,0 +1,155 @@
+import numpy as np
+
+NOBODY = -1  # Column of a removed entry
+
+
+def grow_column(column, size, fill=0):
+    '''
+    Returns column, enlarged (doubling) so it can hold at least size elements
+    '''
+    if size <= len(column):
+        return column
+    capacity = max(size, 2 * len(column), 16)
+    grown = np.full(capacity, fill, dtype=column.dtype)
+    grown[:len(column)] = column
+    return grown
+
+
+class OwnershipMatrix:
+    '''
+    Share ownership of a community as a sparse houses x people matrix plus a founder column.
+
+    Entries are kept in coordinate format (rows are house ids, columns person ids) with incremental updates:
+    an entry has a fixed slot in the rows/cols/data arrays, a removed entry gets NOBODY as column
+    and its slot is reused. The total shares of each house, founder included, are cached in a vector,
+    and the slots of each person are indexed, so the entries of a person are found without a scan.
+    '''
+
+    def __init__(self):
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.cols = np.zeros(0, dtype=np.int64)
+        self.data = np.zeros(0)
+        self.slot_max_id = 0
+        self.slots = {}  # (house_id, person_id) -> slot
+        self.person_houses = {}  # person_id -> {house_id: slot}
+        self.free_slots = []
+
+        self.founder_shares = np.zeros(0)
+        self.total_shares = np.zeros(0)
+        self.number_of_houses = 0
+
+    def add_house(self, founder_shares):
+        '''
+        Adds a row, initially owned by the founder
+        :return: the house id
+        '''
+        house_id = self.number_of_houses
+        self.number_of_houses += 1
+        self.founder_shares = grow_column(self.founder_shares, self.number_of_houses)
+        self.total_shares = grow_column(self.total_shares, self.number_of_houses)
+        self.founder_shares[house_id] = founder_shares
+        self.total_shares[house_id] = founder_shares
+        return house_id
+
+    def slot(self, house_id, person_id):
+        '''
+        Returns the slot of the entry (house_id, person_id), creating an empty one if needed
+        '''
+        key = (house_id, person_id)
+        slot = self.slots.get(key)
+        if slot is None:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = self.slot_max_id
+                self.slot_max_id += 1
+                self.rows = grow_column(self.rows, self.slot_max_id)
+                self.cols = grow_column(self.cols, self.slot_max_id, NOBODY)
+                self.data = grow_column(self.data, self.slot_max_id)
+            self.rows[slot] = house_id
+            self.cols[slot] = person_id
+            self.data[slot] = 0
+            self.slots[key] = slot
+            self.person_houses.setdefault(person_id, {})[house_id] = slot
+        return slot
+
+    def get(self, house_id, person_id):
+        slot = self.slots.get((house_id, person_id))
+        return 0 if slot is None else self.data[slot]
+
+    def set(self, house_id, person_id, shares):
+        '''
+        Sets the shares of person_id in house_id, removes the entry if shares is None
+        '''
+        if shares is None:
+            if (house_id, person_id) in self.slots:
+                self.remove(house_id, person_id)
+            return
+        slot = self.slot(house_id, person_id)
+        self.total_shares[house_id] += shares - self.data[slot]
+        self.data[slot] = shares
+
+    def remove(self, house_id, person_id):
+        '''
+        Removes the entry (house_id, person_id)
+        :return: the shares it had
+        '''
+        slot = self.slots.pop((house_id, person_id))
+        houses = self.person_houses[person_id]
+        del houses[house_id]
+        if not houses:
+            del self.person_houses[person_id]
+        amount = self.data[slot]
+        self.total_shares[house_id] -= amount
+        self.cols[slot] = NOBODY
+        self.data[slot] = 0
+        self.free_slots.append(slot)
+        return amount
+
+    def set_founder_shares(self, house_id, shares):
+        self.total_shares[house_id] += shares - self.founder_shares[house_id]
+        self.founder_shares[house_id] = shares
+
+    def add_to_slots(self, slots, amounts):
+        '''
+        Adds amounts to the entries in slots at once
+        '''
+        self.data[slots] += amounts
+        np.add.at(self.total_shares, self.rows[slots], amounts)
+
+    def person_slots(self, person_id):
+        '''
+        Slots of all entries of person_id, ordered by house
+        '''
+        houses = self.person_houses.get(person_id, {})
+        return np.array([houses[house_id] for house_id in sorted(houses)], dtype=np.int64)
+
+    def entries(self):
+        '''
+        Returns (houses, people, shares) of all the current entries
+        '''
+        cols = self.cols[:self.slot_max_id]
+        valid = cols != NOBODY
+        return self.rows[:self.slot_max_id][valid], cols[valid], self.data[:self.slot_max_id][valid]
+
+    def column_sums(self, number_of_people):
+        '''
+        Total shares of each person, over all houses
+        '''
+        _, people, shares = self.entries()
+        return np.bincount(people, weights=shares, minlength=number_of_people)
+
+    def payout(self, payments, number_of_people):
+        '''
+        Distributes the rent paid to each house among its shareholders, proportionally to their shares.
+        It is one sparse matrix-vector product: income = ownership^T (payments / total_shares)
+        :param payments: money paid to each house
+        :return: the income of each person and the income of the founder
+        '''
+        total_shares = self.total_shares[:self.number_of_houses]
+        payment_per_share = np.divide(payments, total_shares, out=np.zeros(self.number_of_houses),
+                                      where=total_shares != 0)
+        houses, people, shares = self.entries()
+        income = np.bincount(people, weights=shares * payment_per_share[houses], minlength=number_of_people)
+        founder_income = float(np.dot(self.founder_shares[:self.number_of_houses], payment_per_share))
+        return income, founder_income
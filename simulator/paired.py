@@ -0,0 +1,121 @@
+import multiprocessing
+import warnings
+from statistics import NormalDist
+
+import numpy as np
+
+from simulator.ensemble import aligned_years, replica_seeds, summarize
+from simulator.main import run
+from simulator.setup import DEFAULT_SETUP, Engine, Ruleset
+
+RULESETS = (Ruleset.by_shares, Ruleset.normal_rent)
+
+
+def _run_pair(arguments):
+    '''
+    Runs the same setup and seed with each ruleset, with named random streams (common random numbers)
+    '''
+    setup, engine, seed, rulesets = arguments
+    return [summarize(run(setup={**setup, 'ruleset': ruleset, 'named_streams': True}, verbose=False, engine=engine,
+                          seed=seed))
+            for ruleset in rulesets]
+
+
+class PairedComparison:
+    '''
+    Per-year differences between two rulesets over replicas of paired runs.
+
+    Both runs of a pair have the same seed and draw births, deaths, salaries, new people, new houses and moves
+    from separate named streams (see simulator.rng.RandomStream.stream), so they only differ by what the ruleset
+    changes. The noise common to both runs cancels in their difference, which needs far fewer replicas
+    than comparing independent runs for the same precision.
+    '''
+
+    def __init__(self, rulesets=RULESETS):
+        self.rulesets = rulesets
+        self.arms = {}  # metric -> ([per-year series of each replica with the first ruleset], [... the second one])
+        self.scales = {}
+        self.replicas = 0
+
+    def add(self, summaries):
+        '''
+        :param summaries: the simulator.ensemble.summarize of the run of each ruleset of a pair
+        '''
+        first, second = summaries
+        for metric, (scale, values) in first.items():
+            if metric not in second:
+                continue
+            self.scales[metric] = scale
+            arms = self.arms.setdefault(metric, ([], []))
+            arms[0].append(values)
+            arms[1].append(second[metric][1])
+        self.replicas += 1
+
+    def values(self, metric):
+        '''
+        :return: the (replicas x years) pandas DataFrames of a metric for both rulesets, with a column per year
+        recorded by any run, NaN where a run didn't record it
+        '''
+        first, second = self.arms[metric]
+        both = aligned_years(first + second)
+        return both.iloc[:len(first)].reset_index(drop=True), both.iloc[len(first):].reset_index(drop=True)
+
+    def differences(self, confidence=0.95):
+        '''
+        Returns a tidy pandas DataFrame with, per metric and year, the mean of each ruleset, the mean difference
+        (first ruleset - second one) and its confidence interval (normal approximation, so better with a few dozen
+        replicas or more), and the variance reduction: how many times more replicas independent runs would need
+        for the same interval.
+        Both runs of a pair are compared on the same years, pairs counts the replicas where both recorded the year.
+        '''
+        import pandas as pd
+
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        first_name, second_name = (ruleset.name for ruleset in self.rulesets)
+        frames = []
+        for metric in self.arms:
+            first, second = self.values(metric)
+            years = first.columns.to_numpy()
+            difference = first.to_numpy(dtype=float) - second.to_numpy(dtype=float)
+            # Only the years recorded by both runs of a pair
+            paired = ~np.isnan(difference)
+            first = np.where(paired, first.to_numpy(dtype=float), np.nan)
+            second = np.where(paired, second.to_numpy(dtype=float), np.nan)
+            pairs = paired.sum(axis=0)
+
+            mean = np.nanmean(difference, axis=0)
+            ddof = 1 if self.replicas > 1 else 0
+            with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+                # A year with a single pair has no interval (NaN)
+                warnings.simplefilter('ignore', RuntimeWarning)
+                half_width = z * np.nanstd(difference, axis=0, ddof=ddof) / np.sqrt(pairs)
+                paired_variance = np.nanvar(difference, axis=0, ddof=ddof)
+                independent_variance = np.nanvar(first, axis=0, ddof=ddof) + np.nanvar(second, axis=0, ddof=ddof)
+                reduction = independent_variance / paired_variance
+            frames.append(pd.DataFrame({
+                'year': years,
+                'metric': metric,
+                'scale': self.scales[metric],
+                'pairs': pairs,
+                first_name: np.nanmean(first, axis=0),
+                second_name: np.nanmean(second, axis=0),
+                'difference': mean,
+                'low': mean - half_width,
+                'high': mean + half_width,
+                'variance_reduction': reduction,
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+
+def run_paired(setup=DEFAULT_SETUP, replicas=16, seed=0, processes=None, engine=Engine.objects, rulesets=RULESETS):
+    '''
+    Runs replicas of paired runs of a setup with two rulesets across a process pool, both runs of a pair
+    in the same worker, see PairedComparison
+    :param processes: size of the pool, all cores by default
+    '''
+    comparison = PairedComparison(rulesets)
+    tasks = [(setup, engine, replica_seed, rulesets) for replica_seed in replica_seeds(seed, replicas)]
+    with multiprocessing.Pool(processes) as pool:
+        for summaries in pool.imap(_run_pair, tasks):
+            comparison.add(summaries)
+    return comparison
@@ -1,4 +1,4 @@
-import random
+import numpy as np
 
 from simulator.house import new_random_house
 
@@ -7,11 +7,21 @@ def apply_custom_policy(state, setup, verbose=True):
     '''
     This corresponds to choices that people and founder can take
     '''
+    rng = state.rng.stream('policy')
+    if setup['market_clearing']:
+        tenants = np.array(list(state.house_tenants.values()), dtype=np.int64)
+        homeless = np.array(list(state.homeless_people), dtype=np.int64)
+        moved = clear_housing_market(state, setup, tenants, homeless,
+                                     lambda person_ids: [state.settle_dividends(p) for p in person_ids.tolist()],
+                                     verbose=verbose)
+        for tenant in moved.tolist():
+            state.people[tenant].changed_house += 1
+        return state
 
     for current_house, tenant in state.house_tenants.copy().items():
-        if (random.random() < setup['probability_of_changing_house']):
+        if (rng.random() < setup['probability_of_changing_house']):
             # print(f'tenant {tenant} tries to find another house')
-            prospect_house, price = state.random_available_house(state.people[tenant].money)
+            prospect_house, price = state.random_available_house(state.settle_dividends(tenant))
             if prospect_house is not None:
                 # print(f'{tenant} moves to house {prospect_house} for ${price}')
                 state.occupy_house(tenant, prospect_house)
@@ -21,8 +31,8 @@ def apply_custom_policy(state, setup, verbose=True):
 
     # All homeless people try to rent a house with a probability 0.9
     for person_id in state.homeless_people.copy():
-        if (random.random() < 0.9):
-            available_money = state.people[person_id].money
+        if (rng.random() < 0.9):
+            available_money = state.settle_dividends(person_id)
             # print(f'homeless {person_id} tries to find a house with ${available_money}')
             prospect_house, price = state.random_available_house(available_money)
             if prospect_house is not None:
@@ -35,10 +45,118 @@ def apply_custom_policy(state, setup, verbose=True):
 
     #  if there are few houses available, brother state tries to build new ones
     if len(state.available_houses) < setup['minimum_free_houses_policy']:
-        house, price = new_random_house(setup, f'new house {state.house_max_id}')
+        build_new_house(state, setup)
 
-        state.founder.money -= price
-        state.founder.period_spent_building_houses += price
-        state.add_new_house(house)
+    return state
+
+
+def build_new_house(state, setup):
+    house, price = new_random_house(setup, state.rng.stream('houses'), f'new house {state.house_max_id}')
+
+    state.founder.money -= price
+    state.founder.period_spent_building_houses += price
+    state.add_new_house(house)
+
+
+def match_searchers(budgets, rent_prices, rng):
+    '''
+    Assigns vacant houses to all the people searching one this month, in a single pass.
+    Searchers are served from the smallest budget up, each one gets the cheapest vacant house it can pay,
+    which houses as many searchers as possible. Searchers with the same budget are served in random order.
+    :param budgets: money of each searcher
+    :param rent_prices: rent of each vacant house, sorted
+    :param rng: simulator.rng.RandomStream for the order of the ties
+    :return: for each searcher, the position in rent_prices of the house it gets, or -1
+    '''
+    budgets = np.asarray(budgets, dtype=float)
+    order = np.lexsort((rng.randoms(len(budgets)), budgets))
+    affordable = np.searchsorted(rent_prices, budgets[order], side='left')
+
+    # The i-th searcher (from 1) is housed iff the cheapest house left is affordable, so the number of searchers
+    # housed up to it is matched[i] = min(matched[i - 1] + 1, affordable[i]) = i + min(0, min_j<=i affordable[j] - j)
+    rank = np.arange(1, len(budgets) + 1)
+    matched = rank + np.minimum(0, np.minimum.accumulate(affordable - rank))
+    housed = np.diff(matched, prepend=0) > 0
+
+    result = np.full(len(budgets), -1, dtype=np.int64)
+    result[order[housed]] = matched[housed] - 1
+    return result
+
+
+def clear_housing_market(state, setup, tenants, homeless, money, verbose=True):
+    '''
+    Bulk version of the policy: the tenants that want to move and the homeless people that look for a house
+    search at the same time and the market is cleared with match_searchers.
+    If there are still few houses available, the founder builds all the missing ones at once.
+    :param tenants: ids of the current tenants
+    :param homeless: ids of the homeless people
+    :param money: returns the money of the given person ids
+    :return: the ids of the tenants that moved
+    '''
+    rng = state.rng.stream('policy')
+    movers = tenants[rng.randoms(len(tenants)) < setup['probability_of_changing_house']]
+    # All homeless people try to rent a house with a probability 0.9
+    homeless = homeless[rng.randoms(len(homeless)) < 0.9]
+    searchers = np.concatenate([movers, homeless])
+    if state.profiler is not None:
+        state.profiler.count('searches_attempted', len(searchers))
+
+    rent_prices, house_ids = state.available_houses.sorted_houses()
+    houses = match_searchers(money(searchers), rent_prices, rng)
+
+    for i in np.flatnonzero(houses != -1).tolist():
+        state.occupy_house(int(searchers[i]), int(house_ids[houses[i]]))
+
+    if verbose:
+        not_housed = np.count_nonzero(houses[len(movers):] == -1)
+        if not_housed:
+            print(f'{not_housed} homeless did not find a house, available_houses:{len(state.available_houses)}')
+
+    #  if there are few houses available, brother state builds the missing ones
+    for i in range(setup['minimum_free_houses_policy'] - len(state.available_houses)):
+        build_new_house(state, setup)
+
+    return movers[houses[:len(movers)] != -1]
+
+
+def apply_vectorized_policy(state, setup, verbose=True):
+    '''
+    Same choices as apply_custom_policy, for a simulator.vectorized.VectorizedCommunity.
+    The coin flips are drawn at once, the search of each person is a bisection in the vacancy index.
+    '''
+    if setup['market_clearing']:
+        moved = clear_housing_market(state, setup, state.tenants(), state.homeless_ids(),
+                                     lambda person_ids: state.money[person_ids], verbose=verbose)
+        state.changed_house[moved] += 1
+        return state
+
+    rng = state.rng.stream('policy')
+    tenants = state.tenants()
+    movers = tenants[rng.randoms(len(tenants)) < setup['probability_of_changing_house']]
+    if state.profiler is not None:
+        state.profiler.count('searches_attempted', len(movers))
+    for tenant in movers.tolist():
+        prospect_house = state.vacant_houses.random_below(state.money[tenant], rng.randrange)
+        if prospect_house is not None:
+            state.occupy_house(tenant, prospect_house)
+            state.changed_house[tenant] += 1
+
+    # All homeless people try to rent a house with a probability 0.9
+    homeless = state.homeless_ids()
+    homeless = homeless[rng.randoms(len(homeless)) < 0.9]
+    if state.profiler is not None:
+        state.profiler.count('searches_attempted', len(homeless))
+    for person_id in homeless.tolist():
+        available_money = state.money[person_id]
+        prospect_house = state.vacant_houses.random_below(available_money, rng.randrange)
+        if prospect_house is not None:
+            state.occupy_house(person_id, prospect_house)
+        elif verbose:
+            print(
+                f'homeless {person_id} did not find a house, available_money:{available_money} available_houses:{len(state.vacant_houses)}')
+
+    #  if there are few houses available, brother state tries to build new ones
+    if len(state.vacant_houses) < setup['minimum_free_houses_policy']:
+        build_new_house(state, setup)
 
     return state
@@ -0,0 +1,123 @@
+import time
+
+from simulator.setup import MONTHS_PER_YEAR
+from simulator.stats import ColumnTable
+
+'''
+The rows of the profile table, one per measure and trace period:
+the seconds of a step ('wall', 'cpu'), the increase of a counter ('count')
+or the latency of the months of the period ('latency_mean', 'latency_max').
+'''
+PROFILE_COLUMNS = (
+    ('tick', 'int'),
+    ('name', 'category'),
+    ('kind', 'category'),
+    ('value', 'float'),
+)
+
+COUNTERS = (
+    'houses_scanned',  # Houses whose rent is collected by the shares step
+    'dividends_paid',  # Share incomes credited to people
+    'searches_attempted',  # People looking for a house in the policy step
+    'evictions',  # Tenants that cannot pay their rent
+)
+
+
+class Profiler:
+    '''
+    Opt-in instrumentation of a run: wall and CPU time of each step of the months, counters of the work done
+    by the steps and the latency of each month. See simulator.main.advance.
+
+    The totals are kept in wall, cpu and counters, and every trace_every months the values of the period
+    are appended to a table with PROFILE_COLUMNS, to see how they evolve along the run.
+    '''
+
+    def __init__(self, trace_every=MONTHS_PER_YEAR):
+        self.trace_every = trace_every
+        self.wall = {}  # step name -> seconds
+        self.cpu = {}  # step name -> seconds
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.months = 0
+        self.latency_total = 0
+        self.latency_max = 0
+        self.table = ColumnTable(PROFILE_COLUMNS)
+
+        # Totals at the start of the trace period
+        self._period_wall = {}
+        self._period_cpu = {}
+        self._period_counters = dict(self.counters)
+        self._period_latencies = []
+        self._month_started = None
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def step(self, name, function, *args, **kwargs):
+        '''
+        Calls function(*args, **kwargs) and adds the time it took to the step name
+        '''
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        result = function(*args, **kwargs)
+        self.cpu[name] = self.cpu.get(name, 0) + time.process_time() - cpu_started
+        self.wall[name] = self.wall.get(name, 0) + time.perf_counter() - wall_started
+        return result
+
+    def start_month(self):
+        self._month_started = time.perf_counter()
+
+    def end_month(self, tick):
+        '''
+        :param tick: the tick of the community once the month is done
+        '''
+        latency = time.perf_counter() - self._month_started
+        self.months += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self._period_latencies.append(latency)
+        if tick % self.trace_every == 0:
+            self.trace(tick)
+
+    def trace(self, tick):
+        '''
+        Appends the values of the period that ends at tick to the table
+        '''
+        rows = []
+        for kind, totals, before in (('wall', self.wall, self._period_wall), ('cpu', self.cpu, self._period_cpu)):
+            for name, seconds in totals.items():
+                rows.append((name, kind, seconds - before.get(name, 0)))
+        for name, value in self.counters.items():
+            rows.append((name, 'count', value - self._period_counters.get(name, 0)))
+        if self._period_latencies:
+            rows.append(('month', 'latency_mean', sum(self._period_latencies) / len(self._period_latencies)))
+            rows.append(('month', 'latency_max', max(self._period_latencies)))
+
+        self.table.extend({
+            'tick': [tick] * len(rows),
+            'name': [name for name, _, _ in rows],
+            'kind': [kind for _, kind, _ in rows],
+            'value': [value for _, _, value in rows],
+        })
+        self._period_wall = dict(self.wall)
+        self._period_cpu = dict(self.cpu)
+        self._period_counters = dict(self.counters)
+        self._period_latencies = []
+
+    def to_dataframe(self):
+        return self.table.to_dataframe()
+
+    def summary(self):
+        '''
+        The totals of the run as text, the steps from the slowest
+        '''
+        total = sum(self.wall.values())
+        lines = [f'Profile of {self.months} months:']
+        for name in sorted(self.wall, key=self.wall.get, reverse=True):
+            share = self.wall[name] / total if total else 0
+            lines.append(f'  {name:<18} wall {self.wall[name]:9.3f}s ({share:6.1%})  cpu {self.cpu[name]:9.3f}s')
+        for name, value in self.counters.items():
+            lines.append(f'  {name:<18} {value}')
+        if self.months:
+            mean = self.latency_total / self.months
+            lines.append(f'  month latency      mean {mean * 1000:.3f}ms  max {self.latency_max * 1000:.3f}ms')
+        return '\n'.join(lines)
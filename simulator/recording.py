@@ -0,0 +1,96 @@
+from simulator.setup import MONTHS_PER_YEAR
+
+GENERAL_ROWS = 5  # Rows of the general table per recording
+
+RECORDING_KEYS = ('stats_interval_years', 'stats_tables', 'stats_people_sample', 'stats_max_rows')
+
+
+class RecordingPolicy:
+    '''
+    What the stats of a community record and when, from the stats_* keys of its setup:
+    every stats_interval_years years, the tables in stats_tables, with all the people or a sample of them.
+
+    The sample is a reservoir of stats_people_sample people, traced from the moment they are added:
+    every person added has the same chance to be in it, and a death frees a place for the next ones.
+    With stats_max_rows, a recording is only done if the rows recorded so far, plus the ones of the recordings
+    left at the current interval, fit in the cap, otherwise the interval is doubled until they do.
+    '''
+
+    def __init__(self, setup, rng, rows=0):
+        '''
+        :param rng: the simulator.rng.RandomStream of the community, the sample draws from a stream spawned from it
+        :param rows: rows already recorded, e.g. before a fork with another policy
+        '''
+        self.interval = setup['stats_interval_years']
+        self.tables = frozenset(setup['stats_tables'])
+        self.sample_size = setup['stats_people_sample']
+        self.max_rows = setup['stats_max_rows']
+        self.rows = rows
+
+        self.sample = []
+        self.seen = 0
+        self.rng = rng.spawn() if self.sample_size is not None else None
+
+    def person_added(self, person_id):
+        if self.sample_size is None:
+            return
+        self.seen += 1
+        if len(self.sample) < self.sample_size:
+            self.sample.append(person_id)
+        elif self.rng.random() * self.seen < self.sample_size:
+            self.sample[self.rng.randrange(len(self.sample))] = person_id
+
+    def person_removed(self, person_id):
+        if self.sample_size is not None and person_id in self.sample:
+            self.sample.remove(person_id)
+
+    def traced(self, person_ids):
+        '''
+        The people recorded among person_ids (all the people alive), in order
+        '''
+        if self.sample_size is None:
+            return person_ids
+        return sorted(self.sample)
+
+    def recording_rows(self, traced, people, example_house_owners, dummies):
+        '''
+        Rows a recording adds (at most) with the given number of people traced, people alive,
+        owners of the example house and dummy people
+        '''
+        rows = 0
+        if 'people' in self.tables:
+            rows += traced + dummies
+        if 'general' in self.tables:
+            rows += GENERAL_ROWS
+        if 'example_house' in self.tables:
+            rows += 1 + example_house_owners
+        if 'distribution' in self.tables:
+            # At most a bucket per person and metric, and the founder
+            rows += 2 * people + 1
+        return rows
+
+    def records(self, tick, months_to_run, rows):
+        '''
+        Whether the stats are recorded at tick, the rows recorded are then counted
+        :param months_to_run: number_of_months_to_run of the setup, to know the recordings left
+        :param rows: returns the number of rows the recording would add, only called with a cap
+        '''
+        if tick % MONTHS_PER_YEAR != 0:
+            return False
+        year = tick // MONTHS_PER_YEAR
+        if year % self.interval != 0:
+            return False
+        if self.max_rows is None:
+            return True
+
+        rows = rows()
+        years_left = max(0, (months_to_run - 1) // MONTHS_PER_YEAR - year)
+        while self.rows + rows * (1 + years_left // self.interval) > self.max_rows:
+            if years_left // self.interval == 0:
+                # Not even this one fits
+                return False
+            self.interval *= 2
+            if year % self.interval != 0:
+                return False
+        self.rows += rows
+        return True
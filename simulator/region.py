@@ -0,0 +1,233 @@
+import multiprocessing
+
+import numpy as np
+
+from simulator.ensemble import replica_seeds
+from simulator.main import run_for_one_month, start
+from simulator.setup import MONTHS_PER_YEAR
+from simulator.stats import Stats, TABLES
+
+# Category columns whose values are only unique within a shard, they get the name of the shard as prefix
+SHARD_CATEGORIES = {
+    'people': ('id', 'parent', 'current_house'),
+    'example_house': ('name',),
+}
+SHARED_VALUES = ('dummy', 'None')  # Values that are the same in every shard
+
+
+def _shard_month(state, arrivals, quota, migration_probability):
+    '''
+    One month of a shard: the people arriving from other shards settle, up to quota homeless people leave,
+    then the month runs
+    :return: the people that left, and the homeless people, free capacity and stats of the shard after the month
+    '''
+    for person in arrivals:
+        state.immigrate(person)
+
+    departures = []
+    if quota:
+        for person_id in sorted(state.homeless_people):
+            if len(departures) == quota:
+                break
+            if state.rng.stream('migration').random() < migration_probability:
+                departures.append(state.emigrate(person_id))
+
+    state = run_for_one_month(state, state.setup, verbose=False)
+
+    # The stats of a year are recorded at its first month, they are sent and the shard starts new ones
+    stats = None
+    if (state.current_tick - 1) % MONTHS_PER_YEAR == 0:
+        stats, state.stats = state.stats, Stats()
+    capacity = min(len(state.available_houses), state.setup['max_people'] - len(state.people))
+    return departures, len(state.homeless_people), max(0, capacity), stats
+
+
+def _shard_worker(connection, shards, migration_probability):
+    '''
+    Runs some shards in a worker process, a month at a time.
+    Each message is shard index -> (arrivals, quota) and gets shard index -> result of _shard_month as reply,
+    None stops the worker.
+    :param shards: shard index -> (setup, seed)
+    '''
+    try:
+        states = {index: start(setup=setup, verbose=False, seed=seed) for index, (setup, seed) in shards.items()}
+        connection.send(None)
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            connection.send({index: _shard_month(states[index], arrivals, quota, migration_probability)
+                             for index, (arrivals, quota) in message.items()})
+    except Exception as e:
+        connection.send(e)
+    finally:
+        connection.close()
+
+
+def merge_shard_stats(shard_stats, names):
+    '''
+    Puts together the stats of the same year of several shards: the people and example houses of all the shards,
+    with the shard name as prefix of their ids, their distribution sketches (see simulator.sketches), and the general
+    stats summed over the shards (people, homeless people, houses, and the money and spending of all the founders).
+    :param shard_stats: a simulator.stats.Stats per shard
+    :param names: the name of each shard
+    '''
+    merged = Stats()
+    general = {}
+    for stats, shard_name in zip(shard_stats, names):
+        for table_name in TABLES:
+            if table_name == 'general':
+                continue
+            columns, categories = stats.table(table_name).chunk()
+            for column in SHARD_CATEGORIES.get(table_name, ()):
+                categories[column] = [value if value in SHARED_VALUES else f'{shard_name}/{value}'
+                                      for value in categories[column]]
+            merged.table(table_name).extend_chunk(columns, categories)
+
+        table = stats.general
+        rows = zip(table.column('year').tolist(), table.decode('type', table.column('type')).tolist(),
+                   table.decode('scale', table.column('scale')).tolist(), table.column('amount').tolist())
+        for year, metric, scale, amount in rows:
+            general[(year, metric, scale)] = general.get((year, metric, scale), 0) + amount
+
+    for (year, metric, scale), amount in general.items():
+        merged.add_general_stats_record({'year': year, 'amount': amount, 'type': metric, 'scale': scale})
+    return merged
+
+
+class Region:
+    '''
+    Many communities (shards), each with its own founder, houses and setup, run in worker processes.
+
+    The shards advance in lockstep, one month at a time. At each month boundary the homeless people of a shard
+    may migrate to the shards with room for them, in batches: the coordinator gives each shard a quota of
+    departures from the homeless people and free capacity (vacant houses, within max_people) that the shards
+    reported the month before, and the people that leave arrive at the next boundary.
+    The stats of all the shards are merged every year, see merge_shard_stats.
+
+    Only the objects engine is supported, see simulator.simulation.Community.emigrate.
+    '''
+
+    def __init__(self, setups, seed=0, processes=None, migration_probability=0.5, stats_sink=None, names=None):
+        '''
+        :param setups: the setup of each shard
+        :param seed: the seeds of the shards are derived from it, see simulator.ensemble.replica_seeds
+        :param processes: worker processes, the shards are spread over them, by default one per core
+        :param migration_probability: probability that a homeless person leaves when its shard has a quota
+        :param stats_sink: optional simulator.sinks sink for the region stats
+        :param names: the name of each shard, 'shard i' by default
+        '''
+        self.setups = list(setups)
+        self.names = names if names is not None else [f'shard {i}' for i in range(len(self.setups))]
+        self.stats = Stats(sink=stats_sink)
+        self.current_tick = 0
+        self.migrations = 0
+
+        processes = min(processes or multiprocessing.cpu_count(), len(self.setups))
+        seeds = replica_seeds(seed, len(self.setups))
+        self.workers = []
+        for worker in range(processes):
+            indexes = range(worker, len(self.setups), processes)
+            coordinator, connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_shard_worker,
+                args=(connection, {index: (self.setups[index], seeds[index]) for index in indexes},
+                      migration_probability),
+                daemon=True)
+            process.start()
+            connection.close()
+            self.workers.append((coordinator, process, list(indexes)))
+        for coordinator, _, _ in self.workers:
+            self._receive(coordinator)
+
+        self.arrivals = [[] for _ in self.setups]
+        self.quotas = [0] * len(self.setups)
+        self.routes = [[] for _ in self.setups]  # shard index -> (destination, people) of its next departures
+
+    def _receive(self, coordinator):
+        reply = coordinator.recv()
+        if isinstance(reply, Exception):
+            self.close()
+            raise RuntimeError('A shard failed') from reply
+        return reply
+
+    def _plan_migrations(self, homeless, capacity):
+        '''
+        Quotas of departures of each shard and their destinations, the first shards are served first.
+        The people already on their way take part of the capacity of their destination.
+        '''
+        capacity = np.array(capacity) - np.array([len(arrivals) for arrivals in self.arrivals])
+        for origin in range(len(self.setups)):
+            self.routes[origin] = []
+            wanted = homeless[origin]
+            for destination in np.flatnonzero(capacity > 0).tolist():
+                if not wanted:
+                    break
+                if destination == origin:
+                    continue
+                people = min(wanted, int(capacity[destination]))
+                self.routes[origin].append((destination, people))
+                capacity[destination] -= people
+                wanted -= people
+            self.quotas[origin] = homeless[origin] - wanted
+
+    def advance(self, months=None):
+        '''
+        Runs all the shards for some months, by default until the end of the run of the first setup
+        '''
+        if months is None:
+            months = self.setups[0]['number_of_months_to_run'] - self.current_tick
+        for i in range(months):
+            for coordinator, _, indexes in self.workers:
+                coordinator.send({index: (self.arrivals[index], self.quotas[index]) for index in indexes})
+            results = {}
+            for coordinator, _, _ in self.workers:
+                results.update(self._receive(coordinator))
+            self.current_tick += 1
+
+            self.arrivals = [[] for _ in self.setups]
+            for origin in range(len(self.setups)):
+                departures = results[origin][0]
+                self.migrations += len(departures)
+                for destination, people in self.routes[origin]:
+                    self.arrivals[destination].extend(departures[:people])
+                    departures = departures[people:]
+
+            self._plan_migrations([results[index][1] for index in range(len(self.setups))],
+                                  [results[index][2] for index in range(len(self.setups))])
+
+            shard_stats = [(results[index][3], name) for index, name in enumerate(self.names)
+                           if results[index][3] is not None]
+            if shard_stats:
+                self.stats.extend(merge_shard_stats(*zip(*shard_stats)))
+        return self
+
+    def close(self):
+        '''
+        Stops the workers
+        :return: the region stats
+        '''
+        for coordinator, process, _ in self.workers:
+            try:
+                coordinator.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            coordinator.close()
+            process.join()
+        self.workers = []
+        self.stats.close()
+        return self.stats
+
+
+def run_region(setups, months=None, seed=0, processes=None, migration_probability=0.5, stats_sink=None):
+    '''
+    Runs a region of communities, see Region
+    :return: the region stats, a simulator.stats.Stats
+    '''
+    region = Region(setups, seed=seed, processes=processes, migration_probability=migration_probability,
+                    stats_sink=stats_sink)
+    try:
+        region.advance(months)
+    finally:
+        stats = region.close()
+    return stats
@@ -0,0 +1,122 @@
+import zlib
+
+import numpy as np
+
+BLOCK_SIZE = 4096
+
+
+class _BufferedDraws:
+    '''
+    Values of one distribution of a generator, drawn block_size at a time
+    '''
+
+    def __init__(self, generator, distribution, block_size):
+        self.generator = generator
+        self.distribution = distribution  # name of the numpy.random.Generator method, called with a size
+        self.block_size = block_size
+        self.values = np.empty(0)
+        self.scalars = []  # The block as Python floats, for single draws
+        self.position = 0
+
+    def _refill(self):
+        self.values = getattr(self.generator, self.distribution)(self.block_size)
+        self.scalars = self.values.tolist()
+        self.position = 0
+
+    def next(self):
+        if self.position == len(self.scalars):
+            self._refill()
+        value = self.scalars[self.position]
+        self.position += 1
+        return value
+
+    def take(self, count):
+        '''
+        The next count values as an array, the same ones count calls to next would return
+        '''
+        parts = []
+        while count > 0:
+            if self.position == len(self.scalars):
+                self._refill()
+            part = self.values[self.position:self.position + count]
+            self.position += len(part)
+            count -= len(part)
+            parts.append(part)
+        if not parts:
+            return np.empty(0)
+        return np.concatenate(parts)
+
+
+class RandomStream:
+    '''
+    The random numbers of one simulation run, owned by its community instead of the global random modules,
+    so runs can go on side by side, in threads or processes, and the same seed gives the same trajectory.
+    Uniforms and standard normals are drawn from NumPy in blocks and handed out one by one or as arrays:
+    single and bulk draws read the same sequence, a draw is mostly an index increment.
+    '''
+
+    def __init__(self, seed=None, block_size=BLOCK_SIZE, named_streams=False):
+        '''
+        :param seed: an int, a sequence of ints or a numpy.random.SeedSequence, None for a fresh random seed
+        :param named_streams: each kind of draw gets its own stream, see stream
+        '''
+        # Kept to derive other streams from it, the generator doesn't expose it in every NumPy version
+        self.seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.generator = np.random.default_rng(self.seed_seq)
+        self._uniforms = _BufferedDraws(self.generator, 'random', block_size)
+        self._normals = _BufferedDraws(self.generator, 'standard_normal', block_size)
+        self.named_streams = named_streams
+        self._streams = {}
+
+    def stream(self, name):
+        '''
+        The stream of one kind of draws ('life', 'income', 'people', 'houses', 'policy'...).
+        Without named streams it's this stream. With them, it's a stream of its own derived from the seed and name,
+        so two runs with the same seed draw the same births and deaths, salaries... even when they made
+        a different number of draws of other kinds, e.g. with another ruleset (common random numbers).
+        '''
+        if not self.named_streams:
+            return self
+        stream = self._streams.get(name)
+        if stream is None:
+            spawn_key = self.seed_seq.spawn_key + (zlib.crc32(name.encode()),)
+            stream = RandomStream(np.random.SeedSequence(self.seed_seq.entropy, spawn_key=spawn_key),
+                                  block_size=self._uniforms.block_size)
+            self._streams[name] = stream
+        return stream
+
+    def random(self):
+        '''
+        A uniform float in [0, 1)
+        '''
+        return self._uniforms.next()
+
+    def randrange(self, stop):
+        '''
+        A uniform integer in [0, stop)
+        '''
+        return int(self._uniforms.next() * stop)
+
+    def randint(self, low, high):
+        '''
+        A uniform integer in [low, high], both included
+        '''
+        return low + int(self._uniforms.next() * (high - low + 1))
+
+    def normal(self, mean, sigma):
+        return mean + sigma * self._normals.next()
+
+    def randoms(self, count):
+        '''
+        count uniform floats in [0, 1), as an array
+        '''
+        return self._uniforms.take(count)
+
+    def normals(self, mean, sigma, count):
+        return mean + sigma * self._normals.take(count)
+
+    def spawn(self):
+        '''
+        A new stream, independent of this one and derived from its seed, drawing from it doesn't change this one
+        '''
+        return RandomStream(self.seed_seq.spawn(1)[0], block_size=self._uniforms.block_size)
@@ -8,6 +8,12 @@ class Ruleset(Enum):
     normal_rent = 2
 
 
+@unique
+class Engine(Enum):
+    objects = 1  # One Shareholder / House object per agent (simulator.simulation.Community)
+    arrays = 2  # NumPy columns per attribute (simulator.vectorized.VectorizedCommunity)
+
+
 YEARS_A_PERSON_LIVES = 100  # Max number of years a person lives
 MONTHS_A_PERSON_LIVES = YEARS_A_PERSON_LIVES * 12  # Max number of months a person will ever live
 MONTHS_PER_YEAR = 12
@@ -21,10 +27,23 @@ DEFAULT_SETUP = {
     'initial_number_of_houses': 20,
     'allow_inheritance': False,
     'ruleset': Ruleset.by_shares,
+    # Keep the shares in a houses x people sparse matrix, pay all rents at once (Engine.arrays always does)
+    'sparse_ownership': False,
+    # Sample the months of births and deaths in advance instead of every month, Engine.objects only
+    # (Engine.arrays raises ValueError)
+    'event_scheduling': False,
+    'named_streams': False,  # Each kind of random draw has its own stream, see simulator.rng.RandomStream.stream
+
+    # stats recording, see simulator.recording
+    'stats_interval_years': 1,  # Years between two recordings of the stats
+    'stats_tables': ('people', 'general', 'example_house', 'distribution'),  # Tables recorded
+    'stats_people_sample': None,  # Record only a reservoir sample of this many people, None records everyone
+    'stats_max_rows': None,  # Cap of the rows recorded, the interval is widened so it's never exceeded
 
     # agents policy
     'probability_of_changing_house': 10 / MONTHS_A_PERSON_LIVES,
     'minimum_free_houses_policy': 2,
+    'market_clearing': False,  # All searchers of a month are matched to vacant houses at once
 
     # House costs
     'average_house_cost': MONTHS_PER_YEAR * 40 * 15,  # 7200
@@ -40,10 +59,13 @@ DEFAULT_SETUP = {
 }
 
 
+# Gompertz law of mortality, hazard per month = A * exp(k * age)
+GOMPERTZ_A = 8.5e-8
+GOMPERTZ_K = 0.148
+
+
 def probability_of_death_per_month(age):
-    A = 8.5e-8
-    k = 0.148
-    return A * math.exp(k * age)
+    return GOMPERTZ_A * math.exp(GOMPERTZ_K * age)
 
 
 def probability_of_birth_per_month():
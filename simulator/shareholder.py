@@ -1,12 +1,12 @@
-import random
-
 from simulator.setup import probability_of_birth_per_month, probability_of_death_per_month
-import numpy as np
 
 
-def new_random_person(name='', parent=None):
-    age = random.randint(14, 20)
-    money = random.randint(10, 100)
+def new_random_person(rng, name='', parent=None):
+    '''
+    :param rng: the simulator.rng.RandomStream of the community
+    '''
+    age = rng.randint(14, 20)
+    money = rng.randint(10, 100)
     return Shareholder(age=age, money=money, name=name, parent=parent)
 
 
@@ -29,8 +29,8 @@ class Shareholder():
     def is_retired(self):
         return self.age > 60
 
-    def work(self, setup):
-        income = np.random.normal(setup['average_salary'], setup['sigma_salary'])
+    def work(self, setup, rng):
+        income = rng.normal(setup['average_salary'], setup['sigma_salary'])
         # If person is retired, the salary is diminished
         if self.is_retired:
             income = income * setup['retirement_factor']
@@ -38,10 +38,10 @@ class Shareholder():
         self.period_work_income = income
         self.money += income
 
-    def produces_a_child_this_month(self):
+    def produces_a_child_this_month(self, rng):
         b_prob = probability_of_birth_per_month()
-        return random.random() < b_prob
+        return rng.random() < b_prob
 
-    def dies_this_month(self):
+    def dies_this_month(self, rng):
         d_prob = probability_of_death_per_month(self.age)
-        return random.random() < d_prob
+        return rng.random() < d_prob
@@ -1,12 +1,27 @@
-import random
+import heapq
 
+import numpy as np
+
+from simulator.events import BIRTH, DEATH, months_until_birth, months_until_death
+from simulator.ownership import OwnershipMatrix
+from simulator.recording import RECORDING_KEYS, RecordingPolicy
+from simulator.rng import RandomStream
 from simulator.shareholder import new_random_person
+from simulator.sketches import distribution_records
 from simulator.setup import MONTHS_PER_YEAR, DEFAULT_SETUP, Ruleset
 from simulator.stats import Stats
+from simulator.vacancy import VacancyIndex
 
 
 class Community:
-    def __init__(self, house_tenant=None, people=None, houses=None, founder=None, setup=DEFAULT_SETUP):
+    profiler = None  # simulator.profiling.Profiler of the running months, set by simulator.main.advance
+
+    def __init__(self, house_tenant=None, people=None, houses=None, founder=None, setup=DEFAULT_SETUP, stats=None,
+                 rng=None):
+        '''
+        :param rng: simulator.rng.RandomStream of all the random draws of the community, freshly seeded by default,
+        each kind of draw is made from rng.stream(kind)
+        '''
 
         if houses is None:
             houses = {}
@@ -25,9 +40,80 @@ class Community:
         self.people_max_id = len(people)
         self.house_max_id = len(houses)
 
+        '''
+        Indexes kept up to date on births, deaths, moves and evictions,
+        house_tenants is the house_id -> person_id relation they complement.
+        '''
+        self.tenancy = {}  # person_id -> house_id
+        self.vacant_houses = VacancyIndex()
+        self.homeless = set()
+        self.children = {}  # parent_id -> ids of the children, ordered by birth
+        self.owned_houses = {}  # person_id -> ids of the houses where the person has shares
+        for house_id, person_id in self.house_tenants.items():
+            self.tenancy[person_id] = house_id
+        for person_id, person in self.people.items():
+            if person_id not in self.tenancy:
+                self.homeless.add(person_id)
+            if person.parent is not None:
+                self.children.setdefault(person.parent, {})[person_id] = None
+        for house_id, house in self.houses.items():
+            if house_id not in self.house_tenants:
+                self.vacant_houses.add(house_id, house.rent_price)
+            for person_id in house.share_owners:
+                self.owned_houses.setdefault(person_id, set()).add(house_id)
+
+        # Optionally, the shares are also kept in a houses x people sparse matrix to pay all the rents at once
+        self.ownership = None
+        if setup['sparse_ownership']:
+            self._build_ownership()
+
         self.current_tick = 0
 
-        self.stats = Stats()
+        self.stats = Stats() if stats is None else stats
+        self.rng = RandomStream() if rng is None else rng
+        self._start_recording()
+
+        '''
+        With event_scheduling, the births and deaths of the people are sampled in advance
+        and wait in a priority queue of (tick, person_id, kind).
+        life_step_tick is the tick of the last life and death step, newborns have their first events after it.
+        '''
+        self.events = []
+        self.life_step_tick = -1
+        if setup['event_scheduling']:
+            for person_id in self.people:
+                self._schedule_life_events(person_id)
+
+    def _build_ownership(self):
+        self.ownership = OwnershipMatrix()
+        for house_id, house in self.houses.items():
+            self.ownership.add_house(house.founder_shares)
+            for person_id in house.share_owners:
+                self._sync_ownership(house_id, person_id)
+
+    def _start_recording(self, rows=0):
+        self.recording = RecordingPolicy(self.setup, self.rng, rows=rows)
+        for person_id in self.people:
+            self.recording.person_added(person_id)
+
+    def apply_setup(self, setup):
+        '''
+        Goes on with another setup from now on, e.g. a fork of a checkpoint with another ruleset
+        '''
+        previous, self.setup = self.setup, setup
+        if any(setup[key] != previous[key] for key in RECORDING_KEYS):
+            self._start_recording(rows=self.recording.rows)
+        self.inheritance = setup['allow_inheritance']
+        self.ruleset = setup['ruleset']
+        if not setup['sparse_ownership']:
+            self.ownership = None
+        elif self.ownership is None:
+            self._build_ownership()
+        if not setup['event_scheduling']:
+            self.events = []
+        elif not self.events:
+            for person_id in self.people:
+                self._schedule_life_events(person_id)
 
     def next_timestep(self):
         '''
@@ -35,46 +121,72 @@ class Community:
         '''
         year = int(self.current_tick / MONTHS_PER_YEAR)
 
+        if self.recording.records(self.current_tick, self.setup['number_of_months_to_run'], self._stats_rows):
+            if 'people' in self.recording.tables:
+                self.record_people_stats(year)
+            if 'general' in self.recording.tables:
+                self.record_general_stats(year)
+            if 'example_house' in self.recording.tables:
+                self.record_example_house_stats(year)
+            if 'distribution' in self.recording.tables:
+                self.record_distribution_stats(year)
+
         if self.current_tick % MONTHS_PER_YEAR == 0:
-            self.record_people_stats(year)
-            self.record_general_stats(year)
-            self.record_example_house_stats(year)
+            # Reset the incomes for this period, once the dividends of the period are collected
+            for k, person in self.people.items():
+                self.settle_dividends(k)
+                person.period_share_income = 0
+                person.period_work_income = 0
 
         self.current_tick += 1
 
+    def _stats_rows(self):
+        return self.recording.recording_rows(len(self.recording.traced(self.people)), len(self.people),
+                                             len(self.houses[0].share_owners), 2 if self.inheritance else 0)
+
     @property
     def available_houses(self):
         '''
-        Returns all unocuppied houses
+        Returns all unocuppied houses (the index itself, not a copy)
         '''
-        result = set(self.houses.keys())
-        for k, v in self.house_tenants.items():
-            result.remove(k)
-        return result
+        return self.vacant_houses
 
     def random_available_house(self, budget):
         '''
-        Returns a random unoccupied house
+        Returns a random unoccupied house with rent_price < budget
         :param budget:
         :return:
         '''
-        houses = list(range(len(self.houses)))
-        random.shuffle(houses)
-        for i in houses:
-            if self.houses[i].rent_price < budget and i not in self.house_tenants:
-                return i, self.houses[i].rent_price
-        return None, None
+        if self.profiler is not None:
+            self.profiler.count('searches_attempted')
+        house_id = self.vacant_houses.random_below(budget, self.rng.stream('policy').randrange)
+        if house_id is None:
+            return None, None
+        return house_id, self.houses[house_id].rent_price
 
     @property
     def homeless_people(self):
         '''
-        returns the current homeless people
+        returns the current homeless people (the index itself, not a copy)
         Homeless people = All people that are not tenants
         '''
-        result = set(self.people.keys())
-        for k, v in self.house_tenants.items():
-            result.remove(v)
-        return result
+        return self.homeless
+
+    def settle_dividends(self, person_id):
+        '''
+        Credits the person with the dividends of all the houses where it has shares.
+        Dividends are collected lazily, this needs to be called before reading the money of a person.
+        :param person_id:
+        :return: the money of the person
+        '''
+        person = self.people[person_id]
+        for house_id in sorted(self.owned_houses.get(person_id, ())):
+            amount = self.houses[house_id].settle_dividends(person_id)
+            person.money += amount
+            person.period_share_income += amount  # Only for stats
+            if amount and self.profiler is not None:
+                self.profiler.count('dividends_paid')
+        return person.money
 
     def occupy_house(self, person_id, new_house_id):
         '''
@@ -84,19 +196,29 @@ class Community:
         :return:
         '''
         self._return_house(person_id)
+        if new_house_id in self.house_tenants:
+            # The previous tenant is replaced
+            self._return_house(self.house_tenants[new_house_id])
         # The person is assigned to the new house
         self.house_tenants[new_house_id] = person_id
+        self.tenancy[person_id] = new_house_id
+        self.vacant_houses.discard(new_house_id)
+        self.homeless.discard(person_id)
 
     def _return_house(self, person_id):
         '''
         Unsets the person_id as tenant of any house
         :param person_id:
-        :return:
+        :return: the house the person leaves, or None
         '''
-        for k, v in self.house_tenants.items():
-            if v == person_id:
-                del self.house_tenants[k]
-                return
+        house_id = self.tenancy.pop(person_id, None)
+        if house_id is None:
+            return None
+        del self.house_tenants[house_id]
+        self.vacant_houses.add(house_id, self.houses[house_id].rent_price)
+        if person_id in self.people:
+            self.homeless.add(person_id)
+        return house_id
 
     def do_life_and_death_step(self):
         '''
@@ -106,13 +228,18 @@ class Community:
 
         self.founder.age += 1 / MONTHS_PER_YEAR
 
+        if self.setup['event_scheduling']:
+            self._life_and_death_events()
+            return
+
+        rng = self.rng.stream('life')
         for k, person in self.people.copy().items():
 
             if len(self.people) < self.setup['max_people']:
-                if person.produces_a_child_this_month():
+                if person.produces_a_child_this_month(rng):
                     self.add_new_born(parent=k)
 
-            if person.dies_this_month():
+            if person.dies_this_month(rng):
                 self._person_dies(k)
             else:
                 # If person don't die, then ages
@@ -121,70 +248,144 @@ class Community:
         if len(self.people) < self.setup['min_people']:
             self.add_new_born(parent=None)
 
+    def _schedule_life_events(self, person_id):
+        first_tick = self.current_tick if self.life_step_tick < self.current_tick else self.current_tick + 1
+        age = self.people[person_id].age
+        rng = self.rng.stream('life')
+        heapq.heappush(self.events, (first_tick + months_until_birth(rng), person_id, BIRTH))
+        heapq.heappush(self.events, (first_tick + months_until_death(age, rng), person_id, DEATH))
+
+    def _life_and_death_events(self):
+        '''
+        Event scheduling version of do_life_and_death_step: only the births and deaths of this month are handled,
+        in the same order (by person, births first) so the room for children is the same
+        '''
+        self.life_step_tick = self.current_tick
+        people_before = self.people_max_id
+
+        while self.events and self.events[0][0] <= self.current_tick:
+            tick, person_id, kind = heapq.heappop(self.events)
+            if person_id not in self.people:
+                continue  # Events of the dead are dropped when they come up
+            if kind == BIRTH:
+                if len(self.people) < self.setup['max_people']:
+                    self.add_new_born(parent=person_id)
+                heapq.heappush(self.events, (tick + 1 + months_until_birth(self.rng.stream('life')), person_id, BIRTH))
+            else:
+                self._person_dies(person_id)
+
+        # If person don't die, then ages
+        for person_id, person in self.people.items():
+            if person_id < people_before:
+                person.age += 1 / MONTHS_PER_YEAR
+
+        if len(self.people) < self.setup['min_people']:
+            self.add_new_born(parent=None)
+
     def do_income_and_taxes_step(self):
         '''
         Apply income, taxes and consumption
         :return:
         '''
+        rng = self.rng.stream('income')
         for k, shareholder in self.people.items():
-            shareholder.work(self.setup)
+            shareholder.work(self.setup, rng)
 
     def so_shares_step(self):
         # If persons are tenants, they need to acquire a share to continue living in the house for one month.
         # otherwise they go homeless
+        # With the ownership matrix, the rents are collected first and distributed at once after all tenants paid
+        payers = []
+        payments = None if self.ownership is None else np.zeros(self.ownership.number_of_houses)
+        if self.profiler is not None:
+            self.profiler.count('houses_scanned', len(self.house_tenants))
+
         for house_id, person_id in self.house_tenants.copy().items():
 
             monthly_payment = self.houses[house_id].rent_price
 
-            if self.people[person_id].money < monthly_payment:
+            if self.settle_dividends(person_id) < monthly_payment:
                 # print(self)
                 person = self.people[person_id]
                 print(
                     f'[{person.name} is_retired:{person.is_retired} money:${person.money:.2f}, cannot pay ${monthly_payment:.2f} and becomes homeless')
-                self._return_house(house_id)
+                if self._return_house(person_id) is not None and self.profiler is not None:
+                    self.profiler.count('evictions')
 
             else:
                 # Person pays the price for the share
                 # print(f'{self.people[person_id].name} pays {money_to_pay} for a share')
                 self.people[person_id].money -= monthly_payment
 
-                # All previous shareholders receive their share
-                total_shares = self.houses[house_id].total_shares
-                for owner_id, shares in self.houses[house_id].share_owners.items():
-                    share_benefit = (shares / total_shares) * monthly_payment
-                    # print(f'{self.people[owner_id].name} receives {share_benefit} for {shares}/{total_shares}')
-                    self.people[owner_id].money += share_benefit
-                    self.people[owner_id].period_share_income += share_benefit  # Only for stats
-
-                # Brother state receives his share
-                self.founder.money += (self.houses[house_id].founder_shares / total_shares) * monthly_payment
-                # print(
-                #     f'{self.brother_state.name} receives {(self.houses[house_id].founder_shares / total_shares) * money_to_pay}')
-
-                if self.ruleset == Ruleset.by_shares:
-                    self.houses[house_id].assign_share(person_id)
-                elif self.ruleset == Ruleset.normal_rent:
-                    # There is no share assignation
-                    pass
+                if self.ownership is None:
+                    # All previous shareholders receive their share, they collect it with settle_dividends
+                    # Brother state receives his share
+                    self.founder.money += self.houses[house_id].pay_dividends(monthly_payment)
+                    self._assign_share(house_id, person_id)
                 else:
-                    raise RuntimeError(f'Rule {self.ruleset} not implemented')
+                    payments[house_id] = monthly_payment
+                    payers.append((house_id, person_id))
+
+        if self.ownership is not None:
+            # All previous shareholders receive their share, brother state too
+            share_income, founder_income = self.ownership.payout(payments, self.people_max_id)
+            owners = np.flatnonzero(share_income).tolist()
+            if self.profiler is not None:
+                self.profiler.count('dividends_paid', len(owners))
+            for owner_id in owners:
+                self.people[owner_id].money += share_income[owner_id]
+                self.people[owner_id].period_share_income += share_income[owner_id]  # Only for stats
+            self.founder.money += founder_income
+
+            for house_id, person_id in payers:
+                self._assign_share(house_id, person_id)
+
+    def _assign_share(self, house_id, person_id):
+        '''
+        The tenant of house_id gets what the ruleset gives for one month of rent
+        '''
+        if self.ruleset == Ruleset.by_shares:
+            self.houses[house_id].assign_share(person_id)
+            self.owned_houses.setdefault(person_id, set()).add(house_id)
+            self._sync_ownership(house_id, person_id)
+        elif self.ruleset == Ruleset.normal_rent:
+            # There is no share assignation
+            pass
+        else:
+            raise RuntimeError(f'Rule {self.ruleset} not implemented')
+
+    def _sync_ownership(self, house_id, *person_ids):
+        '''
+        Copies the shares of the founder and person_ids in house_id to the ownership matrix, if there is one
+        '''
+        if self.ownership is None:
+            return
+        house = self.houses[house_id]
+        self.ownership.set_founder_shares(house_id, house.founder_shares)
+        for person_id in person_ids:
+            self.ownership.set(house_id, person_id, house.share_owners.get(person_id))
 
     def _get_random_sibling(self, person_id):
-        for k, person in self.people.items():
-            if person.parent == person_id:
-                return k
+        for k in self.children.get(person_id, ()):
+            return k
         return None
 
     def _person_dies(self, deceased_id):
 
+        # The deceased collects the last dividends before the shares are removed
+        self.settle_dividends(deceased_id)
+
         # Remove the shares
-        for k, house in self.houses.items():
+        for k in sorted(self.owned_houses.get(deceased_id, ())):
+            house = self.houses[k]
             if deceased_id in house.share_owners:
                 child_id = self._get_random_sibling(deceased_id)
                 if self.inheritance and child_id is not None:
 
                     # Child inherits the shares
                     share_amount = house.inherit_to_sibling(deceased_id, child_id)
+                    self.owned_houses.setdefault(child_id, set()).add(k)
+                    self._sync_ownership(k, deceased_id, child_id)
                     self.people[child_id].shares_inherited += share_amount  # Only for stats
 
                     # Child also inherits money
@@ -196,39 +397,85 @@ class Community:
                 else:
                     # Brother state inherits the shares
                     amount = house.inherit_to_founder(deceased_id)
+                    self._sync_ownership(k, deceased_id)
                     self.founder.shares_inherited += amount  # Only for stats
 
-        self._return_house(deceased_id)
-        del self.people[deceased_id]
+        self._remove_person(deceased_id)
         self.dead_people.add(deceased_id)
 
+    def _remove_person(self, person_id):
+        self._return_house(person_id)
+        self.owned_houses.pop(person_id, None)
+        parent = self.people[person_id].parent
+        if parent in self.children:
+            del self.children[parent][person_id]
+        self.children.pop(person_id, None)
+        self.homeless.discard(person_id)
+        self.recording.person_removed(person_id)
+        return self.people.pop(person_id)
+
+    def emigrate(self, person_id):
+        '''
+        The person leaves the community, see simulator.region. It collects its dividends and the founder
+        takes back its shares, as when someone dies without heirs.
+        :return: the simulator.shareholder.Shareholder that leaves, to immigrate in another community
+        '''
+        self.settle_dividends(person_id)
+        for k in sorted(self.owned_houses.get(person_id, ())):
+            house = self.houses[k]
+            if person_id in house.share_owners:
+                house.inherit_to_founder(person_id)
+                self._sync_ownership(k, person_id)
+        return self._remove_person(person_id)
+
+    def immigrate(self, person):
+        '''
+        A person that left another community arrives homeless, without its family
+        :return: the id of the person in this community
+        '''
+        person.parent = None
+        person.name = f'person {self.people_max_id}'
+        return self._add_person(person)
+
     def add_new_born(self, parent=None):
-        self.people[self.people_max_id] = new_random_person(name=f'person {self.people_max_id}', parent=parent)
+        self._add_person(new_random_person(self.rng.stream('people'), name=f'person {self.people_max_id}',
+                                           parent=parent))
+
+    def _add_person(self, person):
+        person_id = self.people_max_id
+        self.people[person_id] = person
+        self.homeless.add(person_id)
+        if person.parent is not None:
+            self.children.setdefault(person.parent, {})[person_id] = None
+        if self.setup['event_scheduling']:
+            self._schedule_life_events(person_id)
+        self.recording.person_added(person_id)
         self.people_max_id += 1
+        return person_id
 
     def add_new_house(self, new_house):
+        if self.ownership is not None:
+            self.ownership.add_house(new_house.founder_shares)
         self.houses[self.house_max_id] = new_house
+        self.vacant_houses.add(self.house_max_id, new_house.rent_price)
         self.house_max_id += 1
 
     def record_people_stats(self, year):
         '''
-        Records statistics about all people in the simulator
+        Records statistics about the people traced, see simulator.recording
         :param year:
         :return:
         '''
-
-        for k, person in self.people.items():
-            total_shares = 0
-            for _, house in self.houses.items():
-                if k in house.share_owners:
-                    total_shares += house.share_owners[k]
+        traced = self.recording.traced(self.people)
+        for k, total_shares in zip(traced, self._total_shares(traced)):
+            person = self.people[k]
+            self.settle_dividends(k)
 
             monthly_payment = 0
             current_house = None
-            for house_id, person_id in self.house_tenants.items():
-                if person_id == k:
-                    current_house = self.houses[house_id]
-                    monthly_payment = current_house.rent_price
+            if k in self.tenancy:
+                current_house = self.houses[self.tenancy[k]]
+                monthly_payment = current_house.rent_price
 
             self.stats.add_people_stats_record({
                 'year': year,
@@ -244,8 +491,6 @@ class Community:
                 'rent': -monthly_payment,
                 'net_income': person.period_share_income + person.period_work_income - monthly_payment
             })
-            person.period_share_income = 0  # Reset the share income for this period
-            person.period_work_income = 0  # Reset the work income for this period
 
         # I had to add this dummy person to make the animation facet's work.
         if self.inheritance:
@@ -278,6 +523,31 @@ class Community:
                 'current_house': None
             })
 
+    def _total_shares(self, person_ids):
+        '''
+        The shares of each person in all the houses
+        '''
+        if self.ownership is not None:
+            shares_per_person = self.ownership.column_sums(self.people_max_id)
+            return [shares_per_person[k] for k in person_ids]
+        return [sum(self.houses[house_id].share_owners[k] for house_id in sorted(self.owned_houses.get(k, ())))
+                for k in person_ids]
+
+    def record_distribution_stats(self, year):
+        '''
+        Records the distributions of the money and shares of all the people, see simulator.sketches
+        '''
+        people = list(self.people)
+        for k in people:
+            self.settle_dividends(k)
+        self.stats.add_distribution_stats_records(distribution_records(
+            year,
+            ages=[self.people[k].age for k in people],
+            money=[self.people[k].money for k in people],
+            shares=self._total_shares(people),
+            founder_shares=sum(house.founder_shares for house in self.houses.values()),
+        ))
+
     def record_general_stats(self, year):
         '''
         Records the history of general statistics
@@ -356,11 +626,11 @@ class Community:
             houses += f'\n[{house.name}]: share price:${house.rent_price:.2f}, share owners:{house.share_owners}, founder has {house.founder_shares}/{house.total_shares} shares, inflation:{house.inflation:.2f}{tenant}'
         people = ''
         for i, person in self.people.items():
+            self.settle_dividends(i)
 
             house = ', is homeless'
-            for _house_id, _person_id in self.house_tenants.items():
-                if _person_id == i:
-                    house = f', lives in [{self.houses[_house_id].name}]'
+            if i in self.tenancy:
+                house = f', lives in [{self.houses[self.tenancy[i]].name}]'
             inheritance_info = f' shares_inherited:{person.shares_inherited},' if self.inheritance else ''
 
             people += f'\n[{person.name} (parent:{person.parent})]: money:${person.money:.2f}, age:{person.age:.2f},{inheritance_info} changed {person.changed_house} times{house}'
@@ -0,0 +1,184 @@
+import json
+import os
+
+import numpy as np
+
+from simulator.stats import TABLES, DTYPES, MISSING, columns_to_dataframe, year_mask
+
+MANIFEST = 'manifest.json'
+CATEGORIES_KEY = '__categories__'
+
+
+class ChunkSink:
+    '''
+    Writes each chunk of stats rows to its own file in a directory.
+    A manifest lists the chunks of each table with their year range, so they can be loaded selectively.
+    Stats flushes a table to the sink every chunk_rows rows.
+    '''
+    format = None
+    extension = None
+
+    def __init__(self, directory, chunk_rows=100000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.manifest = {'format': self.format, 'chunks': {name: [] for name in TABLES}}
+        self._write_manifest()
+
+    def write(self, table_name, columns, categories):
+        '''
+        :param columns: column name -> array, category columns as codes
+        :param categories: category column name -> values of its codes
+        '''
+        chunks = self.manifest['chunks'][table_name]
+        file_name = f'{table_name}-{len(chunks):05d}.{self.extension}'
+        self.write_chunk(os.path.join(self.directory, file_name), columns, categories)
+
+        years = columns['year']
+        chunks.append({
+            'file': file_name,
+            'rows': len(years),
+            'min_year': int(years.min()),
+            'max_year': int(years.max()),
+        })
+        self._write_manifest()
+
+    def close(self):
+        self._write_manifest()
+
+    def reader(self):
+        return StatsReader(self.directory)
+
+    def _write_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(path + '.tmp', path)
+
+    def write_chunk(self, path, columns, categories):
+        raise NotImplementedError
+
+    @staticmethod
+    def read_chunk(path):
+        raise NotImplementedError
+
+
+class NpzSink(ChunkSink):
+    format = 'npz'
+    extension = 'npz'
+
+    def write_chunk(self, path, columns, categories):
+        np.savez(path, **columns, **{CATEGORIES_KEY: np.array(json.dumps(categories))})
+
+    @staticmethod
+    def read_chunk(path):
+        with np.load(path) as chunk:
+            columns = {name: chunk[name] for name in chunk.files if name != CATEGORIES_KEY}
+            categories = json.loads(str(chunk[CATEGORIES_KEY]))
+        return columns, categories
+
+
+class ParquetSink(ChunkSink):
+    '''
+    Needs pyarrow, the categories of each chunk are kept in the file metadata
+    '''
+    format = 'parquet'
+    extension = 'parquet'
+
+    def write_chunk(self, path, columns, categories):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table(columns).replace_schema_metadata({CATEGORIES_KEY: json.dumps(categories)})
+        pq.write_table(table, path)
+
+    @staticmethod
+    def read_chunk(path):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+        categories = json.loads(table.schema.metadata[CATEGORIES_KEY.encode()])
+        return columns, categories
+
+
+SINKS = {sink.format: sink for sink in (NpzSink, ParquetSink)}
+
+
+def open_sink(directory, chunk_rows=100000):
+    '''
+    Returns a Parquet sink if pyarrow is installed, otherwise a NumPy .npz one
+    '''
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return NpzSink(directory, chunk_rows)
+    return ParquetSink(directory, chunk_rows)
+
+
+class StatsReader:
+    '''
+    Reads back the stats written by a sink, chunk by chunk
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.sink = SINKS[self.manifest['format']]
+
+    def years(self, table_name):
+        '''
+        Returns the (first, last) recorded year of a table
+        '''
+        chunks = self.manifest['chunks'][table_name]
+        if not chunks:
+            return None, None
+        return min(chunk['min_year'] for chunk in chunks), max(chunk['max_year'] for chunk in chunks)
+
+    def chunks(self, table_name, years=None):
+        '''
+        Lazily loads the chunks of a table, only the ones overlapping the range of years
+        :param years: optional (start, stop) range of years
+        :return: an iterator of (columns, categories)
+        '''
+        start, stop = (None, None) if years is None else years
+        for chunk in self.manifest['chunks'][table_name]:
+            if start is not None and chunk['max_year'] < start:
+                continue
+            if stop is not None and chunk['min_year'] >= stop:
+                continue
+            columns, categories = self.sink.read_chunk(os.path.join(self.directory, chunk['file']))
+            if years is not None:
+                mask = year_mask(columns['year'], years)
+                columns = {name: values[mask] for name, values in columns.items()}
+            yield columns, categories
+
+    def to_dataframe(self, table_name, years=None):
+        '''
+        Returns a table (or the rows of a range of years) as a pandas DataFrame
+        '''
+        table_columns = TABLES[table_name]
+        parts = {name: [] for name, _ in table_columns}
+        categories = {name: [] for name, kind in table_columns if kind == 'category'}
+        codes = {name: {} for name in categories}
+
+        for columns, chunk_categories in self.chunks(table_name, years):
+            for name, kind in table_columns:
+                values = columns[name]
+                if kind == 'category':
+                    # Re-code the chunk to the categories of the whole result
+                    recode = np.empty(len(chunk_categories[name]) + 1, dtype=np.int32)
+                    recode[-1] = MISSING
+                    for code, value in enumerate(chunk_categories[name]):
+                        if value not in codes[name]:
+                            codes[name][value] = len(categories[name])
+                            categories[name].append(value)
+                        recode[code] = codes[name][value]
+                    values = recode[values]
+                parts[name].append(values)
+
+        columns = {}
+        for name, kind in table_columns:
+            columns[name] = np.concatenate(parts[name]) if parts[name] else np.zeros(0, dtype=DTYPES[kind])
+        return columns_to_dataframe(table_columns, columns, categories)
@@ -0,0 +1,151 @@
+'''
+Distributions of the people recorded as mergeable sketches instead of one row per person.
+
+Every year, the money and shares of the people are counted in logarithmic buckets per age band:
+the bucket of a value v is sign(v) * ceil(log(|v| / MIN_VALUE) / log(GAMMA)), so any value is within ACCURACY
+(relative) of the value the bucket stands for. Each row of the distribution table is a bucket with the number of
+people in it and the exact sum of their values.
+
+Merging sketches, of several communities or several replicas, is adding up the rows of the same bucket,
+see merge_distributions. Quantiles, Gini coefficients and the ownership of the founder are read from the merged rows.
+'''
+import numpy as np
+
+ACCURACY = 0.01  # Relative accuracy of the quantiles
+GAMMA = (1 + ACCURACY) / (1 - ACCURACY)
+MIN_VALUE = 1e-3  # Smaller absolute values are in bucket 0
+
+AGE_BANDS = (0, 30, 45, 60, 75)  # Lower bound of each age band
+BAND_NAMES = ('0-30', '30-45', '45-60', '60-75', '75+')
+METRICS = ('money', 'shares')
+FOUNDER_SHARES = 'founder_shares'  # Metric of the single row with the shares of the founder, in band ALL
+ALL = 'all'
+
+
+def bucket_keys(values):
+    values = np.asarray(values, dtype=float)
+    magnitude = np.abs(values)
+    keys = np.zeros(len(values), dtype=np.int64)
+    large = magnitude > MIN_VALUE
+    keys[large] = np.ceil(np.log(magnitude[large] / MIN_VALUE) / np.log(GAMMA))
+    return np.sign(values).astype(np.int64) * keys
+
+
+def bucket_values(keys):
+    '''
+    The value each bucket stands for
+    '''
+    keys = np.asarray(keys, dtype=np.int64)
+    values = np.sign(keys) * MIN_VALUE * 2 * GAMMA ** np.abs(keys) / (GAMMA + 1)
+    return np.where(keys == 0, 0.0, values)
+
+
+def distribution_records(year, ages, money, shares, founder_shares):
+    '''
+    The rows of the distribution table of one year, as columns for Stats.add_distribution_stats_records
+    :param ages: age of each person, and their money and shares in the same order
+    :param founder_shares: total shares of the founder in all the houses
+    '''
+    bands = np.searchsorted(AGE_BANDS, np.asarray(ages, dtype=float), side='right') - 1
+    metric_column, band_column, bucket_column, count_column, total_column = [], [], [], [], []
+    for metric, values in zip(METRICS, (money, shares)):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            continue
+        buckets, inverse = np.unique(np.stack([bands, bucket_keys(values)]), axis=1, return_inverse=True)
+        inverse = inverse.ravel()
+        metric_column += [metric] * buckets.shape[1]
+        band_column += [BAND_NAMES[band] for band in buckets[0].tolist()]
+        bucket_column.append(buckets[1])
+        count_column.append(np.bincount(inverse, minlength=buckets.shape[1]))
+        total_column.append(np.bincount(inverse, weights=values, minlength=buckets.shape[1]))
+
+    metric_column.append(FOUNDER_SHARES)
+    band_column.append(ALL)
+    bucket_column.append(bucket_keys([founder_shares]))
+    count_column.append([1])
+    total_column.append([founder_shares])
+
+    bucket_column = np.concatenate(bucket_column)
+    return {
+        'year': np.full(len(bucket_column), year),
+        'metric': metric_column,
+        'band': band_column,
+        'bucket': bucket_column,
+        'count': np.concatenate(count_column).astype(float),
+        'total': np.concatenate(total_column).astype(float),
+    }
+
+
+def merge_distributions(frames):
+    '''
+    Puts together distribution tables (pandas DataFrames, see Stats.to_dataframe('distribution')),
+    e.g. of several replicas or communities: the counts and totals of the same bucket are added up
+    '''
+    import pandas as pd
+
+    df = pd.concat(frames, ignore_index=True)
+    for column in ('metric', 'band'):
+        df[column] = df[column].astype(str)
+    return df.groupby(['year', 'metric', 'band', 'bucket'], as_index=False, sort=True)[['count', 'total']].sum()
+
+
+def _buckets(df, metric, by_band):
+    rows = df[df['metric'] == metric]
+    keys = ['year', 'band'] if by_band else ['year']
+    rows = rows.groupby(keys + ['bucket'], observed=True, as_index=False)[['count', 'total']].sum()
+    return rows.sort_values(keys + ['bucket']), keys
+
+
+def distribution_quantiles(df, metric, quantiles=(0.1, 0.5, 0.9), by_band=False):
+    '''
+    Quantiles of a metric per year (and age band), within ACCURACY of the exact ones
+    (the lower of the two values around the quantile, without interpolation)
+    :param df: a distribution table, see merge_distributions
+    :return: a pandas DataFrame with year, (band,) quantile and value
+    '''
+    import pandas as pd
+
+    rows, keys = _buckets(df, metric, by_band)
+    result = []
+    for group, buckets in rows.groupby(keys, observed=True, sort=False):
+        group = group if isinstance(group, tuple) else (group,)
+        counts = buckets['count'].to_numpy()
+        cumulative = np.cumsum(counts)
+        values = bucket_values(buckets['bucket'].to_numpy())
+        for quantile in quantiles:
+            position = np.searchsorted(cumulative, quantile * (cumulative[-1] - 1), side='right')
+            result.append((*group, quantile, values[min(position, len(values) - 1)]))
+    return pd.DataFrame(result, columns=keys + ['quantile', 'value'])
+
+
+def distribution_gini(df, metric):
+    '''
+    Gini coefficient of a metric per year, from the Lorenz curve of the buckets (the people of a bucket
+    are taken as equal), NaN when the total is not positive
+    :return: a pandas Series indexed by year
+    '''
+    import pandas as pd
+
+    rows, _ = _buckets(df, metric, by_band=False)
+    gini = {}
+    for year, buckets in rows.groupby('year', sort=False):
+        counts = buckets['count'].to_numpy()
+        totals = buckets['total'].to_numpy()
+        if totals.sum() <= 0:
+            gini[year] = np.nan
+            continue
+        lorenz = np.cumsum(totals) / totals.sum()
+        previous = np.concatenate([[0], lorenz[:-1]])
+        gini[year] = 1 - float(np.sum(counts / counts.sum() * (previous + lorenz)))
+    return pd.Series(gini, name=f'Gini {metric}')
+
+
+def founder_ownership(df):
+    '''
+    Fraction of all the shares owned by the founder, per year
+    :return: a pandas Series indexed by year
+    '''
+    totals = df.groupby(['year', 'metric'], observed=True)['total'].sum().unstack()
+    founder = totals[FOUNDER_SHARES]
+    return (founder / (founder + totals['shares'].reindex(founder.index).fillna(0))).rename('Founder ownership')
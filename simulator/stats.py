@@ -1,22 +1,366 @@
-class Stats:
-    def __init__(self):
-        self.people_stats = {}
-        self.people_stats_last_index = 0
+import numpy as np
+
+'''
+The columns of each table, (name, kind).
+Kinds are 'int', 'float', 'bool' or 'category', category values (names, ids) are interned and stored as codes.
+'''
+PEOPLE_COLUMNS = (
+    ('year', 'int'),
+    ('id', 'category'),
+    ('money', 'float'),
+    ('shares', 'float'),
+    ('age', 'float'),
+    ('parent', 'category'),
+    ('inherited', 'bool'),
+    ('current_house', 'category'),
+    ('share_income', 'float'),
+    ('work_income', 'float'),
+    ('rent', 'float'),
+    ('net_income', 'float'),
+)
+
+GENERAL_COLUMNS = (
+    ('year', 'int'),
+    ('amount', 'float'),
+    ('type', 'category'),
+    ('scale', 'category'),
+)
+
+EXAMPLE_HOUSE_COLUMNS = (
+    ('year', 'int'),
+    ('shares', 'float'),
+    ('name', 'category'),
+)
+
+DISTRIBUTION_COLUMNS = (
+    ('year', 'int'),
+    ('metric', 'category'),
+    ('band', 'category'),
+    ('bucket', 'int'),
+    ('count', 'float'),
+    ('total', 'float'),
+)
+
+DTYPES = {
+    'int': np.int64,
+    'float': np.float64,
+    'bool': np.bool_,
+    'category': np.int32,
+}
+
+MISSING = -1  # Code of a None category value
+
+TABLES = {
+    'people': PEOPLE_COLUMNS,
+    'general': GENERAL_COLUMNS,
+    'example_house': EXAMPLE_HOUSE_COLUMNS,
+    'distribution': DISTRIBUTION_COLUMNS,  # See simulator.sketches
+}
+
+
+def columns_to_dataframe(table_columns, columns, categories):
+    '''
+    Returns a pandas DataFrame from column arrays, category columns become pandas categoricals
+    :param table_columns: (name, kind) of each column
+    :param columns: column name -> array (codes for category columns)
+    :param categories: column name -> category values
+    '''
+    import pandas as pd
+
+    data = {}
+    for name, kind in table_columns:
+        if kind == 'category':
+            data[name] = pd.Categorical.from_codes(columns[name], categories=categories[name])
+        else:
+            data[name] = columns[name]
+    return pd.DataFrame(data, copy=False)
+
+
+def year_mask(years_column, years):
+    '''
+    Rows with years[0] <= year < years[1], any bound can be None
+    '''
+    start, stop = years
+    mask = np.ones(len(years_column), dtype=bool)
+    if start is not None:
+        mask &= years_column >= start
+    if stop is not None:
+        mask &= years_column < stop
+    return mask
+
+
+class ColumnTable:
+    '''
+    A table stored as one growable NumPy buffer per column
+    '''
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.kinds = dict(columns)
+        self.buffers = {name: np.zeros(16, dtype=DTYPES[kind]) for name, kind in columns}
+        self.categories = {name: [] for name, kind in columns if kind == 'category'}
+        self.codes = {name: {} for name in self.categories}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def intern(self, name, value):
+        '''
+        Returns the code of a category value
+        '''
+        if value is None:
+            return MISSING
+        codes = self.codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = len(self.categories[name])
+            codes[value] = code
+            self.categories[name].append(value)
+        return code
+
+    def _reserve(self, size):
+        capacity = len(self.buffers[self.columns[0][0]])
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name, buffer in self.buffers.items():
+            grown = np.zeros(capacity, dtype=buffer.dtype)
+            grown[:self.size] = buffer[:self.size]
+            self.buffers[name] = grown
+
+    def append(self, record):
+        self._reserve(self.size + 1)
+        for name, kind in self.columns:
+            value = record[name]
+            if kind == 'category':
+                value = self.intern(name, value)
+            self.buffers[name][self.size] = value
+        self.size += 1
+
+    def extend(self, columns):
+        '''
+        Appends several rows at once
+        :param columns: column name -> sequence of values, category values are interned one by one
+        '''
+        count = len(columns[self.columns[0][0]])
+        self._reserve(self.size + count)
+        for name, kind in self.columns:
+            values = columns[name]
+            if kind == 'category':
+                values = np.fromiter((self.intern(name, value) for value in values), dtype=np.int32, count=count)
+            self.buffers[name][self.size:self.size + count] = values
+        self.size += count
+
+    def column(self, name):
+        '''
+        The values of a column, a view on its buffer (codes for category columns)
+        '''
+        return self.buffers[name][:self.size]
+
+    def decode(self, name, codes):
+        categories = np.empty(len(self.categories[name]) + 1, dtype=object)
+        categories[:-1] = self.categories[name]
+        categories[-1] = None  # MISSING is -1, the last element
+        return categories[codes]
 
-        self.general_stats = {}
-        self.general_stats_last_index = 0
+    def to_dataframe(self, years=None):
+        '''
+        Returns a pandas DataFrame built from the column buffers, category columns become pandas categoricals
+        :param years: optional (start, stop) range of years to keep
+        '''
+        columns = {name: self.column(name) for name, _ in self.columns}
+        if years is not None:
+            mask = year_mask(columns['year'], years)
+            columns = {name: values[mask] for name, values in columns.items()}
+        return columns_to_dataframe(self.columns, columns, self.categories)
 
-        self.example_house_stats = {}
-        self.example_house_stats_last_index = 0
+    def chunk(self, start=0):
+        '''
+        Returns the current rows (from start) as self-contained columns: category columns are re-coded
+        to only the categories they use, which are returned per column
+        '''
+        columns = {}
+        categories = {}
+        for name, kind in self.columns:
+            values = self.column(name)[start:]
+            if kind == 'category':
+                used, codes = np.unique(values, return_inverse=True)
+                missing = used == MISSING
+                codes = codes.astype(np.int32) - int(missing.any())
+                codes[values == MISSING] = MISSING
+                categories[name] = [self.categories[name][code] for code in used[~missing].tolist()]
+                values = codes
+            columns[name] = values.copy()
+        return columns, categories
+
+    def extend_chunk(self, columns, categories):
+        '''
+        Appends the rows of a chunk, as returned by chunk
+        '''
+        count = len(columns[self.columns[0][0]])
+        self._reserve(self.size + count)
+        for name, kind in self.columns:
+            values = columns[name]
+            if kind == 'category':
+                recode = np.array([self.intern(name, value) for value in categories[name]] + [MISSING], dtype=np.int32)
+                values = recode[values]
+            self.buffers[name][self.size:self.size + count] = values
+        self.size += count
+
+    def clear(self):
+        '''
+        Drops all rows and interned values, keeping the buffers
+        '''
+        self.size = 0
+        for name in self.categories:
+            self.categories[name] = []
+            self.codes[name] = {}
+
+    def records(self):
+        '''
+        The rows as dicts, index -> record
+        '''
+        columns = {}
+        for name, kind in self.columns:
+            if kind == 'category':
+                columns[name] = self.decode(name, self.column(name)).tolist()
+            else:
+                columns[name] = self.column(name).tolist()
+        return {i: {name: columns[name][i] for name, _ in self.columns} for i in range(self.size)}
+
+
+class Stats:
+    def __init__(self, sink=None):
+        '''
+        :param sink: optional simulator.sinks sink, tables are flushed to it by chunks of sink.chunk_rows rows
+        so only the last chunk of each table stays in memory
+        '''
+        self.people = ColumnTable(PEOPLE_COLUMNS)
+        self.general = ColumnTable(GENERAL_COLUMNS)
+        self.example_house = ColumnTable(EXAMPLE_HOUSE_COLUMNS)
+        self.distribution = ColumnTable(DISTRIBUTION_COLUMNS)
+        self.sink = sink
+        self.delivered = None  # table name -> rows in memory already returned by delta, once deltas are taken
 
     def add_people_stats_record(self, record):
-        self.people_stats[self.people_stats_last_index] = record
-        self.people_stats_last_index += 1
+        self.people.append(record)
+        self._maybe_flush('people')
+
+    def add_people_stats_records(self, columns):
+        self.people.extend(columns)
+        self._maybe_flush('people')
 
     def add_general_stats_record(self, record):
-        self.general_stats[self.general_stats_last_index] = record
-        self.general_stats_last_index += 1
+        self.general.append(record)
+        self._maybe_flush('general')
 
     def add_example_house_stats_record(self, record):
-        self.example_house_stats[self.example_house_stats_last_index] = record
-        self.example_house_stats_last_index += 1
\ No newline at end of file
+        self.example_house.append(record)
+        self._maybe_flush('example_house')
+
+    def add_distribution_stats_records(self, columns):
+        self.distribution.extend(columns)
+        self._maybe_flush('distribution')
+
+    def table(self, name):
+        return getattr(self, name)
+
+    def _maybe_flush(self, name):
+        if self.sink is None or len(self.table(name)) < self.sink.chunk_rows:
+            return
+        # Rows not returned by a delta yet wait in memory for the next one
+        if self.delivered is not None and self.delivered[name] < len(self.table(name)):
+            return
+        self.flush(name)
+
+    def flush(self, name=None):
+        '''
+        Writes the rows in memory of a table (all tables if name is None) to the sink
+        '''
+        if self.sink is None:
+            return
+        for table_name in TABLES if name is None else (name,):
+            table = self.table(table_name)
+            if len(table):
+                columns, categories = table.chunk()
+                self.sink.write(table_name, columns, categories)
+                table.clear()
+                if self.delivered is not None:
+                    self.delivered[table_name] = 0
+
+    def close(self):
+        if self.sink is not None:
+            self.flush()
+            self.sink.close()
+
+    def delta(self):
+        '''
+        Returns the rows recorded since the previous delta (or since the start) as a new Stats,
+        None if there are no new rows
+        '''
+        if self.delivered is None:
+            self.delivered = {name: 0 for name in TABLES}
+        if all(self.delivered[name] == len(self.table(name)) for name in TABLES):
+            return None
+
+        delta = Stats()
+        for name in TABLES:
+            table = self.table(name)
+            delta.table(name).extend_chunk(*table.chunk(self.delivered[name]))
+            self.delivered[name] = len(table)
+            self._maybe_flush(name)
+        return delta
+
+    def extend(self, other):
+        '''
+        Appends all the rows of another Stats in memory, e.g. to put deltas together
+        '''
+        for name in TABLES:
+            self.table(name).extend_chunk(*other.table(name).chunk())
+            self._maybe_flush(name)
+
+    def chunks(self, name):
+        '''
+        All the rows of a table as (columns, categories) chunks, the ones in the sink first
+        '''
+        if self.sink is not None:
+            self.flush(name)
+            yield from self.sink.reader().chunks(name)
+        elif len(self.table(name)):
+            yield self.table(name).chunk()
+
+    def to_dataframe(self, name, years=None):
+        '''
+        Returns a table as a pandas DataFrame, read back from the sink if there is one
+        :param name: 'people', 'general', 'example_house' or 'distribution'
+        :param years: optional (start, stop) range of years to load
+        '''
+        if self.sink is None:
+            return self.table(name).to_dataframe(years)
+        self.flush(name)
+        return self.sink.reader().to_dataframe(name, years)
+
+    @property
+    def people_stats(self):
+        return self.people.records()
+
+    @property
+    def people_stats_last_index(self):
+        return len(self.people)
+
+    @property
+    def general_stats(self):
+        return self.general.records()
+
+    @property
+    def general_stats_last_index(self):
+        return len(self.general)
+
+    @property
+    def example_house_stats(self):
+        return self.example_house.records()
+
+    @property
+    def example_house_stats_last_index(self):
+        return len(self.example_house)
@@ -0,0 +1,148 @@
+import itertools
+import multiprocessing
+from enum import Enum
+
+import numpy as np
+
+from simulator.cache import ResultCache, code_version, setup_digest
+from simulator.main import run
+from simulator.setup import DEFAULT_SETUP, Engine
+
+DEFAULT_CACHE_DIRECTORY = '.sweep_cache'
+
+
+def grid(**axes):
+    '''
+    All the combinations of the given values, e.g. grid(allow_inheritance=[False, True], ruleset=list(Ruleset))
+    :return: a list of setup overrides
+    '''
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[key] for key in keys))]
+
+
+def _draw(spec, unit):
+    '''
+    Maps a number in [0, 1) to a value of spec: a list of choices or a (low, high) range,
+    integer bounds give integers
+    '''
+    if isinstance(spec, list):
+        return spec[min(int(unit * len(spec)), len(spec) - 1)]
+    low, high = spec
+    if isinstance(low, int) and isinstance(high, int):
+        return min(low + int(unit * (high - low + 1)), high)
+    return float(low + unit * (high - low))
+
+
+def random_samples(samples, seed=0, **ranges):
+    '''
+    Independent uniform samples, e.g. random_samples(20, house_to_rent_ratio=(0.001, 0.003))
+    :param ranges: key -> list of choices or (low, high)
+    :return: a list of setup overrides
+    '''
+    generator = np.random.default_rng(seed)
+    units = generator.random((samples, len(ranges)))
+    return [{key: _draw(spec, unit) for (key, spec), unit in zip(ranges.items(), row)} for row in units]
+
+
+def latin_hypercube(samples, seed=0, **ranges):
+    '''
+    Latin hypercube samples: every key has exactly one sample in each of the samples equal strata of its range
+    :param ranges: key -> list of choices or (low, high)
+    :return: a list of setup overrides
+    '''
+    generator = np.random.default_rng(seed)
+    units = np.empty((samples, len(ranges)))
+    for column in range(len(ranges)):
+        units[:, column] = (generator.permutation(samples) + generator.random(samples)) / samples
+    return [{key: _draw(spec, unit) for (key, spec), unit in zip(ranges.items(), row)} for row in units]
+
+
+def outcome_metrics(stats):
+    '''
+    Reduces the stats of one run to a few outcome numbers, the run needs to record the general stats
+    '''
+    general = stats.to_dataframe('general')
+    amount = {metric: rows['amount'].to_numpy() for metric, rows in general.groupby('type', observed=True)}
+
+    people = stats.to_dataframe('people')
+    people = people[(people['id'] != 'dummy') & (people['year'] == people['year'].max())]
+    money = np.sort(people['money'].to_numpy())
+    gini = np.nan
+    if len(money) and money.sum() > 0:
+        ranks = np.arange(1, len(money) + 1)
+        gini = float((2 * ranks - len(money) - 1).dot(money) / (len(money) * money.sum()))
+
+    return {
+        'final_people_alive': float(amount['People alive'][-1]),
+        'mean_homeless': float(amount['Homeless people'].mean()),
+        'max_homeless': float(amount['Homeless people'].max()),
+        'final_houses': float(amount['houses'][-1]),
+        'final_founder_money': float(amount['Founder money'][-1]),
+        'min_founder_money': float(amount['Founder money'].min()),
+        'total_spent_building_houses': float(amount['Spent building houses'].sum()),
+        'final_median_money': float(np.median(money)) if len(money) else np.nan,
+        'final_gini_money': gini,
+    }
+
+
+def _run_point(arguments):
+    setup, engine, seed = arguments
+    return outcome_metrics(run(setup=setup, verbose=False, engine=engine, seed=seed))
+
+
+def _column_value(value):
+    return value.name if isinstance(value, Enum) else value
+
+
+def run_sweep(points, base_setup=DEFAULT_SETUP, replicas=1, seed=0, processes=None, engine=Engine.objects,
+              cache_directory=DEFAULT_CACHE_DIRECTORY):
+    '''
+    Runs every point (setup overrides) replicas times across a process pool.
+    Results are cached by content: the setup, the replica seed, the engine and the version of the simulator code,
+    so points that were already computed, in this sweep or a previous one, are not run again.
+    :param points: list of dicts of DEFAULT_SETUP keys -> values, see grid, random_samples and latin_hypercube
+    :param cache_directory: None disables the cache
+    :raises ValueError: if a point doesn't record the general stats (stats_tables), the outcomes come from them
+    :return: a tidy pandas DataFrame, one row per run with the point values and the outcome metrics
+    '''
+    import pandas as pd
+
+    cache = None if cache_directory is None else ResultCache(cache_directory)
+
+    runs = []
+    for point_id, point in enumerate(points):
+        setup = {**base_setup, **point}
+        if 'general' not in setup['stats_tables']:
+            raise ValueError(f"Point {point_id} doesn't record the general stats, add 'general' to its stats_tables")
+        for replica in range(replicas):
+            run_key = setup_digest(setup, seed=seed, replica=replica, engine=engine)
+            # The seed of a run doesn't depend on the code version, only its cache key does
+            replica_seed = np.random.SeedSequence([seed, replica, int(run_key, 16)]).generate_state(2)
+            key = setup_digest(setup, seed=seed, replica=replica, engine=engine, code=code_version())
+            runs.append((point_id, replica, setup, key, replica_seed))
+
+    results = {}
+    pending = []
+    for point_id, replica, setup, key, replica_seed in runs:
+        cached = None if cache is None else cache.get(key)
+        if cached is not None:
+            results[key] = cached
+        elif key not in results:
+            results[key] = None
+            pending.append((key, (setup, engine, replica_seed)))
+
+    if pending:
+        with multiprocessing.Pool(processes) as pool:
+            for key, metrics in zip((key for key, _ in pending),
+                                    pool.imap(_run_point, [arguments for _, arguments in pending])):
+                results[key] = metrics
+                if cache is not None:
+                    cache.put(key, metrics)
+
+    rows = []
+    for point_id, replica, setup, key, _ in runs:
+        row = {'point': point_id, 'replica': replica}
+        row.update({name: _column_value(value) for name, value in points[point_id].items()})
+        row.update(results[key])
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,64 @@
+import bisect
+import random
+
+import numpy as np
+
+
+class VacancyIndex:
+    '''
+    The vacant houses of a community, sorted by rent_price.
+    Finding the houses a budget can pay is a bisection, so a random affordable house is found in logarithmic time.
+    Adding or removing a house keeps the order (a list insertion).
+    '''
+
+    def __init__(self):
+        self.keys = []  # (rent_price, house_id), sorted
+        self.rent_prices = {}  # house_id -> rent_price
+
+    def add(self, house_id, rent_price):
+        if house_id in self.rent_prices:
+            return
+        self.rent_prices[house_id] = rent_price
+        bisect.insort(self.keys, (rent_price, house_id))
+
+    def discard(self, house_id):
+        rent_price = self.rent_prices.pop(house_id, None)
+        if rent_price is None:
+            return
+        del self.keys[bisect.bisect_left(self.keys, (rent_price, house_id))]
+
+    def count_below(self, budget):
+        '''
+        Number of vacant houses with rent_price < budget
+        '''
+        return bisect.bisect_left(self.keys, (budget,))
+
+    def random_below(self, budget, random_index=random.randrange):
+        '''
+        Returns a uniformly random vacant house with rent_price < budget, or None
+        :param random_index: returns a random integer in [0, n) given n
+        '''
+        count = self.count_below(budget)
+        if count == 0:
+            return None
+        return self.keys[random_index(count)][1]
+
+    def sorted_houses(self):
+        '''
+        Returns the rent prices and the ids of the vacant houses, sorted by rent_price, as arrays
+        '''
+        rent_prices = np.fromiter((rent_price for rent_price, _ in self.keys), dtype=float, count=len(self.keys))
+        house_ids = np.fromiter((house_id for _, house_id in self.keys), dtype=np.int64, count=len(self.keys))
+        return rent_prices, house_ids
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, house_id):
+        return house_id in self.rent_prices
+
+    def __iter__(self):
+        return iter(self.rent_prices)
+
+    def __repr__(self):
+        return repr(set(self.rent_prices))
@@ -0,0 +1,491 @@
+import numpy as np
+
+from simulator.setup import MONTHS_PER_YEAR, DEFAULT_SETUP, Ruleset, GOMPERTZ_A, GOMPERTZ_K, \
+    probability_of_birth_per_month
+from simulator.ownership import OwnershipMatrix, NOBODY, grow_column
+from simulator.recording import RECORDING_KEYS, RecordingPolicy
+from simulator.rng import RandomStream
+from simulator.sketches import distribution_records
+from simulator.stats import Stats
+from simulator.vacancy import VacancyIndex
+
+
+def check_setup(setup):
+    '''
+    Raises ValueError for the setup options of simulator.simulation.Community this engine doesn't implement
+    '''
+    if setup['event_scheduling']:
+        raise ValueError('event_scheduling is only implemented by the objects engine (Engine.objects)')
+
+
+class VectorizedCommunity:
+    '''
+    Same model as simulator.simulation.Community, but people, houses and share ownership are stored as
+    NumPy columns (struct of arrays) and every monthly step runs as batched draws and array updates.
+
+    People and houses keep the integer ids the object engine gives them, the id is the row in each column.
+    Share ownership is always a simulator.ownership.OwnershipMatrix, whatever sparse_ownership is.
+    Births and deaths are drawn every month, event_scheduling is not supported, see check_setup.
+    '''
+
+    profiler = None  # simulator.profiling.Profiler of the running months, set by simulator.main.advance
+
+    def __init__(self, founder=None, setup=DEFAULT_SETUP, stats=None, rng=None):
+        check_setup(setup)
+        self.setup = setup
+        self.founder = founder
+        self.inheritance = setup['allow_inheritance']
+        self.ruleset = setup['ruleset']
+
+        # People columns
+        self.money = np.zeros(0)
+        self.age = np.zeros(0)
+        self.parent = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.person_house = np.zeros(0, dtype=np.int64)
+        self.shares_inherited = np.zeros(0)  # Only for stats
+        self.money_inherited = np.zeros(0)  # Only for stats
+        self.period_share_income = np.zeros(0)  # Only for stats
+        self.period_work_income = np.zeros(0)  # Only for stats
+        self.changed_house = np.zeros(0, dtype=np.int64)  # Only for stats
+        self.children = {}  # parent_id -> ids of the living children, ordered by birth
+        self.people_max_id = 0
+        self.number_of_people = 0
+
+        # House columns
+        self.rent_price = np.zeros(0)
+        self.inflation = np.zeros(0)
+        self.shares_per_month = np.zeros(0)
+        self.house_tenant = np.zeros(0, dtype=np.int64)
+        self.tenant_slot = np.zeros(0, dtype=np.int64)  # Ownership slot of the current tenant in the house
+        self.house_names = []
+        self.house_max_id = 0
+        self.vacant_houses = VacancyIndex()
+
+        self.ownership = OwnershipMatrix()
+
+        self.dead_people = set()
+        self.current_tick = 0
+
+        self.stats = Stats() if stats is None else stats
+        self.rng = RandomStream() if rng is None else rng
+        self._start_recording()
+
+    def _start_recording(self, rows=0):
+        self.recording = RecordingPolicy(self.setup, self.rng, rows=rows)
+        for person_id in self.alive_ids().tolist():
+            self.recording.person_added(person_id)
+
+    def apply_setup(self, setup):
+        '''
+        Goes on with another setup from now on, e.g. a fork of a checkpoint with another ruleset
+        '''
+        check_setup(setup)
+        previous, self.setup = self.setup, setup
+        if any(setup[key] != previous[key] for key in RECORDING_KEYS):
+            self._start_recording(rows=self.recording.rows)
+        self.inheritance = setup['allow_inheritance']
+        self.ruleset = setup['ruleset']
+
+    def next_timestep(self):
+        '''
+        The game 'time-ticks' correspond to one month.
+        '''
+        year = int(self.current_tick / MONTHS_PER_YEAR)
+
+        if self.recording.records(self.current_tick, self.setup['number_of_months_to_run'], self._stats_rows):
+            if 'people' in self.recording.tables:
+                self.record_people_stats(year)
+            if 'general' in self.recording.tables:
+                self.record_general_stats(year)
+            if 'example_house' in self.recording.tables:
+                self.record_example_house_stats(year)
+            if 'distribution' in self.recording.tables:
+                self.record_distribution_stats(year)
+
+        if self.current_tick % MONTHS_PER_YEAR == 0:
+            # Reset the incomes for this period
+            self.period_share_income[:] = 0
+            self.period_work_income[:] = 0
+
+        self.current_tick += 1
+
+    def _stats_rows(self):
+        houses, _, _ = self.ownership.entries()
+        traced = self.number_of_people if self.recording.sample_size is None else len(self.recording.sample)
+        return self.recording.recording_rows(traced, self.number_of_people, int(np.count_nonzero(houses == 0)),
+                                             2 if self.inheritance else 0)
+
+    def alive_ids(self):
+        return np.flatnonzero(self.alive[:self.people_max_id])
+
+    def tenants(self):
+        '''
+        Returns the people that rent a house, ordered by house id
+        '''
+        tenants = self.house_tenant[:self.house_max_id]
+        return tenants[tenants != NOBODY]
+
+    def homeless_ids(self):
+        alive = self.alive_ids()
+        return alive[self.person_house[alive] == NOBODY]
+
+    @property
+    def available_houses(self):
+        '''
+        Returns all unocuppied houses (the index itself, not a copy)
+        '''
+        return self.vacant_houses
+
+    @property
+    def homeless_people(self):
+        return set(self.homeless_ids().tolist())
+
+    def occupy_house(self, person_id, new_house_id):
+        '''
+        Sets the person_id as the tenant of house_id
+        :return: the house the person leaves, or NOBODY
+        '''
+        old_house_id = self._return_house(person_id)
+        self.vacant_houses.discard(new_house_id)
+        self.house_tenant[new_house_id] = person_id
+        self.tenant_slot[new_house_id] = NOBODY
+        self.person_house[person_id] = new_house_id
+        return old_house_id
+
+    def _return_house(self, person_id):
+        '''
+        Unsets the person_id as tenant of any house
+        '''
+        house_id = self.person_house[person_id]
+        if house_id != NOBODY:
+            self.house_tenant[house_id] = NOBODY
+            self.tenant_slot[house_id] = NOBODY
+            self.person_house[person_id] = NOBODY
+            self.vacant_houses.add(int(house_id), float(self.rent_price[house_id]))
+        return house_id
+
+    def do_life_and_death_step(self):
+        '''
+        Applies rules of life in the simulator
+        :return:
+        '''
+        self.founder.age += 1 / MONTHS_PER_YEAR
+
+        ids = self.alive_ids()
+        rng = self.rng.stream('life')
+        births = rng.randoms(len(ids)) < probability_of_birth_per_month()
+        deaths = rng.randoms(len(ids)) < GOMPERTZ_A * np.exp(GOMPERTZ_K * self.age[ids])
+
+        # Children are only born while there is room in the community, as in the object engine people
+        # are visited in order and the ones that died before make room for the next births
+        deaths_before = np.cumsum(deaths) - deaths
+        population = len(ids)
+        for position in np.flatnonzero(births).tolist():
+            if population - deaths_before[position] < self.setup['max_people']:
+                self.add_new_born(parent=int(ids[position]))
+                population += 1
+
+        # If person don't die, then ages
+        self.age[ids[~deaths]] += 1 / MONTHS_PER_YEAR
+        for deceased_id in ids[deaths]:
+            self._person_dies(int(deceased_id))
+
+        if self.number_of_people < self.setup['min_people']:
+            self.add_new_born(parent=None)
+
+    def do_income_and_taxes_step(self):
+        '''
+        Apply income, taxes and consumption
+        :return:
+        '''
+        ids = self.alive_ids()
+        income = self.rng.stream('income').normals(self.setup['average_salary'], self.setup['sigma_salary'], len(ids))
+        # If person is retired, the salary is diminished
+        income[self.age[ids] > 60] *= self.setup['retirement_factor']
+
+        self.period_work_income[ids] = income
+        self.money[ids] += income
+
+    def so_shares_step(self, verbose=False):
+        '''
+        Every tenant pays the rent of its house, which is distributed to all the shareholders at once.
+        Contrary to the object engine, whether a tenant can pay is decided with the money it had at the start
+        of the step, the share income of this month is only available the next one.
+        '''
+        houses = np.flatnonzero(self.house_tenant[:self.house_max_id] != NOBODY)
+        tenants = self.house_tenant[houses]
+        monthly_payment = self.rent_price[houses]
+
+        can_pay = self.money[tenants] >= monthly_payment
+        if self.profiler is not None:
+            self.profiler.count('houses_scanned', len(houses))
+            self.profiler.count('evictions', int(len(houses) - np.count_nonzero(can_pay)))
+        for person_id, payment in zip(tenants[~can_pay], monthly_payment[~can_pay]):
+            if verbose:
+                print(
+                    f'[person {person_id} is_retired:{self.age[person_id] > 60} money:${self.money[person_id]:.2f}, cannot pay ${payment:.2f} and becomes homeless')
+            self._return_house(int(person_id))
+
+        houses, tenants, monthly_payment = houses[can_pay], tenants[can_pay], monthly_payment[can_pay]
+
+        # Person pays the price for the share
+        self.money[tenants] -= monthly_payment
+
+        # All previous shareholders receive their share, brother state too
+        payments = np.zeros(self.house_max_id)
+        payments[houses] = monthly_payment
+        share_income, founder_income = self.ownership.payout(payments, self.people_max_id)
+        if self.profiler is not None:
+            self.profiler.count('dividends_paid', int(np.count_nonzero(share_income)))
+        self.money[:self.people_max_id] += share_income
+        self.period_share_income[:self.people_max_id] += share_income  # Only for stats
+        self.founder.money += founder_income
+
+        if self.ruleset == Ruleset.by_shares:
+            self._assign_shares(houses, tenants)
+        elif self.ruleset == Ruleset.normal_rent:
+            # There is no share assignation
+            pass
+        else:
+            raise RuntimeError(f'Rule {self.ruleset} not implemented')
+
+    def _assign_shares(self, houses, tenants):
+        '''
+        Each tenant of houses earns the shares of one month, see House.assign_share
+        '''
+        shares_per_month = self.shares_per_month[houses]
+        founder_shares = self.ownership.founder_shares
+
+        # Ownership of the founder decays each month, once it reaches 0 the shares inflate
+        decays = founder_shares[houses] > 0
+        founder_shares[houses[decays]] -= shares_per_month[decays]
+        self.ownership.total_shares[houses[decays]] -= shares_per_month[decays]
+        self.inflation[houses[~decays]] += shares_per_month[~decays]  # Just for stats purposes
+
+        new_tenants = self.tenant_slot[houses] == NOBODY
+        for house_id, person_id in zip(houses[new_tenants], tenants[new_tenants]):
+            self.tenant_slot[house_id] = self.ownership.slot(int(house_id), int(person_id))
+        self.ownership.add_to_slots(self.tenant_slot[houses], shares_per_month)
+
+    def _get_random_sibling(self, person_id):
+        for k in self.children.get(person_id, ()):
+            return k
+        return None
+
+    def _person_dies(self, deceased_id):
+        owned_houses = self.ownership.rows[self.ownership.person_slots(deceased_id)].tolist()
+
+        child_id = self._get_random_sibling(deceased_id) if owned_houses else None
+        for house_id in owned_houses:
+            amount = self.ownership.remove(house_id, deceased_id)
+
+            if self.inheritance and child_id is not None:
+                # Child inherits the shares
+                self.ownership.set(house_id, child_id, self.ownership.get(house_id, child_id) + amount)
+                self.shares_inherited[child_id] += amount  # Only for stats
+
+                # Child also inherits money
+                money_amount = self.money[deceased_id]
+                self.money[deceased_id] = 0
+                self.money[child_id] += money_amount
+                self.money_inherited[child_id] += money_amount  # Only for stats
+            else:
+                # Brother state inherits the shares
+                self.ownership.set_founder_shares(house_id, self.ownership.founder_shares[house_id] + amount)
+                self.founder.shares_inherited += amount  # Only for stats
+
+        self._return_house(deceased_id)
+        parent = int(self.parent[deceased_id])
+        if parent in self.children:
+            del self.children[parent][deceased_id]
+        self.children.pop(deceased_id, None)
+        self.alive[deceased_id] = False
+        self.recording.person_removed(deceased_id)
+        self.number_of_people -= 1
+        self.dead_people.add(deceased_id)
+
+    def add_new_born(self, parent=None):
+        '''
+        Same distribution as simulator.shareholder.new_random_person
+        '''
+        person_id = self.people_max_id
+        self.people_max_id += 1
+        size = self.people_max_id
+
+        self.money = grow_column(self.money, size)
+        self.age = grow_column(self.age, size)
+        self.parent = grow_column(self.parent, size, NOBODY)
+        self.alive = grow_column(self.alive, size)
+        self.person_house = grow_column(self.person_house, size, NOBODY)
+        self.shares_inherited = grow_column(self.shares_inherited, size)
+        self.money_inherited = grow_column(self.money_inherited, size)
+        self.period_share_income = grow_column(self.period_share_income, size)
+        self.period_work_income = grow_column(self.period_work_income, size)
+        self.changed_house = grow_column(self.changed_house, size)
+
+        rng = self.rng.stream('people')
+        self.age[person_id] = rng.randint(14, 20)
+        self.money[person_id] = rng.randint(10, 100)
+        self.parent[person_id] = NOBODY if parent is None else parent
+        if parent is not None:
+            self.children.setdefault(parent, {})[person_id] = None
+        self.alive[person_id] = True
+        self.recording.person_added(person_id)
+        self.number_of_people += 1
+        return person_id
+
+    def add_new_house(self, new_house):
+        '''
+        Adds the columns of a simulator.house.House
+        '''
+        house_id = self.house_max_id
+        self.house_max_id += 1
+        size = self.house_max_id
+
+        self.rent_price = grow_column(self.rent_price, size)
+        self.inflation = grow_column(self.inflation, size)
+        self.shares_per_month = grow_column(self.shares_per_month, size)
+        self.house_tenant = grow_column(self.house_tenant, size, NOBODY)
+        self.tenant_slot = grow_column(self.tenant_slot, size, NOBODY)
+
+        self.ownership.add_house(new_house.founder_shares)
+        self.rent_price[house_id] = new_house.rent_price
+        self.inflation[house_id] = new_house.inflation
+        self.shares_per_month[house_id] = new_house.shares_per_month
+        self.house_names.append(new_house.name)
+        self.vacant_houses.add(house_id, new_house.rent_price)
+        return house_id
+
+    def record_people_stats(self, year):
+        '''
+        Records statistics about the people traced, see simulator.recording
+        :param year:
+        :return:
+        '''
+        ids = np.array(self.recording.traced(self.alive_ids()), dtype=np.int64)
+        total_shares = self.ownership.column_sums(self.people_max_id)[ids]
+        current_house = self.person_house[ids]
+        monthly_payment = np.where(current_house != NOBODY, self.rent_price[current_house], 0)
+        net_income = self.period_share_income[ids] + self.period_work_income[ids] - monthly_payment
+
+        house_names = self.house_names + [None]  # NOBODY is -1, the last element
+        self.stats.add_people_stats_records({
+            'year': np.full(len(ids), year),
+            'id': [f'person {person_id}' for person_id in ids.tolist()],
+            'money': self.money[ids],
+            'shares': total_shares,
+            'age': self.age[ids],
+            'parent': ['None' if parent == NOBODY else parent for parent in self.parent[ids].tolist()],
+            'inherited': self.shares_inherited[ids] > 0,
+            'current_house': [house_names[house_id] for house_id in current_house.tolist()],
+            'share_income': self.period_share_income[ids],
+            'work_income': self.period_work_income[ids],
+            'rent': -monthly_payment,
+            'net_income': net_income
+        })
+
+        # The same dummy people as in the object engine, to make the animation facet's work.
+        if self.inheritance:
+            for inherited in (True, False):
+                self.stats.add_people_stats_record({
+                    'year': year,
+                    'id': 'dummy',
+                    'money': 0,
+                    'shares': 0,
+                    'age': 0,
+                    'parent': None,
+                    'share_income': 0,
+                    'work_income': 0,
+                    'rent': 0,
+                    'net_income': 0,
+                    'inherited': inherited,
+                    'current_house': None
+                })
+
+    def record_distribution_stats(self, year):
+        '''
+        Records the distributions of the money and shares of all the people, see simulator.sketches
+        '''
+        ids = self.alive_ids()
+        self.stats.add_distribution_stats_records(distribution_records(
+            year,
+            ages=self.age[ids],
+            money=self.money[ids],
+            shares=self.ownership.column_sums(self.people_max_id)[ids],
+            founder_shares=float(self.ownership.founder_shares[:self.house_max_id].sum()),
+        ))
+
+    def record_general_stats(self, year):
+        '''
+        Records the history of general statistics
+        :param year:
+        :return:
+        '''
+        self.stats.add_general_stats_record({
+            'year': year,
+            'amount': self.number_of_people,
+            'type': 'People alive',
+            'scale': 'human'
+        })
+
+        self.stats.add_general_stats_record({
+            'year': year,
+            'amount': len(self.homeless_ids()),
+            'type': 'Homeless people',
+            'scale': 'human'
+        })
+
+        self.stats.add_general_stats_record({
+            'year': year,
+            'amount': self.house_max_id,
+            'type': 'houses',
+            'scale': 'human'
+        })
+
+        self.stats.add_general_stats_record({
+            'year': year,
+            'amount': self.founder.money,
+            'type': 'Founder money',
+            'scale': 'money'
+        })
+
+        self.stats.add_general_stats_record({
+            'year': year,
+            'amount': self.founder.period_spent_building_houses,
+            'type': 'Spent building houses',
+            'scale': 'money'
+        })
+        self.founder.period_spent_building_houses = 0
+
+    def record_example_house_stats(self, year):
+        '''
+        Records the history of the shares for one example house
+        :param year:
+        :return:
+        '''
+        self.stats.add_example_house_stats_record({
+            'year': year,
+            'shares': float(self.ownership.founder_shares[0]),
+            'name': self.founder.name,
+        })
+        houses, people, shares = self.ownership.entries()
+        for person_id, amount in zip(people[houses == 0].tolist(), shares[houses == 0].tolist()):
+            self.stats.add_example_house_stats_record({
+                'year': year,
+                'shares': amount,
+                'name': f'person {person_id}',
+            })
+
+    def __repr__(self):
+        return \
+            f'''
+-----------------------------
+Year {self.current_tick / MONTHS_PER_YEAR:.0f}, month {self.current_tick % MONTHS_PER_YEAR + 1}
+-----------------------------
+{self.founder.name}, money:${self.founder.money:.2f} age:{self.founder.age:.0f}
+People alive: {self.number_of_people}, homeless: {len(self.homeless_ids())}, deceased: {len(self.dead_people)}
+Houses: {self.house_max_id}, available: {len(self.vacant_houses)}
+Share owners: {len(self.ownership.slots)}, founder shares: {self.ownership.founder_shares[:self.house_max_id].sum():.2f}
+-----------------------------
+        '''
@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+
+from simulator.stats import TABLES, ColumnTable, columns_to_dataframe
+
+CATEGORIES_FILE = 'categories.json'
+
+
+class YearStore:
+    '''
+    The rows of a stats table partitioned by year: the rows are sorted by year and offsets[i] is where years[i] starts,
+    so the rows of one year are a slice of every column, whatever the number of years.
+    A store can be saved as one .npy file per column and loaded back memory mapped,
+    then only the pages of the years read are loaded.
+    '''
+
+    def __init__(self, table_name, columns, categories):
+        '''
+        :param columns: column name -> array, category columns as codes
+        :param categories: category column name -> values of its codes
+        '''
+        self.table_name = table_name
+        self.table_columns = TABLES[table_name]
+        years = columns['year']
+        if len(years) and np.any(years[1:] < years[:-1]):
+            order = np.argsort(years, kind='stable')
+            columns = {name: values[order] for name, values in columns.items()}
+            years = columns['year']
+        self.columns = columns
+        self.categories = categories
+        self.years, self.offsets = np.unique(years, return_index=True)
+        self.offsets = np.append(self.offsets, len(years))
+        self._ranges = {}
+
+    @classmethod
+    def from_stats(cls, stats, table_name='people'):
+        table = ColumnTable(TABLES[table_name])
+        for columns, categories in stats.chunks(table_name):
+            table.extend_chunk(columns, categories)
+        columns = {name: table.column(name).copy() for name, _ in table.columns}
+        return cls(table_name, columns, table.categories)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, values in self.columns.items():
+            np.save(os.path.join(directory, f'{name}.npy'), values)
+        # Written last, a directory with this file is complete
+        with open(os.path.join(directory, CATEGORIES_FILE), 'w') as f:
+            json.dump({'table': self.table_name, 'categories': self.categories}, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, CATEGORIES_FILE)) as f:
+            saved = json.load(f)
+        columns = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None)
+                   for name, _ in TABLES[saved['table']]}
+        return cls(saved['table'], columns, saved['categories'])
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, CATEGORIES_FILE))
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def year_rows(self, year):
+        '''
+        The columns of the rows of one year, slices of the store columns
+        '''
+        i = np.searchsorted(self.years, year)
+        if i == len(self.years) or self.years[i] != year:
+            start = stop = 0
+        else:
+            start, stop = self.offsets[i], self.offsets[i + 1]
+        return {name: np.asarray(values[start:stop]) for name, values in self.columns.items()}
+
+    def year(self, year):
+        '''
+        The rows of one year as a pandas DataFrame
+        '''
+        return columns_to_dataframe(self.table_columns, self.year_rows(year), self.categories)
+
+    def ranges(self, names):
+        '''
+        (min, max) of the given columns over all the years, computed once per column
+        '''
+        for name in names:
+            if name not in self._ranges:
+                values = self.columns[name]
+                self._ranges[name] = (float(values.min()), float(values.max())) if len(values) else (0.0, 0.0)
+        return {name: self._ranges[name] for name in names}
@@ -0,0 +1,38 @@
+import contextlib
+import io
+
+import pandas as pd
+
+from simulator.main import advance, run, start
+from simulator.setup import DEFAULT_SETUP, MONTHS_PER_YEAR
+from simulator.stats import TABLES
+
+# Small runs, a few seconds at most
+SMALL_SETUP = {**DEFAULT_SETUP, 'number_of_months_to_run': 30 * MONTHS_PER_YEAR + 1}
+SEED = 7
+
+
+def quiet_run(setup=SMALL_SETUP, seed=SEED, **kwargs):
+    '''
+    A run without the evictions printed by the simulator
+    '''
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run(setup=setup, verbose=False, seed=seed, **kwargs)
+
+
+def quiet_start(setup=SMALL_SETUP, seed=SEED, **kwargs):
+    return start(setup=setup, verbose=False, seed=seed, **kwargs)
+
+
+def quiet_advance(state, months=None, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return advance(state, months, verbose=False, **kwargs)
+
+
+def assert_same_stats(expected, actual, tables=tuple(TABLES), exact=True):
+    '''
+    The tables of two simulator.stats.Stats have the same rows, bit for bit unless exact is False
+    '''
+    for name in tables:
+        pd.testing.assert_frame_equal(expected.to_dataframe(name), actual.to_dataframe(name),
+                                      check_exact=exact, check_categorical=False, obj=name)
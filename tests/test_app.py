@@ -0,0 +1,37 @@
+import importlib
+
+import pytest
+
+pytest.importorskip('dash')
+
+import figures.results  # noqa: E402
+from figures.results import FIGURES, compute_results, figure_dicts, load_figures, write_figures  # noqa: E402
+from tests.common import SMALL_SETUP  # noqa: E402
+
+
+def no_run(*args, **kwargs):
+    raise AssertionError('The app ran a simulation')
+
+
+def test_importing_the_app_runs_nothing(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(figures.results, 'run', no_run)
+    import app
+    importlib.reload(app)
+    assert callable(app.app.layout)
+    assert app.app.validation_layout is not None
+    assert not (tmp_path / app.RESULTS_CACHE).exists()
+
+
+def test_layout_is_served_from_the_precomputed_figures(monkeypatch, tmp_path):
+    path = str(tmp_path / 'figures.json')
+    write_figures(compute_results(SMALL_SETUP, 0), path)
+    monkeypatch.setattr(figures.results, 'run', no_run)
+    from app import create_app
+
+    app = create_app(results_directory=str(tmp_path / 'cache'), default_figures_path=path)
+    first, second = app.layout(), app.layout()
+    assert first is not second
+    for name, figure in zip(FIGURES, figure_dicts(load_figures(path))):
+        assert first[name].figure == figure
+        assert second[name].figure == figure
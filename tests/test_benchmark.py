@@ -0,0 +1,68 @@
+import copy
+import json
+
+from simulator.benchmark import STEPS, _parse_value, cases, compare, main
+
+
+def result(wall, steps, peak_memory=1000):
+    return {'cases': {'case': {'wall': wall, 'steps': dict(zip(STEPS, steps)), 'peak_memory': peak_memory}}}
+
+
+def test_cases_cover_the_matrix():
+    found = cases({'max_people': [30, 300], 'ruleset': ['by_shares']}, ['objects', 'arrays'])
+    assert [(engine, overrides) for _, engine, overrides in found] == [
+        ('objects', {'max_people': 30, 'ruleset': 'by_shares'}),
+        ('objects', {'max_people': 300, 'ruleset': 'by_shares'}),
+        ('arrays', {'max_people': 30, 'ruleset': 'by_shares'}),
+        ('arrays', {'max_people': 300, 'ruleset': 'by_shares'}),
+    ]
+    assert len({name for name, _, _ in found}) == 4
+
+
+def test_parse_value():
+    assert [_parse_value(value) for value in ('True', 'False', '3', '0.5', 'by_shares')] == \
+        [True, False, 3, 0.5, 'by_shares']
+
+
+def test_compare_flags_regressions_only():
+    baseline = result(1.0, [0.5, 0.2, 0.1, 0.1, 0.001])
+    assert compare(baseline, baseline) == []
+    assert compare(baseline, result(1.1, [0.55, 0.2, 0.1, 0.1, 0.001])) == []
+    assert compare(baseline, result(0.5, [0.1, 0.1, 0.1, 0.1, 0.001], peak_memory=100)) == []
+    # A slow step, even if the whole run isn't, and steps too fast to compare
+    assert compare(baseline, result(1.1, [0.5, 0.3, 0.1, 0.1, 0.004])) == [('case', 'policy', 0.2, 0.3)]
+    assert compare(baseline, result(1.3, [0.5, 0.2, 0.1, 0.1, 0.001], peak_memory=1300)) == [
+        ('case', 'run', 1.0, 1.3), ('case', 'peak_memory', 1000, 1300)]
+    # Values that are 0 in the baseline have no relative change
+    empty = result(0.0, [0.0] * len(STEPS), peak_memory=0)
+    assert compare(empty, result(1.0, [0.5] * len(STEPS), peak_memory=1000)) == []
+    # Cases missing in the current results are not regressions
+    assert compare(baseline, {'cases': {}}) == []
+
+
+def test_run_and_compare(tmp_path, capsys):
+    baseline, current = tmp_path / 'baseline.json', tmp_path / 'current.json'
+    matrix = ['--set', 'max_people=30', 'initial_number_of_houses=20', 'number_of_months_to_run=25',
+              'ruleset=by_shares', 'allow_inheritance=False,True']
+    assert main(['run', '--output', str(baseline), '--repeat', '1', '--engines', 'objects', 'arrays'] + matrix) == 0
+    results = json.loads(baseline.read_text())
+    assert len(results['cases']) == 4
+    for case in results['cases'].values():
+        assert case['wall'] > 0 and case['peak_memory'] > 0 and set(case['steps']) == set(STEPS)
+
+    slower = copy.deepcopy(results)
+    for case in slower['cases'].values():
+        case['wall'] *= 2
+    current.write_text(json.dumps(slower))
+    capsys.readouterr()
+    assert main(['compare', str(baseline), str(baseline)]) == 0
+    assert main(['compare', str(baseline), str(current)]) == 1
+    assert capsys.readouterr().out.count('REGRESSION') == 4
+
+
+def test_compare_zero_baselines(tmp_path, capsys):
+    baseline, current = tmp_path / 'baseline.json', tmp_path / 'current.json'
+    baseline.write_text(json.dumps(result(0.0, [0.0] * len(STEPS), peak_memory=0)))
+    current.write_text(json.dumps(result(1.0, [0.5] * len(STEPS), peak_memory=1000)))
+    assert main(['compare', str(baseline), str(current)]) == 0
+    assert '0 regressions in 1 cases' in capsys.readouterr().out
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+
+from simulator import cache
+from simulator.cache import PickleCache, ResultCache, TieredCache, code_version, setup_digest, source_digest
+from simulator.setup import DEFAULT_SETUP, Ruleset
+
+
+def test_setup_digest_is_a_content_address():
+    reordered = dict(reversed(list(DEFAULT_SETUP.items())))
+    assert setup_digest(DEFAULT_SETUP, seed=1) == setup_digest(reordered, seed=1)
+    assert setup_digest(DEFAULT_SETUP, seed=1) == setup_digest(DEFAULT_SETUP, seed=np.int64(1))
+    assert setup_digest(DEFAULT_SETUP, seed=1) != setup_digest(DEFAULT_SETUP, seed=2)
+    assert setup_digest(DEFAULT_SETUP) != setup_digest({**DEFAULT_SETUP, 'ruleset': Ruleset.normal_rent})
+
+
+def test_source_digest_follows_the_sources(tmp_path):
+    (tmp_path / 'a.py').write_text('x = 1\n')
+    (tmp_path / 'notes.txt').write_text('not code')
+    digest = source_digest(tmp_path)
+    (tmp_path / 'notes.txt').write_text('still not code')
+    assert source_digest(tmp_path) == digest
+    (tmp_path / 'a.py').write_text('x = 2\n')
+    assert source_digest(tmp_path) != digest
+
+
+def test_disk_caches(tmp_path):
+    for cache, value in ((ResultCache(tmp_path / 'json'), {'a': [1, 2]}),
+                         (PickleCache(tmp_path / 'pickle'), {'a': np.arange(3)})):
+        assert cache.get('abcd') is None and 'abcd' not in cache
+        cache.put('abcd', value)
+        assert 'abcd' in cache
+        assert str(cache.get('abcd')) == str(value)
+        # No temporary file left behind
+        assert os.listdir(os.path.join(cache.directory, 'ab')) == [f'abcd.{cache.extension}']
+
+
+def test_tiered_cache_keeps_the_most_recent_in_memory(tmp_path):
+    cache = TieredCache(tmp_path, max_entries=2)
+    for key in ('k1', 'k2', 'k3'):
+        cache.put(key, key.upper())
+    assert list(cache.memory) == ['k2', 'k3']
+    assert cache.get('k2') == 'K2'
+    assert list(cache.memory) == ['k3', 'k2']
+
+    # The evicted entry is still on disk and comes back to memory
+    assert 'k1' in cache
+    assert cache.get('k1') == 'K1'
+    assert list(cache.memory) == ['k2', 'k1']
+
+    # Another cache on the same directory, e.g. after a restart
+    restarted = TieredCache(tmp_path, max_entries=2)
+    assert [restarted.get(key) for key in ('k1', 'k2', 'k3', 'k4')] == ['K1', 'K2', 'K3', None]
+
+
+def test_code_version_with_more_sources(tmp_path):
+    (tmp_path / 'figures.py').write_text('x = 1\n')
+    simulator_directory = os.path.dirname(os.path.abspath(cache.__file__))
+    assert code_version() == source_digest(simulator_directory)
+    assert code_version(str(tmp_path)) == source_digest(simulator_directory, str(tmp_path))
+    assert code_version(str(tmp_path)) != code_version()
@@ -0,0 +1,70 @@
+import pickle
+
+import pytest
+
+from simulator.checkpoint import CHECKPOINT_VERSION, checkpoint, fork, restore
+from simulator.setup import Engine, MONTHS_PER_YEAR, Ruleset
+from simulator.sinks import NpzSink
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_advance, quiet_run, quiet_start
+
+
+CHANGES = [
+    {},
+    {'allow_inheritance': True},
+    {'ruleset': Ruleset.normal_rent},
+    {'sparse_ownership': True, 'allow_inheritance': True},
+]
+
+
+@pytest.mark.parametrize('engine, changes', [(engine, changes) for engine in Engine for changes in CHANGES] +
+                         [(Engine.objects, {'event_scheduling': True})])
+def test_restored_run_is_identical(engine, changes):
+    setup = {**SMALL_SETUP, **changes}
+    expected = quiet_run(setup, engine=engine)
+
+    state = quiet_start(setup, engine=engine)
+    quiet_advance(state, 13 * MONTHS_PER_YEAR + 5)
+    restored = restore(checkpoint(state))
+    quiet_advance(restored)
+    assert_same_stats(expected, restored.stats)
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_checkpoint_twice(engine):
+    state = quiet_start(engine=engine)
+    quiet_advance(state, 7 * MONTHS_PER_YEAR)
+    state = restore(checkpoint(state))
+    quiet_advance(state, 9 * MONTHS_PER_YEAR + 1)
+    state = restore(checkpoint(state))
+    quiet_advance(state)
+    assert_same_stats(quiet_run(engine=engine), state.stats)
+
+
+def test_fork_changes_the_branch_only():
+    state = quiet_start()
+    quiet_advance(state, 10 * MONTHS_PER_YEAR)
+    snapshot = checkpoint(state)
+
+    branch = fork(snapshot, ruleset=Ruleset.normal_rent)
+    assert branch.setup['ruleset'] == Ruleset.normal_rent
+    quiet_advance(branch)
+
+    quiet_advance(state)
+    assert_same_stats(quiet_run(), state.stats)
+    assert not branch.stats.to_dataframe('people').equals(state.stats.to_dataframe('people'))
+
+
+def test_restored_run_with_a_sink(tmp_path):
+    state = quiet_start(stats_sink=NpzSink(str(tmp_path / 'before'), chunk_rows=40))
+    quiet_advance(state, 12 * MONTHS_PER_YEAR)
+    restored = restore(checkpoint(state), stats_sink=NpzSink(str(tmp_path / 'after'), chunk_rows=40))
+    quiet_advance(restored)
+    restored.stats.close()
+    assert_same_stats(quiet_run(), restored.stats)
+
+
+def test_other_checkpoint_versions_are_refused():
+    snapshot = pickle.loads(checkpoint(quiet_start()))
+    snapshot['version'] = CHECKPOINT_VERSION + 1
+    with pytest.raises(RuntimeError, match='version'):
+        restore(pickle.dumps(snapshot))
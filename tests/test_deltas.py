@@ -0,0 +1,42 @@
+from figures.results import PROGRESSIVE_FIGURES, build_figures, merge_stats, partial_figure_updates
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_run
+
+
+def run_with_deltas(**kwargs):
+    deltas = []
+    stats = quiet_run(stats_deltas=lambda months, delta: deltas.append((months, delta)), **kwargs)
+    return stats, deltas
+
+
+def test_deltas_add_up_to_the_stats():
+    stats, deltas = run_with_deltas()
+    months = [months for months, _ in deltas]
+    assert months == sorted(set(months))
+    assert len(deltas) == len(stats.to_dataframe('general')['year'].unique())
+    assert_same_stats(stats, merge_stats(delta for _, delta in deltas))
+
+
+def test_deltas_dont_change_the_run():
+    stats, _ = run_with_deltas(seed=2)
+    assert_same_stats(quiet_run(seed=2), stats)
+
+
+def test_partial_figures_follow_the_deltas():
+    stats, deltas = run_with_deltas()
+    deltas = [delta for _, delta in deltas]
+
+    figures, extensions, traces = partial_figure_updates(deltas[:2], lambda: deltas[:2], None)
+    assert all(figures[name] is not None and extensions[name] is None for name in PROGRESSIVE_FIGURES)
+
+    # Only the new rows are sent while the figures have all the traces they need
+    extended = 0
+    for i in range(2, len(deltas)):
+        figures, extensions, traces = partial_figure_updates(deltas[i:i + 1], lambda: deltas[:i + 1], traces)
+        for name in PROGRESSIVE_FIGURES:
+            assert (figures[name] is None) != (extensions[name] is None)
+            extended += extensions[name] is not None
+    assert extended
+
+    # A figure rebuilt from all the deltas is the one of the whole run
+    figures, _, _ = partial_figure_updates(deltas, lambda: deltas, None)
+    assert {name: figures[name].to_json() for name in PROGRESSIVE_FIGURES} == build_figures(stats, SMALL_SETUP)
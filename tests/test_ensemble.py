@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from simulator.ensemble import Ensemble, replica_seeds, run_ensemble, summarize
+from tests.common import SMALL_SETUP, quiet_run
+
+
+def test_bands_are_aligned_on_the_recorded_years():
+    ensemble = Ensemble()
+    summaries = [summarize(quiet_run({**SMALL_SETUP, 'stats_interval_years': 5, 'stats_max_rows': max_rows},
+                                     seed=seed))
+                 for seed, max_rows in [(1, None), (3, 200)]]
+    for summary in summaries:
+        ensemble.add(summary)
+
+    full, capped = (summary['People alive'][1] for summary in summaries)
+    assert list(full.index) == [0, 5, 10, 15, 20, 25, 30]
+    assert len(capped) < len(full)
+
+    values = ensemble.values('People alive')
+    assert list(values.columns) == list(full.index)
+    np.testing.assert_array_equal(values.loc[0].to_numpy(), full.to_numpy())
+    np.testing.assert_array_equal(values.loc[1, capped.index].to_numpy(), capped.to_numpy())
+    assert values.loc[1].isna().sum() == len(full) - len(capped)
+
+    bands = ensemble.bands()
+    people = bands[bands['metric'] == 'People alive']
+    assert list(people['year']) == list(full.index)
+
+
+def test_run_ensemble_is_reproducible_across_pool_sizes():
+    first = run_ensemble(SMALL_SETUP, replicas=4, seed=5, processes=1)
+    second = run_ensemble(SMALL_SETUP, replicas=4, seed=5, processes=2)
+    assert first.replicas == second.replicas == 4
+    pd.testing.assert_frame_equal(first.bands(), second.bands())
+    pd.testing.assert_frame_equal(first.distribution(), second.distribution())
+
+    # Each replica is the run of its own seed
+    replicas = [summarize(quiet_run(seed=seed))['People alive'][1] for seed in replica_seeds(5, 4)]
+    np.testing.assert_array_equal(first.values('People alive').to_numpy(), np.vstack(replicas))
@@ -0,0 +1,48 @@
+import numpy as np
+
+from simulator.events import months_until_birth, months_until_death
+from simulator.rng import RandomStream
+from simulator.setup import MONTHS_PER_YEAR, probability_of_birth_per_month, probability_of_death_per_month
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_run
+
+SAMPLES = 20000
+# Dvoretzky-Kiefer-Wolfowitz: the empirical CDF is this far from the true one with probability < 1e-6
+CDF_TOLERANCE = np.sqrt(np.log(2 / 1e-6) / (2 * SAMPLES))
+
+
+def assert_cdf_close(samples, cdf):
+    samples = np.sort(samples)
+    months = np.arange(samples[-1] + 1)
+    empirical = np.searchsorted(samples, months, side='right') / len(samples)
+    assert np.max(np.abs(empirical - cdf[:len(months)])) < CDF_TOLERANCE
+
+
+def test_deaths_have_the_monthly_bernoulli_distribution():
+    rng = RandomStream(1)
+    for age in (0, 30.5, 80, 110):
+        # The month of death when a coin is flipped every month as the person ages
+        start = round(age * MONTHS_PER_YEAR)
+        probabilities = np.minimum(1, [probability_of_death_per_month((start + t) / MONTHS_PER_YEAR)
+                                       for t in range(200 * MONTHS_PER_YEAR)])
+        survival = np.cumprod(1 - probabilities)
+        samples = [months_until_death(age, rng) for _ in range(SAMPLES)]
+        assert min(samples) >= 0
+        assert_cdf_close(samples, 1 - survival)
+
+
+def test_births_have_the_monthly_bernoulli_distribution():
+    rng = RandomStream(2)
+    samples = [months_until_birth(rng) for _ in range(SAMPLES)]
+    months = np.arange(max(samples) + 1)
+    assert_cdf_close(samples, 1 - (1 - probability_of_birth_per_month()) ** (months + 1))
+
+
+def test_event_scheduled_runs():
+    setup = {**SMALL_SETUP, 'event_scheduling': True}
+    stats = quiet_run(setup)
+    assert_same_stats(stats, quiet_run(setup))
+
+    general = stats.to_dataframe('general')
+    alive = general[general['type'] == 'People alive']['amount']
+    assert alive.between(setup['min_people'], setup['max_people']).all()
+    assert len(general['year'].unique()) == len(quiet_run().to_dataframe('general')['year'].unique())
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from simulator.house import House
+
+
+class EagerHouse:
+    '''
+    Pays every shareholder on every rent payment, as the simulator did before dividends were settled lazily
+    '''
+
+    def __init__(self, number_of_shares):
+        self.founder_shares = number_of_shares
+        self.share_owners = {}
+        self.money = {}
+
+    def pay_dividends(self, monthly_payment):
+        total_shares = self.founder_shares + sum(self.share_owners.values())
+        for person_id, shares in self.share_owners.items():
+            self.money[person_id] = self.money.get(person_id, 0) + shares / total_shares * monthly_payment
+        return self.founder_shares / total_shares * monthly_payment
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_lazy_dividends_are_the_eager_ones(seed):
+    generator = np.random.default_rng(seed)
+    house = House(number_of_shares=30, rent_price=10, shares_per_month=1)
+    eager = EagerHouse(30)
+    collected = {}
+    people = list(range(6))
+
+    for month in range(300):
+        rent = generator.uniform(5, 15)
+        assert house.pay_dividends(rent) == pytest.approx(eager.pay_dividends(rent))
+
+        tenant = int(generator.choice(people))
+        house.assign_share(tenant)
+        if eager.founder_shares > 0:
+            eager.founder_shares -= 1
+        eager.share_owners[tenant] = eager.share_owners.get(tenant, 0) + 1
+
+        owners = sorted(house.share_owners)
+        if generator.random() < 0.3:
+            person_id = int(generator.choice(owners))
+            collected[person_id] = collected.get(person_id, 0) + house.settle_dividends(person_id)
+        if generator.random() < 0.05 and len(owners) > 1:
+            deceased_id, heir_id = (int(k) for k in generator.choice(owners, 2, replace=False))
+            collected[deceased_id] = collected.get(deceased_id, 0) + house.settle_dividends(deceased_id)
+            house.inherit_to_sibling(deceased_id, heir_id)
+            eager.share_owners[heir_id] += eager.share_owners.pop(deceased_id)
+        elif generator.random() < 0.05:
+            deceased_id = int(generator.choice(owners))
+            collected[deceased_id] = collected.get(deceased_id, 0) + house.settle_dividends(deceased_id)
+            house.inherit_to_founder(deceased_id)
+            eager.founder_shares += eager.share_owners.pop(deceased_id)
+
+        assert house.share_owners == eager.share_owners
+        assert house.founder_shares == eager.founder_shares
+
+    for person_id in house.share_owners:
+        collected[person_id] = collected.get(person_id, 0) + house.settle_dividends(person_id)
+    assert collected.keys() <= eager.money.keys()
+    for person_id, money in eager.money.items():
+        assert collected.get(person_id, 0) == pytest.approx(money, rel=1e-9)
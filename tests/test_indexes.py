@@ -0,0 +1,65 @@
+import contextlib
+import io
+
+import pytest
+
+from simulator.setup import MONTHS_PER_YEAR, Ruleset
+from tests.common import SMALL_SETUP, quiet_advance, quiet_start
+
+
+def assert_consistent_indexes(state):
+    '''
+    The indexes of a simulator.simulation.Community are the ones recomputed from its people and houses
+    '''
+    assert state.tenancy == {person_id: house_id for house_id, person_id in state.house_tenants.items()}
+    assert state.tenancy.keys() <= state.people.keys()
+    assert state.homeless == state.people.keys() - state.tenancy.keys()
+    assert set(state.vacant_houses) == state.houses.keys() - state.house_tenants.keys()
+    assert state.vacant_houses.keys == sorted((state.houses[house_id].rent_price, house_id)
+                                              for house_id in state.vacant_houses)
+
+    children = {}
+    for person_id, person in state.people.items():
+        if person.parent is not None:
+            children.setdefault(person.parent, []).append(person_id)
+    assert {parent: list(ids) for parent, ids in state.children.items() if ids} == children
+
+    owned_houses = {}
+    for house_id, house in state.houses.items():
+        for person_id in house.share_owners:
+            owned_houses.setdefault(person_id, set()).add(house_id)
+    assert {person_id: houses for person_id, houses in state.owned_houses.items() if houses} == owned_houses
+    assert owned_houses.keys() <= state.people.keys()
+
+
+@pytest.mark.parametrize('changes', [
+    {},
+    {'allow_inheritance': True},
+    {'ruleset': Ruleset.normal_rent},
+    {'market_clearing': True, 'allow_inheritance': True},
+    {'event_scheduling': True, 'allow_inheritance': True},
+])
+def test_indexes_follow_the_run(changes):
+    state = quiet_start({**SMALL_SETUP, **changes})
+    assert_consistent_indexes(state)
+    for year in range(SMALL_SETUP['number_of_months_to_run'] // MONTHS_PER_YEAR):
+        quiet_advance(state, MONTHS_PER_YEAR)
+        assert_consistent_indexes(state)
+
+
+def test_a_tenant_that_cannot_pay_is_evicted():
+    state = quiet_start()
+    quiet_advance(state, 2 * MONTHS_PER_YEAR)
+    # A tenant whose id isn't the id of its house
+    house_id, person_id = next((house_id, person_id) for house_id, person_id in state.house_tenants.items()
+                               if house_id != person_id)
+    others = {tenant: house for tenant, house in state.tenancy.items() if tenant != person_id}
+    state.people[person_id].money = -10 ** 9
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        state.so_shares_step()
+    assert person_id in state.homeless and person_id not in state.tenancy
+    assert house_id in state.vacant_houses and house_id not in state.house_tenants
+    # The other tenants can pay and keep their houses
+    assert state.tenancy == others
+    assert_consistent_indexes(state)
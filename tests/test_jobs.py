@@ -0,0 +1,61 @@
+import time
+
+from simulator.cache import TieredCache
+from simulator.jobs import CANCELLED, DONE, JobQueue
+from simulator.setup import MONTHS_PER_YEAR
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_run
+
+
+def small_run(setup, seed, progress=None, stats_deltas=None):
+    # Module level, so it can be sent to the workers
+    return quiet_run(setup=setup, seed=seed, progress=progress, stats_deltas=stats_deltas)
+
+
+def wait(jobs, job_id, timeout=120):
+    deadline = time.time() + timeout
+    while jobs.status(job_id)['status'] not in (DONE, CANCELLED, 'failed'):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    return jobs.status(job_id)
+
+
+def test_jobs_run_once_and_are_cached(tmp_path):
+    cache = TieredCache(tmp_path)
+    jobs = JobQueue(small_run, cache, max_workers=2)
+    try:
+        job_id = jobs.submit(SMALL_SETUP, 3)
+        assert jobs.submit(SMALL_SETUP, 3) == job_id
+        other = jobs.submit(SMALL_SETUP, 4)
+        assert other != job_id
+
+        status = wait(jobs, job_id)
+        assert status['status'] == DONE and status['months'] == SMALL_SETUP['number_of_months_to_run']
+        assert_same_stats(quiet_run(seed=3), jobs.result(job_id))
+        assert wait(jobs, other)['status'] == DONE
+
+        # A finished job is in the cache, submitting it again doesn't run it
+        again = jobs.submit(SMALL_SETUP, 3)
+        assert again != job_id
+        assert jobs.status(again)['status'] == DONE
+        assert_same_stats(quiet_run(seed=3), jobs.result(again))
+    finally:
+        jobs.shutdown()
+
+
+def test_a_running_job_can_be_cancelled(tmp_path):
+    setup = {**SMALL_SETUP, 'number_of_months_to_run': 1000 * MONTHS_PER_YEAR}
+    jobs = JobQueue(small_run, TieredCache(tmp_path), max_workers=1)
+    try:
+        job_id = jobs.submit(setup, 1)
+        deadline = time.time() + 60
+        while not (jobs.status(job_id)['months'] and jobs.partial_stats(job_id)):
+            assert time.time() < deadline
+            time.sleep(0.05)
+        assert jobs.status(job_id)['status'] == 'running'
+
+        jobs.cancel(job_id)
+        assert wait(jobs, job_id)['status'] == CANCELLED
+        assert jobs.result(job_id) is None
+        assert jobs.partial_stats(job_id) == []
+    finally:
+        jobs.shutdown()
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from simulator.policy import match_searchers
+from simulator.rng import RandomStream
+from simulator.setup import Engine, MONTHS_PER_YEAR
+from tests.common import SMALL_SETUP, quiet_advance, quiet_start
+from tests.test_indexes import assert_consistent_indexes
+
+
+def sequential_matching(budgets, rent_prices):
+    '''
+    Serves the searchers one by one from the smallest budget, each one takes the cheapest house left it can pay
+    '''
+    left = list(range(len(rent_prices)))
+    result = np.full(len(budgets), -1)
+    for searcher in np.argsort(budgets, kind='stable'):
+        affordable = [position for position in left if rent_prices[position] < budgets[searcher]]
+        if affordable:
+            result[searcher] = affordable[0]
+            left.remove(affordable[0])
+    return result
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_match_searchers_is_the_sequential_matching(seed):
+    generator = np.random.default_rng(seed)
+    budgets = generator.uniform(0, 30, int(generator.integers(0, 15)))
+    rent_prices = np.sort(generator.uniform(5, 25, int(generator.integers(0, 15))))
+    matched = match_searchers(budgets, rent_prices, RandomStream(seed))
+    np.testing.assert_array_equal(matched, sequential_matching(budgets, rent_prices))
+
+
+def test_every_house_goes_to_one_searcher_that_can_pay_it():
+    generator = np.random.default_rng(0)
+    budgets = generator.integers(5, 15, 40).astype(float)  # Many ties
+    rent_prices = np.sort(generator.uniform(5, 15, 25))
+    matched = match_searchers(budgets, rent_prices, RandomStream(0))
+    housed = matched != -1
+    assert len(set(matched[housed].tolist())) == housed.sum()
+    assert (rent_prices[matched[housed]] < budgets[housed]).all()
+    assert housed.sum() == (sequential_matching(budgets, rent_prices) != -1).sum()
+
+
+def test_market_clearing_keeps_the_indexes():
+    state = quiet_start({**SMALL_SETUP, 'market_clearing': True})
+    for year in range(SMALL_SETUP['number_of_months_to_run'] // MONTHS_PER_YEAR):
+        quiet_advance(state, MONTHS_PER_YEAR)
+        assert_consistent_indexes(state)
+        assert len(state.available_houses) >= SMALL_SETUP['minimum_free_houses_policy']
+
+
+def test_market_clearing_with_arrays():
+    state = quiet_start({**SMALL_SETUP, 'market_clearing': True}, engine=Engine.arrays)
+    quiet_advance(state)
+    tenants = state.tenants()
+    assert len(set(tenants.tolist())) == len(tenants)
+    assert len(state.vacant_houses) >= SMALL_SETUP['minimum_free_houses_policy']
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from simulator.ownership import OwnershipMatrix
+from simulator.setup import Engine, Ruleset
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_run
+
+
+def matrix_entries(matrix, person_id):
+    '''
+    Whether the person has an entry in each house, from a scan of all the entries
+    '''
+    houses, people, _ = matrix.entries()
+    return np.isin(np.arange(matrix.number_of_houses), houses[people == person_id])
+
+
+def test_payout_is_the_dense_product():
+    generator = np.random.default_rng(0)
+    houses, people = 8, 12
+    dense = np.zeros((houses, people))
+    founder = generator.uniform(0, 50, houses)
+    matrix = OwnershipMatrix()
+    for house_id in range(houses):
+        matrix.add_house(founder[house_id])
+    for _ in range(200):
+        house_id, person_id = int(generator.integers(houses)), int(generator.integers(people))
+        if generator.random() < 0.2:
+            matrix.set(house_id, person_id, None)
+            dense[house_id, person_id] = 0
+        else:
+            shares = float(generator.integers(1, 20))
+            matrix.set(house_id, person_id, shares)
+            dense[house_id, person_id] = shares
+
+    np.testing.assert_allclose(matrix.column_sums(people), dense.sum(axis=0))
+    for person_id in range(people):
+        slots = matrix.person_slots(person_id)
+        np.testing.assert_array_equal(matrix.rows[slots], np.flatnonzero(matrix_entries(matrix, person_id)))
+        assert (matrix.cols[slots] == person_id).all()
+    np.testing.assert_allclose(matrix.total_shares[:houses], dense.sum(axis=1) + founder)
+
+    payments = generator.uniform(0, 10, houses)
+    income, founder_income = matrix.payout(payments, people)
+    per_share = payments / (dense.sum(axis=1) + founder)
+    np.testing.assert_allclose(income, dense.T @ per_share)
+    assert founder_income == pytest.approx(founder @ per_share)
+    assert income.sum() + founder_income == pytest.approx(payments.sum())
+
+
+def test_removed_slots_are_reused():
+    matrix = OwnershipMatrix()
+    matrix.add_house(10)
+    matrix.set(0, 1, 3)
+    matrix.set(0, 2, 4)
+    assert matrix.remove(0, 1) == 3
+    matrix.set(0, 3, 5)
+    assert matrix.slot_max_id == 2
+    assert matrix.get(0, 1) == 0 and matrix.get(0, 3) == 5
+    assert matrix.total_shares[0] == 19
+    assert len(matrix.person_slots(1)) == 0 and 1 not in matrix.person_houses
+    assert matrix.person_slots(3).tolist() == [matrix.slots[(0, 3)]]
+
+
+@pytest.mark.parametrize('ruleset', list(Ruleset))
+@pytest.mark.parametrize('allow_inheritance', [False, True])
+def test_sparse_ownership_gives_the_same_run(ruleset, allow_inheritance):
+    setup = {**SMALL_SETUP, 'ruleset': ruleset, 'allow_inheritance': allow_inheritance}
+    # The rents are added up in another order, the results agree to rounding
+    assert_same_stats(quiet_run(setup), quiet_run({**setup, 'sparse_ownership': True}), exact=False)
+    assert_same_stats(quiet_run(setup, engine=Engine.arrays),
+                      quiet_run({**setup, 'sparse_ownership': True}, engine=Engine.arrays), exact=False)
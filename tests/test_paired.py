@@ -0,0 +1,70 @@
+import numpy as np
+
+from simulator.checkpoint import checkpoint, fork
+from simulator.ensemble import summarize
+from simulator.paired import PairedComparison, _run_pair
+from simulator.rng import RandomStream
+from simulator.setup import Engine, MONTHS_PER_YEAR, Ruleset
+from tests.common import SMALL_SETUP, SEED, quiet_advance, quiet_run, quiet_start
+
+
+def _population(stats):
+    people = stats.to_dataframe('people')
+    people = people[people['id'] != 'dummy']
+    return people[['year', 'id', 'age']].astype({'id': str}).reset_index(drop=True)
+
+
+def test_named_streams_are_independent_of_each_other():
+    first, second = RandomStream(SEED, named_streams=True), RandomStream(SEED, named_streams=True)
+    first.stream('policy').randoms(1000)
+    np.testing.assert_array_equal(first.stream('life').randoms(10), second.stream('life').randoms(10))
+    assert not np.array_equal(second.stream('income').randoms(10), second.stream('people').randoms(10))
+
+    plain = RandomStream(SEED)
+    assert plain.stream('life') is plain
+
+
+def test_spawned_streams_dont_change_their_parent():
+    parent, untouched = RandomStream(SEED), RandomStream(SEED)
+    parent.spawn().randoms(100)
+    np.testing.assert_array_equal(parent.randoms(10), untouched.randoms(10))
+
+
+def test_paired_runs_have_the_same_population():
+    for engine in Engine:
+        by_shares, normal_rent = (quiet_run({**SMALL_SETUP, 'ruleset': ruleset, 'named_streams': True}, engine=engine)
+                                  for ruleset in Ruleset)
+        assert _population(by_shares).equals(_population(normal_rent))
+
+
+def test_forked_pairs_keep_their_named_streams():
+    state = quiet_start({**SMALL_SETUP, 'named_streams': True})
+    quiet_advance(state, 10 * MONTHS_PER_YEAR)
+    snapshot = checkpoint(state)
+
+    branches = [fork(snapshot, seed=3, ruleset=ruleset) for ruleset in Ruleset]
+    fresh = RandomStream(3, named_streams=True)
+    for name in ('life', 'income', 'people'):
+        np.testing.assert_array_equal(branches[0].rng.stream(name).randoms(5), fresh.stream(name).randoms(5))
+        np.testing.assert_array_equal(branches[1].rng.stream(name).randoms(5),
+                                      RandomStream(3, named_streams=True).stream(name).randoms(5))
+
+    branches = [quiet_advance(fork(snapshot, seed=3, ruleset=ruleset)) for ruleset in Ruleset]
+    assert _population(branches[0].stats).equals(_population(branches[1].stats))
+
+
+def test_differences_are_aligned_on_the_recorded_years():
+    comparison = PairedComparison()
+    setup = {**SMALL_SETUP, 'stats_interval_years': 5}
+    for seed, max_rows in [(1, None), (3, 100)]:
+        comparison.add(_run_pair(({**setup, 'stats_max_rows': max_rows}, Engine.objects, seed, comparison.rulesets)))
+
+    full = summarize(quiet_run({**setup, 'ruleset': Ruleset.by_shares, 'named_streams': True}, seed=1))
+    years = list(full['People alive'][1].index)
+    assert years == [0, 5, 10, 15, 20, 25, 30]
+
+    differences = comparison.differences()
+    people = differences[differences['metric'] == 'People alive']
+    assert list(people['year']) == years
+    # The capped pair recorded years 0 and 20 with both rulesets, and year 10 only with normal_rent
+    assert list(people['pairs']) == [2, 1, 1, 1, 2, 1, 1]
@@ -0,0 +1,65 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from simulator.main import STEPS
+from simulator.profiling import COUNTERS, Profiler
+from simulator.setup import Engine, MONTHS_PER_YEAR
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_advance, quiet_run, quiet_start
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+@pytest.mark.parametrize('market_clearing', [False, True])
+def test_profiled_runs_are_the_same(engine, market_clearing):
+    setup = {**SMALL_SETUP, 'market_clearing': market_clearing}
+    profiler = Profiler()
+    assert_same_stats(quiet_run(setup, engine=engine), quiet_run(setup, engine=engine, profiler=profiler))
+
+    months = SMALL_SETUP['number_of_months_to_run']
+    assert profiler.months == months
+    assert set(profiler.wall) == set(profiler.cpu) == set(STEPS)
+    assert all(seconds >= 0 for seconds in profiler.wall.values())
+    for name in ('houses_scanned', 'dividends_paid', 'searches_attempted'):
+        assert profiler.counters[name] > 0, name
+    assert profiler.latency_max * months >= profiler.latency_total > 0
+
+
+def test_trace_periods_add_up_to_the_totals():
+    profiler = Profiler(trace_every=2 * MONTHS_PER_YEAR)
+    quiet_run(profiler=profiler)
+    df = profiler.to_dataframe()
+
+    months = SMALL_SETUP['number_of_months_to_run']
+    traced = months // (2 * MONTHS_PER_YEAR) * 2 * MONTHS_PER_YEAR
+    np.testing.assert_array_equal(df['tick'].unique(), np.arange(2 * MONTHS_PER_YEAR, traced + 1, 2 * MONTHS_PER_YEAR))
+
+    # The periods cover all the months but the last one, which ends no period
+    counts = df[df['kind'] == 'count'].groupby('name', observed=True)['value'].sum()
+    assert set(counts.index) == set(COUNTERS)
+    assert all(0 <= counts[name] <= profiler.counters[name] for name in COUNTERS)
+    wall = df[df['kind'] == 'wall'].groupby('name', observed=True)['value'].sum()
+    assert all(wall[step] <= profiler.wall[step] + 1e-9 for step in STEPS)
+
+    summary = profiler.summary()
+    assert f'Profile of {months} months' in summary
+    assert all(step in summary for step in STEPS)
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_evictions_are_counted(engine):
+    state = quiet_start(engine=engine)
+    quiet_advance(state, 2 * MONTHS_PER_YEAR)
+    if engine == Engine.objects:
+        tenant = next(iter(state.tenancy))
+        state.people[tenant].money = -10 ** 9
+    else:
+        tenant = int(state.tenants()[0])
+        state.money[tenant] = -10 ** 9
+
+    state.profiler = Profiler()
+    with contextlib.redirect_stdout(io.StringIO()):
+        state.so_shares_step()
+    assert state.profiler.counters['evictions'] == 1
+    assert tenant in state.homeless_people
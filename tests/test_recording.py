@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulator.recording import RecordingPolicy
+from simulator.rng import RandomStream
+from simulator.setup import DEFAULT_SETUP, Engine
+from simulator.stats import TABLES
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_run
+
+YEARS = (SMALL_SETUP['number_of_months_to_run'] - 1) // 12
+
+
+def rows(stats):
+    return sum(len(stats.to_dataframe(name)) for name in TABLES)
+
+
+def years(stats, table='general'):
+    return sorted(stats.to_dataframe(table)['year'].unique().tolist())
+
+
+def general(stats):
+    return stats.to_dataframe('general').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_default_records_every_year(engine):
+    stats = quiet_run(engine=engine)
+    assert years(stats) == list(range(YEARS + 1))
+    assert all(len(stats.to_dataframe(name)) for name in TABLES)
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_interval_and_tables_only_skip_rows(engine):
+    every_year = quiet_run(engine=engine)
+    stats = quiet_run({**SMALL_SETUP, 'stats_interval_years': 5, 'stats_tables': ('general', 'people')},
+                      engine=engine)
+    assert years(stats) == list(range(0, YEARS + 1, 5))
+    assert len(stats.to_dataframe('example_house')) == len(stats.to_dataframe('distribution')) == 0
+    for name in ('general', 'people'):
+        df = every_year.to_dataframe(name)
+        pd.testing.assert_frame_equal(df[df['year'] % 5 == 0].reset_index(drop=True), stats.to_dataframe(name),
+                                      check_categorical=False)
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_people_sample(engine):
+    stats = quiet_run({**SMALL_SETUP, 'stats_people_sample': 4}, engine=engine)
+    # The sample has its own stream, the run is the same
+    pd.testing.assert_frame_equal(general(quiet_run(engine=engine)), general(stats), check_categorical=False)
+
+    people = stats.to_dataframe('people')
+    people = people[people['id'] != 'dummy']
+    assert people.groupby('year').size().max() == 4
+    assert people['id'].nunique() > 4
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_rows_are_capped(engine):
+    uncapped = rows(quiet_run(engine=engine))
+    for cap in (uncapped // 3, uncapped // 10):
+        stats = quiet_run({**SMALL_SETUP, 'stats_max_rows': cap}, engine=engine)
+        assert 0 < rows(stats) <= cap
+        assert years(stats)[0] == 0
+    # A cap with room for every recording changes nothing
+    roomy = quiet_run({**SMALL_SETUP, 'stats_max_rows': 10 * uncapped}, engine=engine)
+    assert_same_stats(quiet_run(engine=engine), roomy)
+
+
+def test_reservoir_sample_is_uniform():
+    counts = np.zeros(100)
+    trials = 2000
+    for seed in range(trials):
+        policy = RecordingPolicy({**DEFAULT_SETUP, 'stats_people_sample': 10}, RandomStream(seed))
+        for person_id in range(100):
+            policy.person_added(person_id)
+        assert len(set(policy.sample)) == 10
+        counts[policy.sample] += 1
+    # Each person is in the sample with probability 0.1
+    standard_error = np.sqrt(0.1 * 0.9 / trials)
+    assert np.all(np.abs(counts / trials - 0.1) < 5 * standard_error)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from simulator.ensemble import replica_seeds
+from simulator.region import Region, merge_shard_stats, run_region
+from tests.common import SMALL_SETUP, quiet_run
+
+CROWDED = {**SMALL_SETUP, 'initial_number_of_houses': 3, 'minimum_free_houses_policy': 0}
+SPACIOUS = {**SMALL_SETUP, 'initial_number_of_houses': 60}
+
+
+def general(stats):
+    return stats.to_dataframe('general').sort_values(['year', 'type']).reset_index(drop=True)
+
+
+def test_a_single_shard_is_a_community():
+    stats = run_region([SMALL_SETUP], seed=3, processes=1)
+    alone = quiet_run(seed=replica_seeds(3, 1)[0])
+    pd.testing.assert_frame_equal(general(alone), general(stats), check_categorical=False, check_like=True)
+
+    people = stats.to_dataframe('people')
+    expected = alone.to_dataframe('people')
+    assert len(people) == len(expected)
+    np.testing.assert_array_equal(people['money'], expected['money'])
+    assert set(people['id'].astype(str)) == {value if value == 'dummy' else f'shard 0/{value}'
+                                            for value in expected['id'].astype(str)}
+
+
+def test_regions_dont_depend_on_the_processes():
+    setups = [CROWDED, SPACIOUS, SMALL_SETUP]
+    one, two = (run_region(setups, seed=1, processes=processes) for processes in (1, 2))
+    for name in ('general', 'people', 'example_house'):
+        pd.testing.assert_frame_equal(one.to_dataframe(name), two.to_dataframe(name), check_categorical=False)
+
+
+def test_homeless_people_migrate():
+    region = Region([CROWDED, SPACIOUS], seed=1, processes=2, migration_probability=1)
+    try:
+        region.advance()
+    finally:
+        stats = region.close()
+    assert region.migrations > 0
+    people = stats.to_dataframe('general').query("type == 'People alive'")['amount']
+    assert (people <= CROWDED['max_people'] + SPACIOUS['max_people']).all()
+
+
+def test_merged_general_stats_are_sums():
+    shards = [quiet_run(seed=seed) for seed in (1, 2)]
+    merged = merge_shard_stats(shards, ['a', 'b'])
+
+    def amounts(stats):
+        df = stats.to_dataframe('general').astype({'type': str, 'scale': str})
+        return df.groupby(['year', 'type', 'scale'])['amount'].sum()
+
+    pd.testing.assert_series_equal(amounts(merged), amounts(shards[0]).add(amounts(shards[1]), fill_value=0))
+    assert len(merged.to_dataframe('people')) == sum(len(stats.to_dataframe('people')) for stats in shards)
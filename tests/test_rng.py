@@ -0,0 +1,37 @@
+import numpy as np
+
+from simulator.rng import RandomStream
+from simulator.setup import Engine
+from tests.common import assert_same_stats, quiet_run
+
+
+def test_single_and_bulk_draws_read_the_same_sequence():
+    single, bulk = RandomStream(3, block_size=7), RandomStream(3, block_size=7)
+    uniforms = [single.random() for _ in range(20)]
+    np.testing.assert_array_equal(bulk.randoms(5), uniforms[:5])
+    assert bulk.random() == uniforms[5]
+    np.testing.assert_array_equal(bulk.randoms(14), uniforms[6:])
+
+    normals = [single.normal(10, 2) for _ in range(10)]
+    np.testing.assert_allclose(bulk.normals(10, 2, 10), normals)
+
+
+def test_draws_are_the_numpy_ones():
+    stream = RandomStream(4)
+    generator = np.random.default_rng(4)
+    np.testing.assert_array_equal(stream.randoms(10), generator.random(10))
+
+
+def test_integers_are_in_range():
+    stream = RandomStream(5)
+    values = [stream.randint(14, 20) for _ in range(2000)]
+    assert min(values) == 14 and max(values) == 20
+    values = [stream.randrange(3) for _ in range(2000)]
+    assert set(values) == {0, 1, 2}
+
+
+def test_seeded_runs_are_reproducible():
+    for engine in Engine:
+        assert_same_stats(quiet_run(seed=9, engine=engine), quiet_run(seed=9, engine=engine))
+        assert not quiet_run(seed=9, engine=engine).to_dataframe('people').equals(
+            quiet_run(seed=10, engine=engine).to_dataframe('people'))
@@ -0,0 +1,34 @@
+import importlib.util
+
+import pytest
+
+from simulator.sinks import NpzSink, ParquetSink, StatsReader, open_sink
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_run
+
+SINKS = [NpzSink, pytest.param(ParquetSink, marks=pytest.mark.skipif(importlib.util.find_spec('pyarrow') is None,
+                                                                     reason='pyarrow is not installed'))]
+
+
+@pytest.mark.parametrize('sink', SINKS)
+def test_sink_stats_are_the_in_memory_ones(sink, tmp_path):
+    setup = {**SMALL_SETUP, 'allow_inheritance': True}
+    stats = quiet_run(setup, stats_sink=sink(str(tmp_path), chunk_rows=50))
+    assert len(stats.people) < 50  # Only the last chunk stays in memory
+    expected = quiet_run(setup)
+    assert_same_stats(expected, stats)
+
+    reader = StatsReader(str(tmp_path))
+    assert len(reader.manifest['chunks']['people']) > 1
+    years = (10, 20)
+    expected_years = expected.to_dataframe('people', years)
+    actual_years = reader.to_dataframe('people', years)
+    assert actual_years['year'].between(10, 19).all()
+    assert actual_years['money'].tolist() == expected_years['money'].tolist()
+    assert actual_years['id'].tolist() == expected_years['id'].tolist()
+
+
+def test_open_sink_picks_an_available_format(tmp_path):
+    sink = open_sink(str(tmp_path), chunk_rows=100)
+    stats = quiet_run(stats_sink=sink)
+    assert_same_stats(quiet_run(), stats)
+
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from simulator.ensemble import Ensemble, summarize
+from simulator.sketches import (ACCURACY, FOUNDER_SHARES, bucket_keys, bucket_values, distribution_gini,
+                                distribution_quantiles, distribution_records, founder_ownership, merge_distributions)
+from tests.common import quiet_run
+
+
+def _distribution(year, ages, money, shares, founder_shares=0.0):
+    return pd.DataFrame(distribution_records(year, ages, money, shares, founder_shares))
+
+
+def test_buckets_are_within_the_accuracy():
+    values = np.concatenate([-np.logspace(-2, 6, 500), np.logspace(-2, 6, 500)])
+    represented = bucket_values(bucket_keys(values))
+    np.testing.assert_array_less(np.abs(represented - values), ACCURACY * np.abs(values) + 1e-12)
+
+
+def test_quantiles_and_gini_match_the_exact_ones():
+    generator = np.random.default_rng(0)
+    money = generator.lognormal(8, 1.5, 5000)
+    ages = generator.uniform(0, 100, 5000)
+    df = _distribution(0, ages, money, np.zeros(5000))
+
+    quantiles = distribution_quantiles(df, 'money', (0.1, 0.5, 0.9))
+    exact = np.quantile(money, [0.1, 0.5, 0.9], method='lower')
+    np.testing.assert_allclose(quantiles['value'].to_numpy(), exact, rtol=ACCURACY)
+
+    sorted_money = np.sort(money)
+    ranks = np.arange(1, len(money) + 1)
+    exact_gini = (2 * ranks - len(money) - 1).dot(sorted_money) / (len(money) * sorted_money.sum())
+    assert abs(distribution_gini(df, 'money')[0] - exact_gini) < 1e-3
+
+
+def test_merged_sketches_are_the_sketch_of_the_pooled_values():
+    generator = np.random.default_rng(1)
+    parts = [(generator.uniform(0, 100, 300), generator.normal(1000, 800, 300), generator.uniform(0, 50, 300))
+             for _ in range(3)]
+    merged = merge_distributions([_distribution(0, *part, founder_shares=10.0) for part in parts])
+    pooled = merge_distributions([_distribution(0, *(np.concatenate(column) for column in zip(*parts)),
+                                                founder_shares=30.0)])
+    # The founder of each part is a row of its own
+    merged, pooled = (df[df['metric'] != FOUNDER_SHARES].reset_index(drop=True) for df in (merged, pooled))
+    pd.testing.assert_frame_equal(merged[['year', 'metric', 'band', 'bucket', 'count']],
+                                  pooled[['year', 'metric', 'band', 'bucket', 'count']])
+    np.testing.assert_allclose(merged['total'].to_numpy(), pooled['total'].to_numpy())
+
+
+
+def test_founder_ownership_of_merged_sketches():
+    shares = [np.full(10, 2.0), np.full(5, 4.0)]
+    merged = merge_distributions([_distribution(0, np.full(len(part), 40.0), np.zeros(len(part)), part,
+                                                founder_shares=20.0) for part in shares])
+    assert founder_ownership(merged)[0] == 40 / (40 + 40)
+
+
+def test_recorded_sketches_match_the_people_recorded():
+    stats = quiet_run()
+    people = stats.to_dataframe('people')
+    people = people[people['id'] != 'dummy']
+    distribution = stats.to_dataframe('distribution')
+    money = distribution[distribution['metric'] == 'money']
+
+    counts = money.groupby('year')['count'].sum()
+    np.testing.assert_array_equal(counts.to_numpy(), people.groupby('year').size().to_numpy())
+    np.testing.assert_allclose(money.groupby('year')['total'].sum().to_numpy(),
+                               people.groupby('year')['money'].sum().to_numpy())
+
+
+def test_ensemble_merges_the_replicas_as_they_are_added():
+    ensemble = Ensemble()
+    distributions = []
+    for seed in (1, 2, 3):
+        stats = quiet_run(seed=seed)
+        distributions.append(stats.to_dataframe('distribution'))
+        ensemble.add(summarize(stats), distributions[-1])
+    pd.testing.assert_frame_equal(ensemble.distribution(), merge_distributions(distributions))
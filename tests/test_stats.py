@@ -0,0 +1,60 @@
+import numpy as np
+
+from simulator.stats import GENERAL_COLUMNS, PEOPLE_COLUMNS, ColumnTable, Stats
+from tests.common import assert_same_stats, quiet_run
+
+RECORDS = [
+    {'year': 0, 'id': 'person 0', 'money': 10.5, 'shares': 1, 'age': 14, 'parent': 'None', 'inherited': False,
+     'current_house': 'house 1', 'share_income': 0, 'work_income': 100, 'rent': -10, 'net_income': 90},
+    {'year': 0, 'id': 'dummy', 'money': 0, 'shares': 0, 'age': 0, 'parent': None, 'inherited': True,
+     'current_house': None, 'share_income': 0, 'work_income': 0, 'rent': 0, 'net_income': 0},
+    {'year': 1, 'id': 'person 1', 'money': -3.25, 'shares': 2.5, 'age': 15.5, 'parent': 0, 'inherited': True,
+     'current_house': None, 'share_income': 1.5, 'work_income': 80, 'rent': 0, 'net_income': 81.5},
+]
+
+
+def test_appended_records_are_read_back():
+    table = ColumnTable(PEOPLE_COLUMNS)
+    for record in RECORDS * 10:  # Past the first buffer size
+        table.append(record)
+    assert len(table) == 30
+    assert list(table.records().values()) == RECORDS * 10
+
+    df = table.to_dataframe()
+    assert df['id'].tolist() == [record['id'] for record in RECORDS] * 10
+    assert df['current_house'].isna().tolist() == [False, True, True] * 10
+    np.testing.assert_array_equal(df['money'].to_numpy(), [record['money'] for record in RECORDS] * 10)
+    assert len(table.to_dataframe(years=(1, None))) == 10
+
+
+def test_extend_is_append():
+    appended, extended = ColumnTable(GENERAL_COLUMNS), ColumnTable(GENERAL_COLUMNS)
+    records = [{'year': year, 'amount': year * 1.5, 'type': f'type {year % 3}', 'scale': 'human'}
+               for year in range(40)]
+    for record in records:
+        appended.append(record)
+    extended.extend({name: [record[name] for record in records] for name, _ in GENERAL_COLUMNS})
+    assert appended.records() == extended.records()
+
+
+def test_chunks_round_trip():
+    table = ColumnTable(PEOPLE_COLUMNS)
+    for record in RECORDS:
+        table.append(record)
+    copy = ColumnTable(PEOPLE_COLUMNS)
+    copy.append(RECORDS[2])  # Other codes for the same categories
+    copy.extend_chunk(*table.chunk(start=1))
+    assert list(copy.records().values()) == [RECORDS[2], RECORDS[1], RECORDS[2]]
+
+
+def test_stats_of_a_run_as_records_and_dataframes():
+    stats = quiet_run()
+    for name, column in (('people', 'money'), ('general', 'amount'), ('example_house', 'shares')):
+        records = list(getattr(stats, f'{name}_stats').values())
+        df = stats.to_dataframe(name)
+        assert len(records) == len(df) == getattr(stats, f'{name}_stats_last_index')
+        assert [record[column] for record in records] == df[column].tolist()
+
+    copy = Stats()
+    copy.extend(stats)
+    assert_same_stats(stats, copy)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from simulator import sweep
+from simulator.setup import Ruleset
+from simulator.sweep import grid, latin_hypercube, random_samples, run_sweep
+from tests.common import SMALL_SETUP
+
+
+def test_grid():
+    points = grid(allow_inheritance=[False, True], ruleset=list(Ruleset))
+    assert len(points) == 4
+    assert {'allow_inheritance': True, 'ruleset': Ruleset.normal_rent} in points
+
+
+def test_latin_hypercube_has_one_sample_per_stratum():
+    points = latin_hypercube(10, seed=1, house_to_rent_ratio=(0.0, 1.0), max_people=(10, 19))
+    strata = np.floor(np.array([point['house_to_rent_ratio'] for point in points]) * 10)
+    assert sorted(strata.tolist()) == list(range(10))
+    assert sorted(point['max_people'] for point in points) == list(range(10, 20))
+
+
+def test_random_samples_are_in_range():
+    points = random_samples(50, seed=2, sigma_salary=(5.0, 10.0), ruleset=list(Ruleset))
+    assert all(5 <= point['sigma_salary'] < 10 for point in points)
+    assert {point['ruleset'] for point in points} == set(Ruleset)
+
+
+def test_sweep_results_are_cached_by_setup_and_code(tmp_path, monkeypatch):
+    points = grid(allow_inheritance=[False, True])
+    arguments = dict(base_setup=SMALL_SETUP, replicas=2, seed=3, processes=2, cache_directory=str(tmp_path))
+    first = run_sweep(points, **arguments)
+    assert len(first) == 4
+    assert first['final_people_alive'].notna().all()
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError('Everything should come from the cache')
+
+    monkeypatch.setattr(sweep.multiprocessing, 'Pool', no_pool)
+    second = run_sweep(points, **arguments)
+    assert first.equals(second)
+
+    # Results of another version of the simulator are not reused
+    monkeypatch.setattr(sweep, 'code_version', lambda: 'another version')
+    with pytest.raises(AssertionError, match='cache'):
+        run_sweep(points, **arguments)
+
+
+def test_points_need_the_general_stats(tmp_path):
+    with pytest.raises(ValueError, match='general'):
+        run_sweep([{}, {'stats_tables': ('people',)}], base_setup=SMALL_SETUP, cache_directory=str(tmp_path))
@@ -0,0 +1,35 @@
+import numpy as np
+
+from figures.timelines import _column_ranges, _density_grid, get_people_density_timeline, get_people_timeline
+from simulator.setup import Ruleset
+from tests.common import SMALL_SETUP, quiet_run
+
+
+def test_density_grid_counts_every_person():
+    setup = {**SMALL_SETUP, 'allow_inheritance': True}
+    df = quiet_run(setup).to_dataframe('people')
+    people = df[df['id'] != 'dummy']
+    ranges = _column_ranges(people, ('age', 'money'))
+    years, facets, centers, counts = _density_grid(df, ranges, True, bins=10)
+
+    assert counts.shape == (len(years), 2, 10, 10)
+    np.testing.assert_array_equal(years, np.unique(people['year']))
+    by_year = people.groupby(['year', 'inherited']).size()
+    for k, year in enumerate(years.tolist()):
+        for i, inherited in enumerate(facets):
+            assert counts[k, i].sum() == by_year.get((year, inherited), 0)
+
+
+def test_large_timelines_are_binned():
+    stats = quiet_run()
+    scatter = get_people_timeline(stats, False, Ruleset.by_shares)
+    assert scatter.data[0].type == 'scatter'
+
+    webgl = get_people_timeline(stats, False, Ruleset.by_shares, webgl_threshold=0)
+    assert webgl.data[0].type == 'scattergl'
+
+    density = get_people_timeline(stats, False, Ruleset.by_shares, density_threshold=0)
+    assert density.data[0].type == 'heatmap'
+    df = stats.to_dataframe('people')
+    assert len(density.frames) == df[df['id'] != 'dummy']['year'].nunique()
+    assert density.to_json() == get_people_density_timeline(df, False).to_json()
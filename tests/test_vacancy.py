@@ -0,0 +1,42 @@
+import numpy as np
+
+from simulator.vacancy import VacancyIndex
+
+
+def test_random_below_picks_among_the_affordable_houses():
+    generator = np.random.default_rng(0)
+    index = VacancyIndex()
+    vacant = {}
+    for _ in range(500):
+        house_id = int(generator.integers(50))
+        if generator.random() < 0.6:
+            rent_price = vacant.get(house_id, float(generator.uniform(5, 20)))
+            index.add(house_id, rent_price)
+            vacant[house_id] = rent_price
+        else:
+            index.discard(house_id)
+            vacant.pop(house_id, None)
+
+        budget = float(generator.uniform(0, 25))
+        affordable = sorted((rent_price, house_id) for house_id, rent_price in vacant.items() if rent_price < budget)
+        assert len(index) == len(vacant)
+        assert index.count_below(budget) == len(affordable)
+        # The i-th affordable house by rent is the one drawn with random index i
+        for i, (_, house_id) in enumerate(affordable):
+            assert index.random_below(budget, lambda count: i) == house_id
+        if not affordable:
+            assert index.random_below(budget) is None
+
+    rent_prices, house_ids = index.sorted_houses()
+    assert list(zip(rent_prices.tolist(), house_ids.tolist())) == sorted((r, h) for h, r in vacant.items())
+
+
+def test_random_below_is_uniform():
+    index = VacancyIndex()
+    for house_id in range(5):
+        index.add(house_id, 10 + house_id)
+    generator = np.random.default_rng(1)
+    draws = [index.random_below(13, lambda count: int(generator.integers(count))) for _ in range(3000)]
+    counts = np.bincount(draws, minlength=5)
+    assert counts[3:].sum() == 0
+    assert (np.abs(counts[:3] - 1000) < 150).all()
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from simulator.checkpoint import checkpoint, fork
+from simulator.ensemble import summarize
+from simulator.main import start
+from simulator.ownership import NOBODY
+from simulator.setup import Engine, MONTHS_PER_YEAR, Ruleset
+from tests.common import SMALL_SETUP, assert_same_stats, quiet_advance, quiet_run
+
+LONG_SETUP = {**SMALL_SETUP, 'number_of_months_to_run': 60 * MONTHS_PER_YEAR + 1}
+
+
+def test_same_seed_same_run():
+    for ruleset in Ruleset:
+        setup = {**SMALL_SETUP, 'ruleset': ruleset, 'allow_inheritance': True}
+        assert_same_stats(quiet_run(setup, engine=Engine.arrays), quiet_run(setup, engine=Engine.arrays))
+
+
+def test_shares_are_conserved():
+    for ruleset in Ruleset:
+        state = start(setup={**SMALL_SETUP, 'ruleset': ruleset, 'allow_inheritance': True}, verbose=False, seed=3,
+                      engine=Engine.arrays)
+        quiet_advance(state)
+        houses = state.house_max_id
+        np.testing.assert_allclose(
+            state.ownership.total_shares[:houses],
+            SMALL_SETUP['number_of_shares_per_house'] + state.inflation[:houses])
+        _, people, _ = state.ownership.entries()
+        assert state.alive[people].all()
+
+
+def test_same_outcomes_as_the_objects_engine():
+    '''
+    The engines draw their random numbers in another order, their outcomes only agree in distribution
+    '''
+    outcomes = {}
+    for engine in Engine:
+        for seed in range(12):
+            summary = summarize(quiet_run(LONG_SETUP, seed=seed, engine=engine))
+            for metric in ('People alive', 'Founder money', 'Wealth p50'):
+                # The mean of the last 20 years of each replica
+                outcomes.setdefault((engine, metric), []).append(summary[metric][1].to_numpy()[-20:].mean())
+
+    for metric in ('People alive', 'Founder money', 'Wealth p50'):
+        objects, arrays = (np.array(outcomes[(engine, metric)]) for engine in Engine)
+        standard_error = np.sqrt((objects.var(ddof=1) + arrays.var(ddof=1)) / len(objects))
+        assert abs(objects.mean() - arrays.mean()) < 4 * standard_error, metric
+
+
+def test_event_scheduling_is_refused():
+    with pytest.raises(ValueError, match='event_scheduling'):
+        start(setup={**SMALL_SETUP, 'event_scheduling': True}, verbose=False, engine=Engine.arrays)
+
+    state = start(setup=SMALL_SETUP, verbose=False, engine=Engine.arrays)
+    with pytest.raises(ValueError, match='event_scheduling'):
+        fork(checkpoint(state), event_scheduling=True)
+
+
+def test_indexes_follow_the_run():
+    state = start(setup={**SMALL_SETUP, 'allow_inheritance': True}, verbose=False, seed=4, engine=Engine.arrays)
+    for year in range(SMALL_SETUP['number_of_months_to_run'] // MONTHS_PER_YEAR):
+        quiet_advance(state, MONTHS_PER_YEAR)
+        alive = state.alive_ids()
+        children = {}
+        for person_id in alive.tolist():
+            if state.parent[person_id] != NOBODY:
+                children.setdefault(int(state.parent[person_id]), []).append(person_id)
+        assert {parent: list(ids) for parent, ids in state.children.items() if ids} == children
+
+        houses, people, _ = state.ownership.entries()
+        owned = {}
+        for house_id, person_id in sorted(zip(houses.tolist(), people.tolist())):
+            owned.setdefault(person_id, []).append(house_id)
+        assert {person_id: sorted(houses) for person_id, houses in state.ownership.person_houses.items()} == owned
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from figures.results import compute_results, load_people_years, people_year_figure, people_years, write_figures
+from figures.timelines import get_people_year_figure
+from simulator.cache import TieredCache
+from simulator.setup import Ruleset
+from simulator.yearstore import YearStore
+from tests.common import SMALL_SETUP, quiet_run
+
+
+def assert_same_years(stats, store):
+    df = stats.to_dataframe('people')
+    assert len(store) == len(df)
+    for year in list(np.unique(df['year'])) + [10 ** 6]:
+        pd.testing.assert_frame_equal(df[df['year'] == year].reset_index(drop=True), store.year(year),
+                                      check_categorical=False)
+
+
+def test_years_are_slices_of_the_people(tmp_path):
+    stats = quiet_run()
+    store = YearStore.from_stats(stats)
+    assert_same_years(stats, store)
+
+    store.save(tmp_path / 'people')
+    assert YearStore.exists(tmp_path / 'people') and not YearStore.exists(tmp_path / 'missing')
+    for mmap in (True, False):
+        loaded = YearStore.load(tmp_path / 'people', mmap=mmap)
+        assert isinstance(loaded.columns['money'], np.memmap) == mmap
+        assert_same_years(stats, loaded)
+        assert loaded.ranges(('age',)) == store.ranges(('age',))
+
+
+def test_unsorted_rows_are_sorted_by_year():
+    columns = {'year': np.array([2, 1, 2, 1]), 'money': np.array([1., 2., 3., 4.])}
+    store = YearStore('people', columns, {})
+    np.testing.assert_array_equal(store.year_rows(1)['money'], [2., 4.])
+    np.testing.assert_array_equal(store.year_rows(2)['money'], [1., 3.])
+
+
+def test_people_years_are_written_once_from_the_cache(tmp_path):
+    cache = TieredCache(tmp_path / 'cache')
+    results = compute_results(SMALL_SETUP, 1)
+    assert people_years('key', cache, tmp_path / 'years') is None
+    cache.put('key', results)
+    store = people_years('key', cache, str(tmp_path / 'years'))
+    assert_same_years(results['stats'], store)
+    assert people_years('key', cache, str(tmp_path / 'years')) is store
+
+
+def test_precomputed_people_and_their_figures(tmp_path):
+    path = str(tmp_path / 'figures.json')
+    assert load_people_years(path) is None
+    results = compute_results(SMALL_SETUP, 2)
+    write_figures(results, path)
+    store = load_people_years(path)
+    assert_same_years(results['stats'], store)
+
+    year = int(store.years[len(store.years) // 2])
+    assert people_year_figure(store, year, False, Ruleset.by_shares).data[0].type == 'scatter'
+
+    ranges = store.ranges(('age', 'money', 'net_income'))
+    density = get_people_year_figure(store.year(year), ranges, False, Ruleset.by_shares, density_threshold=0)
+    assert density.data[0].type == 'heatmap'
+    df = store.year(year)
+    assert np.sum(density.data[0].z) == np.count_nonzero(df['id'] != 'dummy')